@@ -1,9 +1,117 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
 class Settings(BaseSettings):
     mongodb_uri: str = Field(default="mongodb://mongo:27017/t1db", alias="MONGODB_URI")
     app_env: str = Field(default="dev", alias="APP_ENV")
+    metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
+    # Shared secret for /admin endpoints (sent as X-Admin-Token); empty disables them
+    admin_token: str = Field(default="", alias="ADMIN_TOKEN")
+    # Attach a Server-Timing header to 1-in-N requests (0 disables sampling)
+    timing_sample_rate: int = Field(default=0, alias="TIMING_SAMPLE_RATE")
+    # Mongo commands at or above this duration are logged and explained (0 disables)
+    slow_query_ms: float = Field(default=100.0, alias="SLOW_QUERY_MS")
+    # Coalesce concurrent charge inserts into unordered insert_many batches
+    charge_insert_batching: bool = Field(default=True, alias="CHARGE_INSERT_BATCHING")
+    charge_insert_max_batch: int = Field(default=500, alias="CHARGE_INSERT_MAX_BATCH")
+    charge_insert_max_delay_ms: float = Field(default=0.0, alias="CHARGE_INSERT_MAX_DELAY_MS")
+    # Bound on queued charge inserts; async (202) charges get 503 beyond it
+    charge_queue_max: int = Field(default=10_000, alias="CHARGE_QUEUE_MAX")
+    # Allow `Prefer: respond-async` on POST /charges (needs charge insert batching)
+    async_charges_enabled: bool = Field(default=True, alias="ASYNC_CHARGES_ENABLED")
+    # In-process client/card cache used on latency-sensitive paths
+    entity_cache_ttl_s: float = Field(default=30.0, alias="ENTITY_CACHE_TTL_S")
+    entity_cache_size: int = Field(default=10_000, alias="ENTITY_CACHE_SIZE")
+    # "monthly" stores charges in charges_YYYYMM collections (see scripts/partition_charges.py)
+    charge_partitioning: Literal["none", "monthly"] = Field(default="none", alias="CHARGE_PARTITIONING")
+    # A partitioned request_id claim without its charge is taken over after this (> queued write latency)
+    request_id_claim_grace_s: float = Field(default=60.0, alias="REQUEST_ID_CLAIM_GRACE_S")
+    # Cold archive of old charges (empty directory disables it)
+    archive_dir: str = Field(default="", alias="ARCHIVE_DIR")
+    archive_after_days: int = Field(default=365, alias="ARCHIVE_AFTER_DAYS")
+    archive_shards: int = Field(default=16, alias="ARCHIVE_SHARDS")
+    # Seconds between background archiver runs in the app (0: only CLI/admin)
+    archive_interval_s: float = Field(default=3600.0, alias="ARCHIVE_INTERVAL_S")
+    # Token buckets on POST /charges (requests/s and burst; rps 0 disables a scope)
+    rate_limit_enabled: bool = Field(default=True, alias="RATE_LIMIT_ENABLED")
+    rate_limit_client_rps: float = Field(default=100.0, alias="RATE_LIMIT_CLIENT_RPS")
+    rate_limit_client_burst: float = Field(default=200.0, alias="RATE_LIMIT_CLIENT_BURST")
+    rate_limit_card_rps: float = Field(default=25.0, alias="RATE_LIMIT_CARD_RPS")
+    rate_limit_card_burst: float = Field(default=50.0, alias="RATE_LIMIT_CARD_BURST")
+    rate_limit_idle_s: float = Field(default=300.0, alias="RATE_LIMIT_IDLE_S")
+    # "mongo" shares buckets across workers (one $inc round trip per scope)
+    rate_limit_backend: Literal["memory", "mongo"] = Field(default="memory", alias="RATE_LIMIT_BACKEND")
+    # Admission control: concurrent requests per route class (0 = unlimited)
+    admission_enabled: bool = Field(default=True, alias="ADMISSION_ENABLED")
+    admission_charges_limit: int = Field(default=64, alias="ADMISSION_CHARGES_LIMIT")
+    admission_reads_limit: int = Field(default=128, alias="ADMISSION_READS_LIMIT")
+    admission_writes_limit: int = Field(default=32, alias="ADMISSION_WRITES_LIMIT")
+    admission_admin_limit: int = Field(default=4, alias="ADMISSION_ADMIN_LIMIT")
+    # Open event streams (long-lived, kept out of the reads lane)
+    admission_streams_limit: int = Field(default=256, alias="ADMISSION_STREAMS_LIMIT")
+    # Wait queue per class and CoDel parameters (shed once queueing > target for interval)
+    admission_queue_max: int = Field(default=256, alias="ADMISSION_QUEUE_MAX")
+    admission_target_ms: float = Field(default=50.0, alias="ADMISSION_TARGET_MS")
+    admission_interval_ms: float = Field(default=500.0, alias="ADMISSION_INTERVAL_MS")
+    admission_max_wait_ms: float = Field(default=2000.0, alias="ADMISSION_MAX_WAIT_MS")
+    # Background jobs (stored in `jobs`): poll period, lease renewed while running, retries
+    jobs_poll_interval_s: float = Field(default=5.0, alias="JOBS_POLL_INTERVAL_S")
+    job_lease_s: float = Field(default=60.0, alias="JOB_LEASE_S")
+    job_max_attempts: int = Field(default=5, alias="JOB_MAX_ATTEMPTS")
+    # Client cascade delete: documents per delete_many and pause between chunks
+    cascade_delete_batch: int = Field(default=1_000, alias="CASCADE_DELETE_BATCH")
+    cascade_delete_pause_ms: float = Field(default=50.0, alias="CASCADE_DELETE_PAUSE_MS")
+    # Live charge feed (SSE): "change_stream" watches Mongo so every worker sees every write
+    charge_feed_source: Literal["local", "change_stream"] = Field(default="local", alias="CHARGE_FEED_SOURCE")
+    # Events buffered per subscriber before it is dropped, and resume backlog per reconnect
+    charge_feed_queue: int = Field(default=256, alias="CHARGE_FEED_QUEUE")
+    charge_feed_replay_max: int = Field(default=1_000, alias="CHARGE_FEED_REPLAY_MAX")
+    # Keep-alive comment period on idle streams
+    charge_feed_heartbeat_s: float = Field(default=15.0, alias="CHARGE_FEED_HEARTBEAT_S")
+    # Read preference of the GET routes that opt in to read offloading (and of exports)
+    read_preference: Literal["primary", "primaryPreferred", "secondaryPreferred", "secondary", "nearest"] = Field(
+        default="primary", alias="READ_PREFERENCE"
+    )
+    # Skip secondaries lagging more than this (-1: no bound; the driver minimum is 90)
+    read_max_staleness_s: int = Field(default=90, alias="READ_MAX_STALENESS_S")
+    # End-to-end deadline of API requests, applied to every Mongo operation they issue (0 disables)
+    request_deadline_ms: float = Field(default=5_000.0, alias="REQUEST_DEADLINE_MS")
+    # Data-layer circuit breaker: opens at this failure ratio over the window (with enough calls)
+    breaker_enabled: bool = Field(default=True, alias="BREAKER_ENABLED")
+    breaker_failure_ratio: float = Field(default=0.5, alias="BREAKER_FAILURE_RATIO")
+    breaker_min_calls: int = Field(default=20, alias="BREAKER_MIN_CALLS")
+    breaker_window_s: float = Field(default=10.0, alias="BREAKER_WINDOW_S")
+    # Fail-fast period before /health probes the database again, and that probe's timeout
+    breaker_open_s: float = Field(default=5.0, alias="BREAKER_OPEN_S")
+    breaker_probe_timeout_ms: float = Field(default=1_000.0, alias="BREAKER_PROBE_TIMEOUT_MS")
+    # Response compression (gzip, plus br/zstd when brotli/zstandard are installed)
+    compression_enabled: bool = Field(default=True, alias="COMPRESSION_ENABLED")
+    # Smaller complete bodies go out as is; bodies from this size are compressed off the event loop
+    compression_min_size: int = Field(default=1_024, alias="COMPRESSION_MIN_SIZE")
+    compression_thread_min_size: int = Field(default=256 * 1_024, alias="COMPRESSION_THREAD_MIN_SIZE")
+    # Entity cache invalidation across workers: "mongo" broadcasts PUT/DELETE through a capped collection
+    cache_invalidation: Literal["local", "mongo"] = Field(default="local", alias="CACHE_INVALIDATION")
+    cache_invalidation_capped_bytes: int = Field(default=1_048_576, alias="CACHE_INVALIDATION_CAPPED_BYTES")
+    # Production server (python -m app.serve): workers (0 = one per CPU), keep-alive, listen backlog
+    server_workers: int = Field(default=0, alias="SERVER_WORKERS")
+    server_keepalive_s: int = Field(default=75, alias="SERVER_KEEPALIVE_S")
+    server_backlog: int = Field(default=2_048, alias="SERVER_BACKLOG")
+    server_graceful_timeout_s: int = Field(default=30, alias="SERVER_GRACEFUL_TIMEOUT_S")
+    # Transactional outbox: charges/refunds carry their events until the relay appends them to the log
+    outbox_enabled: bool = Field(default=False, alias="OUTBOX_ENABLED")
+    outbox_log_dir: str = Field(default="data/event-log", alias="OUTBOX_LOG_DIR")
+    outbox_segment_bytes: int = Field(default=64 * 1_048_576, alias="OUTBOX_SEGMENT_BYTES")
+    # Charges per relay pass (one fsync each) and the pause when nothing is pending
+    outbox_batch: int = Field(default=500, alias="OUTBOX_BATCH")
+    outbox_poll_interval_ms: float = Field(default=200.0, alias="OUTBOX_POLL_INTERVAL_MS")
+    # Charge histograms: most buckets per request, and closed buckets cached per worker
+    histogram_max_buckets: int = Field(default=2_000, alias="HISTOGRAM_MAX_BUCKETS")
+    histogram_cache_size: int = Field(default=100_000, alias="HISTOGRAM_CACHE_SIZE")
+    histogram_cache_ttl_s: float = Field(default=86_400.0, alias="HISTOGRAM_CACHE_TTL_S")
+    # A bucket is final (cacheable) this long after it ends: covers queued writes and READ_MAX_STALENESS_S
+    histogram_settle_s: float = Field(default=120.0, alias="HISTOGRAM_SETTLE_S")
 
     model_config = {
         "env_file": ".env",
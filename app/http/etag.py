@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Type
+
+from beanie import Document
+from bson import ObjectId
+from fastapi import HTTPException, Response, status
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Suffix the compression middleware gives the strong ETag of a coded body
+_CODING_SUFFIX = re.compile(r'-(?:gzip|br|zstd)"$')
+
+
+def _ms(dt: datetime) -> int:
+    # Millisecond precision: what Mongo stores, so a freshly saved document
+    # and its re-read (or cached) copy produce the same tag
+    dt = dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _part(value: Any) -> str:
+    if isinstance(value, datetime):
+        return str(_ms(value))
+    return "" if value is None else str(value)
+
+
+def _digest(parts: Any) -> str:
+    return hashlib.blake2b("\x1f".join(_part(p) for p in parts).encode(), digest_size=12).hexdigest()
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong, quoted ETag derived from the parts that identify a representation version."""
+    return f'"{_digest(parts)}"'
+
+
+def resource_etag(resource_id: Any, updated_at: datetime, *parts: Any) -> str:
+    """
+    ETag of a single document: its `updated_at` (in ms) in clear followed by
+    a digest, so an `If-Match` tag can be turned back into the version to
+    put in an atomic update filter.
+    """
+    return f'"{_ms(updated_at)}-{_digest((resource_id, updated_at, *parts))}"'
+
+
+def if_match_versions(if_match: str) -> Optional[List[datetime]]:
+    """
+    `updated_at` values named by an `If-Match` header (naive UTC, as stored),
+    or None for `*`. Weak or foreign tags name no version: If-Match uses
+    strong comparison (RFC 9110 §13.1.1).
+    """
+    versions: List[datetime] = []
+    for candidate in if_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return None
+        ms, sep, _ = candidate.strip('"').partition("-")
+        if candidate.startswith('"') and sep and ms.isdigit():
+            versions.append(datetime(1970, 1, 1) + timedelta(milliseconds=int(ms)))
+    return versions
+
+
+def coded_etag(etag: str, coding: str) -> str:
+    """
+    ETag of the `coding` (gzip, br, zstd) encoded body: a strong tag names
+    exact bytes, so each coding gets its own (`"<tag>-gzip"`). The leading
+    version is untouched, so `If-Match` still reads it; weak tags are shared.
+    """
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    `If-None-Match` evaluation (RFC 9110 §13.1.2): `*` or any listed tag,
+    compared weakly, i.e. ignoring a `W/` prefix and a content coding suffix.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if _CODING_SUFFIX.sub('"', candidate) == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 carrying the current validator."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def precondition_filter(resource_id: ObjectId, if_match: Optional[str]) -> Dict[str, Any]:
+    """Filter for an atomic write to one document, restricted to the `If-Match` versions."""
+    query: Dict[str, Any] = {"_id": resource_id}
+    if if_match:
+        versions = if_match_versions(if_match)
+        if versions is not None:
+            query["updated_at"] = {"$in": versions}
+    return query
+
+
+def versioned_set(changes: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Update pipeline setting `changes` (as literals) and bumping `updated_at`
+    to `now`, or 1 ms past the stored value when that is not later, so two
+    writes within the same millisecond still produce distinct versions.
+    """
+    fields: Dict[str, Any] = {name: {"$literal": value} for name, value in changes.items()}
+    fields["updated_at"] = {"$max": [now, {"$add": ["$updated_at", 1]}]}
+    return [{"$set": fields}]
+
+
+async def write_failed(
+    doc_cls: Type[Document], resource_id: ObjectId, if_match: Optional[str], not_found: str
+) -> HTTPException:
+    """
+    Error for a conditional write that matched nothing: 412 when the document
+    exists at another version, 404 when it does not exist. Only costs a
+    lookup when an `If-Match` was sent.
+    """
+    if if_match and await doc_cls.get_motor_collection().find_one({"_id": resource_id}, {"_id": 1}):
+        return HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Resource was modified since it was read (If-Match)",
+        )
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
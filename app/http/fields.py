@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple, Type
+
+from bson import ObjectId
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel, TypeAdapter, create_model
+
+FIELDS_QUERY = Query(
+    default=None,
+    description="Comma-separated subset of the response fields (e.g. `id,amount,status`)",
+)
+
+
+def parse_fields(raw: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    Validated `fields=` selection in the model's declaration order, or None
+    for the full representation. Unknown names are a 422.
+    """
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    if not requested:
+        return None
+    unknown = requested - model.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}",
+        )
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+def projection(fields: Iterable[str], *always: str) -> Dict[str, int]:
+    """Mongo projection for API `fields` (`id` is `_id`), plus any field the query itself needs."""
+    spec = {"_id": 1}
+    for name in (*fields, *always):
+        if name != "id":
+            spec[name] = 1
+    return spec
+
+
+def project_row(raw: Mapping[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """API-shaped dict of a raw Mongo document restricted to `fields` (ObjectIds as strings)."""
+    row = {}
+    for name in fields:
+        value = raw.get("_id" if name == "id" else name)
+        row[name] = str(value) if isinstance(value, ObjectId) else value
+    return row
+
+
+@lru_cache(maxsize=128)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """`model` reduced to `fields` (built once per selection)."""
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields},
+    )
+
+
+@lru_cache(maxsize=128)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def dump_partial(model: Type[BaseModel], fields: Tuple[str, ...], row: Mapping[str, Any]) -> bytes:
+    return partial_model(model, fields).model_validate(row).model_dump_json().encode()
+
+
+def dump_partial_list(model: Type[BaseModel], fields: Tuple[str, ...], rows: Sequence[Mapping[str, Any]]) -> bytes:
+    adapter = _list_adapter(partial_model(model, fields))
+    return adapter.dump_json(adapter.validate_python(rows))
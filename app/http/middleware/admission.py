@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.infrastructure.observability.metrics import ADMISSION_QUEUE_DEPTH, REQUESTS_SHED_TOTAL
+
+# Never queued nor shed: probes and scrapes must answer while the API is overloaded
+RESERVED_PATHS = ("/health", "/metrics")
+
+
+class AdmissionLane:
+    """
+    Concurrency limit for one route class with a bounded FIFO wait queue.
+
+    When a slot frees up it is handed to the oldest waiter, CoDel style: once
+    waiters have been queued longer than `target` for a whole `interval`, the
+    ones above target are shed instead of served, until the queue drains back
+    under target. Standing queues therefore turn into fast 503s instead of
+    timeouts. A waiter also gives up after `max_wait`, and arrivals to a full
+    queue are rejected immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int,
+        target: float,
+        interval: float,
+        max_wait: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.target = target
+        self.interval = interval
+        self.max_wait = max_wait
+        self.active = 0
+        self._clock = clock
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        self._first_above = 0.0
+        self._depth = ADMISSION_QUEUE_DEPTH.labels(name)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _should_shed(self, sojourn: float, now: float) -> bool:
+        if sojourn < self.target:
+            self._first_above = 0.0
+            return False
+        if not self._first_above:
+            self._first_above = now + self.interval
+            return False
+        return now >= self._first_above
+
+    async def acquire(self) -> Optional[str]:
+        """Wait for a slot; returns None once admitted, else the shed reason."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        entry = (self._clock(), asyncio.get_running_loop().create_future())
+        self._waiters.append(entry)
+        self._depth.set(len(self._waiters))
+        try:
+            return await asyncio.wait_for(entry[1], timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            return "timeout"
+        except asyncio.CancelledError:
+            # Client went away; give back a slot that was already handed over
+            if entry[1].done() and not entry[1].cancelled() and entry[1].result() is None:
+                self.release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._depth.set(len(self._waiters))
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter worth serving, or free it."""
+        now = self._clock()
+        while self._waiters:
+            enqueued, future = self._waiters.popleft()
+            if future.done():
+                continue
+            if self._should_shed(now - enqueued, now):
+                future.set_result("sojourn")
+                continue
+            future.set_result(None)  # slot transferred, `active` unchanged
+            self._depth.set(len(self._waiters))
+            return
+        self._depth.set(0)
+        self.active -= 1
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Lane of a request; None for the reserved lane (never limited)."""
+    if path in RESERVED_PATHS:
+        return None
+    if path.startswith("/admin"):
+        return "admin"
+    if path.endswith("/stream"):
+        # Event streams hold their slot for as long as they stay open
+        return "streams"
+    if method in ("GET", "HEAD"):
+        return "reads"
+    if path.startswith("/charges"):
+        return "charges"
+    return "writes"
+
+
+def lanes_from_settings() -> Dict[str, AdmissionLane]:
+    limits = {
+        "charges": settings.admission_charges_limit,
+        "reads": settings.admission_reads_limit,
+        "writes": settings.admission_writes_limit,
+        "admin": settings.admission_admin_limit,
+        "streams": settings.admission_streams_limit,
+    }
+    return {
+        name: AdmissionLane(
+            name,
+            limit,
+            max_queue=settings.admission_queue_max,
+            target=settings.admission_target_ms / 1000,
+            interval=settings.admission_interval_ms / 1000,
+            max_wait=settings.admission_max_wait_ms / 1000,
+        )
+        for name, limit in limits.items()
+        if limit > 0
+    }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI admission controller: each request takes a slot in its route
+    class's lane (charges, reads, writes, admin, streams) before reaching the
+    app, and is shed with 503 + Retry-After when the lane cannot admit it in
+    time.
+    `/health` and `/metrics` bypass the lanes entirely.
+    """
+
+    def __init__(self, app: ASGIApp, lanes: Optional[Dict[str, AdmissionLane]] = None) -> None:
+        self.app = app
+        self.lanes = lanes if lanes is not None else lanes_from_settings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        lane = self.lanes.get(name) if name else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await lane.acquire()
+        if reason is not None:
+            REQUESTS_SHED_TOTAL.labels(lane.name, reason).inc()
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
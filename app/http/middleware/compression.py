@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import zlib
+from typing import Callable, Dict, Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.http.etag import coded_etag
+from app.infrastructure.observability.metrics import HTTP_COMPRESSION_BYTES_TOTAL
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli`
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: `pip install zstandard`
+    zstandard = None
+
+# Levels tuned for API payloads: most of the ratio for a fraction of the CPU
+# of the maximum levels (see scripts/bench_compression.py)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Text formats worth compressing. Event streams are left alone: keep-alives
+# must stay cheap and some proxies hold compressed streams back
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Everything fed so far, decodable by the client right away."""
+
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int = GZIP_LEVEL) -> None:
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = BROTLI_QUALITY) -> None:
+        self._c = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int = ZSTD_LEVEL) -> None:
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# Installed encodings, in server preference order (best ratio per CPU first)
+ENCODERS: Dict[str, Callable[[], Encoder]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+ENCODERS["gzip"] = GzipEncoder
+
+
+def negotiate(accept_encoding: str, available: Dict[str, Callable[[], Encoder]] = ENCODERS) -> Optional[str]:
+    """
+    Content coding for an `Accept-Encoding` header (RFC 9110 §12.5.3): the
+    highest q-value wins, ties go to the server's preference; `q=0` refuses
+    a coding and `*` stands for the ones not listed.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI response compression negotiated from `Accept-Encoding`.
+
+    Complete bodies under `min_size` go out as is; larger ones are compressed
+    in one go, in the thread pool from `thread_min_size` up so big listings
+    don't stall the event loop. Streamed bodies are compressed chunk by chunk
+    and flushed after each one, so an NDJSON line reaches the client as soon
+    as the handler yields it. A strong ETag gets the coding as a suffix (the
+    compressed bytes are a different representation); `etag_matches` strips
+    it again, so `If-None-Match` still matches the identity tag.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        min_size: Optional[int] = None,
+        thread_min_size: Optional[int] = None,
+        encoders: Optional[Dict[str, Callable[[], Encoder]]] = None,
+    ) -> None:
+        self.app = app
+        self.min_size = min_size if min_size is not None else settings.compression_min_size
+        self.thread_min_size = thread_min_size if thread_min_size is not None else settings.compression_thread_min_size
+        self.encoders = encoders if encoders is not None else ENCODERS
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(self, coding, send))
+
+
+class _CompressingSender:
+    def __init__(self, owner: CompressionMiddleware, coding: str, send: Send) -> None:
+        self.owner = owner
+        self.coding = coding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+        self.bytes_in = HTTP_COMPRESSION_BYTES_TOTAL.labels(coding, "in")
+        self.bytes_out = HTTP_COMPRESSION_BYTES_TOTAL.labels(coding, "out")
+
+    async def __call__(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+        elif message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message.get("headers", []))
+            self.passthrough = message["status"] < 200 or message["status"] in (204, 304) or not _compressible(headers)
+            if self.passthrough:
+                await self.send(message)
+        elif message["type"] != "http.response.body":
+            await self.send(message)
+        elif self.encoder is None:
+            await self._first_body(message)
+        else:
+            await self._stream_body(message)
+
+    async def _first_body(self, message: Message) -> None:
+        body: bytes = message.get("body", b"")
+        more = message.get("more_body", False)
+        if not more and len(body) < self.owner.min_size:
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+        self.encoder = self.owner.encoders[self.coding]()
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.coding
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = coded_etag(headers["etag"], self.coding)
+        if more:
+            # Streamed: the length is unknown, the body goes out chunked
+            del headers["Content-Length"]
+            await self.send(self.start)
+            await self._stream_body(message)
+            return
+        encoded = await self._encode(body, self.encoder.finish)
+        headers["Content-Length"] = str(len(encoded))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": encoded})
+
+    async def _stream_body(self, message: Message) -> None:
+        body: bytes = message.get("body", b"")
+        more = message.get("more_body", False)
+        encoded = await self._encode(body, self.encoder.flush if more else self.encoder.finish)
+        await self.send({"type": "http.response.body", "body": encoded, "more_body": more})
+
+    async def _encode(self, body: bytes, tail: Callable[[], bytes]) -> bytes:
+        encoder = self.encoder
+
+        def run() -> bytes:
+            return encoder.compress(body) + tail()
+
+        encoded = await run_in_threadpool(run) if len(body) >= self.owner.thread_min_size else run()
+        self.bytes_in.inc(len(body))
+        self.bytes_out.inc(len(encoded))
+        return encoded
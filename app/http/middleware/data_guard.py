@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+import pymongo
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.http.middleware.admission import RESERVED_PATHS, route_class
+from app.infrastructure.db.breaker import CircuitBreaker, current_db_calls, data_breaker, is_data_layer_failure
+from app.infrastructure.observability.metrics import DB_CIRCUIT_REJECTED_TOTAL, REQUEST_DEADLINE_EXCEEDED_TOTAL
+
+# Route classes that run without a deadline: open-ended streams and operator tasks
+UNBOUNDED_CLASSES = ("streams", "admin")
+
+
+class DataLayerGuardMiddleware:
+    """
+    Pure ASGI guard between the API and Mongo:
+
+    - every request gets a deadline (REQUEST_DEADLINE_MS): `pymongo.timeout`
+      turns the remaining time into each operation's `maxTimeMS` and bounds
+      server selection, and `asyncio.timeout` bounds the whole handler.
+      Running out answers 504;
+    - while the data-layer circuit is open requests fail fast with 503 and
+      Retry-After; outage-type Mongo errors (and deadlines) count as
+      failures, requests that used Mongo without them as successes.
+
+    `/health` and `/metrics` are never guarded (the health path probes the
+    open circuit); event streams and admin routes get no deadline.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        breaker: Optional[CircuitBreaker] = None,
+        deadline_ms: Optional[float] = None,
+    ) -> None:
+        self.app = app
+        self.breaker = breaker if breaker is not None else (data_breaker if settings.breaker_enabled else None)
+        self.deadline_ms = deadline_ms if deadline_ms is not None else settings.request_deadline_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in RESERVED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow():
+            DB_CIRCUIT_REJECTED_TOTAL.inc()
+            await self._error(scope, receive, send, 503, "Database unavailable, retry later", breaker.retry_after())
+            return
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        deadline = self.deadline_ms / 1000 if route_class(scope["method"], scope["path"]) not in UNBOUNDED_CLASSES else 0
+        calls = [0]
+        token = current_db_calls.set(calls)
+        try:
+            if deadline > 0:
+                with pymongo.timeout(deadline):
+                    async with asyncio.timeout(deadline):
+                        await self.app(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            # asyncio's deadline; pymongo's timeouts are PyMongoErrors
+            self._record(False)
+            REQUEST_DEADLINE_EXCEEDED_TOTAL.inc()
+            if started:
+                raise
+            await self._error(scope, receive, send, 504, "Request deadline exceeded")
+        except Exception as exc:
+            if not is_data_layer_failure(exc):
+                raise
+            self._record(False)
+            if started:
+                raise
+            if getattr(exc, "timeout", False):
+                REQUEST_DEADLINE_EXCEEDED_TOTAL.inc()
+                await self._error(scope, receive, send, 504, "Request deadline exceeded")
+            else:
+                await self._error(scope, receive, send, 503, "Database unavailable, retry later", 1.0)
+        else:
+            if calls[0]:
+                self._record(True)
+        finally:
+            current_db_calls.reset(token)
+
+    def _record(self, ok: bool) -> None:
+        if self.breaker is not None:
+            self.breaker.record(ok)
+
+    @staticmethod
+    async def _error(
+        scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, retry_after: Optional[float] = None
+    ) -> None:
+        headers = {"Retry-After": str(max(int(retry_after + 0.999), 1))} if retry_after is not None else None
+        await JSONResponse({"detail": detail}, status_code=status_code, headers=headers)(scope, receive, send)
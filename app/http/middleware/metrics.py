@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Tuple
+
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.infrastructure.observability.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RouteResolver:
+    """
+    Map a raw path to its route template (e.g. /cards/{card_id}) before the
+    router runs, so in-flight requests can be labelled per route.
+
+    Routes are grouped by their first path segment, so a lookup only tries the
+    regexes of a couple of candidates. Unknown paths collapse into a single
+    label to keep cardinality bounded.
+    """
+
+    def __init__(self, routes: List[BaseRoute]) -> None:
+        self._by_segment: Dict[str, List[Tuple[object, str]]] = {}
+        for route in routes:
+            path = getattr(route, "path", None)
+            regex = getattr(route, "path_regex", None)
+            if path is None or regex is None:
+                continue
+            segment = path.split("/", 2)[1] if path.startswith("/") else ""
+            key = "*" if segment.startswith("{") else segment
+            self._by_segment.setdefault(key, []).append((regex, path))
+
+    def resolve(self, path: str) -> str:
+        segment = path.split("/", 2)[1] if len(path) > 1 else ""
+        for candidates in (self._by_segment.get(segment, ()), self._by_segment.get("*", ())):
+            for regex, template in candidates:
+                if regex.match(path):
+                    return template
+        return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency histograms and in-flight
+    gauges. Everything on the request path is a couple of perf_counter reads
+    and cached label lookups.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._resolver: RouteResolver | None = None
+
+    def _resolve(self, scope: Scope) -> str:
+        if self._resolver is None:
+            self._resolver = RouteResolver(scope["app"].router.routes)
+        return self._resolver.resolve(scope["path"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._resolve(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            HTTP_REQUEST_DURATION.labels(method, route, str(status_code)).observe(elapsed)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import itertools
+import time
+from typing import Any, Callable, Iterable
+
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.infrastructure.observability.timing import RequestTimings, current_timings
+
+
+def _timed_endpoint(call: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint so a sampled request records when the handler ran."""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            timings = current_timings.get()
+            if timings is None:
+                return await call(*args, **kwargs)
+            timings.endpoint_started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                timings.endpoint_finished = time.perf_counter()
+
+        return async_wrapper
+
+    @functools.wraps(call)
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        # Sync endpoints run in a worker thread; the context is copied there
+        timings = current_timings.get()
+        if timings is None:
+            return call(*args, **kwargs)
+        timings.endpoint_started = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            timings.endpoint_finished = time.perf_counter()
+
+    return sync_wrapper
+
+
+def instrument_endpoints(routes: Iterable[BaseRoute]) -> None:
+    """
+    Hook endpoint entry/exit on every APIRoute. FastAPI resolves
+    `dependant.call` at request time, so wrapping it after the routes are
+    built splits a request into validation / handler / serialization.
+    """
+    for route in routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "__timed__", False):
+            route.dependant.call = _timed_endpoint(route.dependant.call)
+            route.dependant.call.__timed__ = True  # type: ignore[attr-defined]
+
+
+class PhaseTimingMiddleware:
+    """
+    Samples 1-in-N requests and reports their phase breakdown in a
+    `Server-Timing` header: validation (body parsing and dependency
+    resolution), db (Mongo command time), app (rest of the handler),
+    serialization (response model and JSON encoding) and total.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: int) -> None:
+        self.app = app
+        self.sample_rate = max(int(sample_rate), 1)
+        self._counter = itertools.count()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or next(self._counter) % self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timings.response_started = time.perf_counter()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
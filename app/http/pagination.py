@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+from app.infrastructure.db.partitions import utc
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(attempted_at: datetime, charge_id: ObjectId) -> str:
+    """Opaque keyset cursor: the sort key (attempted_at in ms, _id) of the last row served."""
+    ms = (utc(attempted_at) - _EPOCH) // timedelta(milliseconds=1)
+    return base64.urlsafe_b64encode(f"{ms}.{charge_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of `encode_cursor` (naive UTC, as stored); a malformed cursor is a 422."""
+    try:
+        ms, _, oid = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(".")
+        return datetime(1970, 1, 1) + timedelta(milliseconds=int(ms)), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor")
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import math
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.http.schemas.charge import ChargeCreate
+from app.infrastructure.observability.metrics import RATE_LIMITED_TOTAL
+from app.infrastructure.rate_limit import charge_rate_limiter
+
+
+async def limit_charge_rate(payload: ChargeCreate) -> None:
+    """
+    Per-client and per-card token buckets for charge creation. Runs as a route
+    dependency, so a flooding integration gets 429 before any DB work is done.
+    """
+    if not settings.rate_limit_enabled:
+        return
+    limited = await charge_rate_limiter.check({"client": payload.client_id, "card": payload.card_id})
+    if limited is None:
+        return
+    scope, retry_after = limited
+    RATE_LIMITED_TOTAL.labels(scope).inc()
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Rate limit exceeded for {scope}",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
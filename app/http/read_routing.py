@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from app.infrastructure.db.read_routing import offload_reads
+
+
+async def secondary_reads() -> None:
+    """
+    Route dependency: this request's reads may be served by secondaries
+    (READ_PREFERENCE, bounded by READ_MAX_STALENESS_S). Async on purpose:
+    it must run in the request's own context, not in the threadpool.
+    """
+    offload_reads()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.http.security import require_admin
+from app.infrastructure.archive import get_archive
+from app.infrastructure.db.slow_queries import slow_query_log
+from app.infrastructure.observability.profiling import (
+    allocation_tracker,
+    cprofile_event_loop,
+    sample_event_loop,
+)
+from app.jobs.archive import run_archiver
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+# A single profiling session at a time per worker
+_profile_lock = asyncio.Lock()
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0, le=120),
+    fmt: Literal["collapsed", "pstats"] = Query(default="collapsed", alias="format"),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000),
+) -> PlainTextResponse:
+    """
+    Profile this worker's event loop for `seconds` while it keeps serving traffic.
+
+    - collapsed: statistical sampling, one `stack count` line per unique stack
+      (feed it to flamegraph.pl or speedscope).
+    - pstats: cProfile report sorted by cumulative time (higher overhead).
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    async with _profile_lock:
+        if fmt == "pstats":
+            return PlainTextResponse(await cprofile_event_loop(seconds))
+        profiler = await sample_event_loop(seconds, interval=interval_ms / 1000)
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"X-Profile-Samples": str(profiler.samples)},
+    )
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = Query(default=25, ge=1, le=100)) -> dict:
+    """Start tracing allocations (adds memory and CPU overhead until stopped)."""
+    allocation_tracker.start(frames)
+    return {"tracing": True, "frames": frames}
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop() -> dict:
+    """Stop tracing and drop the baseline snapshot."""
+    allocation_tracker.stop()
+    return {"tracing": False}
+
+
+@router.post("/tracemalloc/snapshot")
+async def tracemalloc_snapshot(
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(default=30, ge=1, le=500),
+) -> dict:
+    """Take a snapshot (the new diff baseline) and return the top allocation sites."""
+    if not allocation_tracker.tracing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not tracing")
+    return await run_in_threadpool(allocation_tracker.snapshot, group_by, limit)
+
+
+@router.get("/tracemalloc/diff")
+async def tracemalloc_diff(
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(default=30, ge=1, le=500),
+) -> dict:
+    """Allocation growth since the last snapshot, largest first."""
+    try:
+        return await run_in_threadpool(allocation_tracker.diff, group_by, limit)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = Query(default=20, ge=1, le=500)) -> dict:
+    """
+    Slow Mongo command shapes ranked by total time, with the executionStats
+    explain captured for each shape (null until the background explain runs).
+    """
+    return {"threshold_ms": slow_query_log.threshold_ms, "shapes": slow_query_log.top(limit)}
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def reset_slow_queries() -> Response:
+    """Forget recorded shapes (and re-explain them when they show up again)."""
+    slow_query_log.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/archive")
+async def archive_manifest() -> dict:
+    """Archived months (rows, shard count, when) from the cold-archive manifest."""
+    archive = get_archive()
+    if archive is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="ARCHIVE_DIR is not configured")
+    return archive.manifest()
+
+
+@router.post("/archive")
+async def archive_now(
+    after_days: Optional[int] = Query(default=None, ge=0),
+    dry_run: bool = False,
+) -> dict:
+    """
+    Run the cold archiver now: whole months older than `after_days`
+    (ARCHIVE_AFTER_DAYS by default) are moved out of Mongo.
+    """
+    if get_archive() is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="ARCHIVE_DIR is not configured")
+    cutoff = None
+    if after_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+    archived = await run_archiver(cutoff, dry_run=dry_run)
+    if archived is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another archiver run is in progress")
+    return {"archived": archived, "dry_run": dry_run}
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.config import settings
+from app.http.read_routing import secondary_reads
+from app.http.schemas.charge import ChargeBucketOut, ChargeHistogramOut
+from app.infrastructure.cache import client_version
+from app.infrastructure.charge_histogram import bucket_starts, ceil_bucket, client_histogram, floor_bucket
+
+router = APIRouter(prefix="/clients", tags=["charges"])
+
+# Window when `since` is omitted
+DEFAULT_SPAN = {"hour": timedelta(hours=24), "day": timedelta(days=30)}
+
+
+@router.get(
+    "/{client_id}/charges/histogram",
+    response_model=ChargeHistogramOut,
+    dependencies=[Depends(secondary_reads)],
+)
+async def charge_histogram(
+    client_id: str,
+    bucket: Literal["hour", "day"] = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> ChargeHistogramOut:
+    """
+    A client's charge volume per hour or day (UTC): count, approved /
+    declined, approval rate, approved amount and count per reason_code.
+
+    Query params:
+      - bucket: "hour" (default) | "day"
+      - since: ISO datetime (inclusive), widened to its bucket start;
+        defaults to 24 hours / 30 days before `until`
+      - until: ISO datetime (exclusive), widened to its bucket end; defaults to now
+
+    Every bucket in the window is listed, empty ones included (at most
+    HISTOGRAM_MAX_BUCKETS). Past buckets are cached, so repeated queries
+    only aggregate the current one. Archived charges are not counted.
+    """
+    if not ObjectId.is_valid(client_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
+    now = datetime.now(timezone.utc)
+    end = ceil_bucket(until or now, bucket)
+    start = floor_bucket(since, bucket) if since else end - DEFAULT_SPAN[bucket]
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="since must be before until")
+    starts = bucket_starts(start, end, bucket)
+    if len(starts) > settings.histogram_max_buckets:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Window spans more than {settings.histogram_max_buckets} buckets",
+        )
+    if await client_version(client_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+
+    buckets = await client_histogram(client_id, bucket, starts, now)
+    return ChargeHistogramOut(
+        client_id=client_id,
+        bucket=bucket,
+        since=start,
+        until=end,
+        buckets=[ChargeBucketOut(**b) for b in buckets],
+    )
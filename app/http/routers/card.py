@@ -1,16 +1,38 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from bson import ObjectId
+from pymongo import ReturnDocument
 
+from app.domain.entities.charge import ChargeStatus
+from app.infrastructure.cache import card_version
+from app.infrastructure.db.charge_store import list_card_charge_rows
 from app.infrastructure.db.models import CardDoc, ClientDoc
+from app.infrastructure.db.read_routing import reader
+from app.infrastructure.invalidation import invalidation_bus
+from app.http.etag import (
+    etag_matches,
+    not_modified,
+    precondition_filter,
+    resource_etag,
+    versioned_set,
+    write_failed,
+)
+from app.http.fields import FIELDS_QUERY, dump_partial, dump_partial_list, parse_fields, project_row, projection
+from app.http.pagination import decode_cursor, encode_cursor
+from app.http.read_routing import secondary_reads
 from app.http.schemas.card import CardCreate, CardOut, CardUpdateMeta
+from app.http.schemas.charge import ChargeOut
 from app.domain.rules.luhn import is_valid_luhn, mask_pan, derive_bin_last4
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
+# Longest masked prefix: 19-digit PAN minus last4
+_MASK = "*" * 15
+
 
 def _to_out(doc: CardDoc) -> CardOut:
     """Map a CardDoc (DB) to the API output schema."""
@@ -26,7 +48,7 @@ def _to_out(doc: CardDoc) -> CardOut:
 
 
 @router.post("", response_model=CardOut, status_code=status.HTTP_201_CREATED)
-async def create_card(payload: CardCreate) -> CardOut:
+async def create_card(payload: CardCreate, response: Response) -> CardOut:
     """
     Create a card for a client.
     - Validates PAN with Luhn.
@@ -59,66 +81,154 @@ async def create_card(payload: CardCreate) -> CardOut:
         updated_at=now,
     )
     await doc.insert()
+    response.headers["ETag"] = resource_etag(doc.id, doc.updated_at)
     return _to_out(doc)
 
 
-@router.get("/{card_id}", response_model=CardOut)
-async def get_card(card_id: str) -> CardOut:
-    """Fetch a card by id."""
+@router.get(
+    "/{card_id}",
+    response_model=CardOut,
+    dependencies=[Depends(secondary_reads)],
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Matches `If-None-Match`"}},
+)
+async def get_card(
+    card_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    fields: Optional[str] = FIELDS_QUERY,
+) -> CardOut | Response:
+    """Fetch a card by id (ETag, `If-None-Match` and `fields=` like `GET /clients/{id}`)."""
     if not ObjectId.is_valid(card_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid card_id")
-    doc = await CardDoc.get(ObjectId(card_id))
-    if not doc:
+    selected = parse_fields(fields, CardOut)
+    if if_none_match:
+        version = await card_version(card_id)
+        if version is not None and etag_matches(if_none_match, etag := resource_etag(card_id, version, *(selected or ()))):
+            return not_modified(etag)
+
+    if selected:
+        raw = await reader(CardDoc.get_motor_collection()).find_one(
+            {"_id": ObjectId(card_id)}, projection(selected, "updated_at")
+        )
+        if not raw:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+        return Response(
+            content=dump_partial(CardOut, selected, project_row(raw, selected)),
+            media_type="application/json",
+            headers={"ETag": resource_etag(card_id, raw.get("updated_at"), *selected)},
+        )
+
+    raw = await reader(CardDoc.get_motor_collection()).find_one({"_id": ObjectId(card_id)})
+    if not raw:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+    doc = CardDoc.model_validate(raw)
+    response.headers["ETag"] = resource_etag(card_id, doc.updated_at)
     return _to_out(doc)
 
 
-@router.put("/{card_id}", response_model=CardOut)
-async def update_card_metadata(card_id: str, payload: CardUpdateMeta) -> CardOut:
+@router.get(
+    "/{card_id}/charges",
+    response_model=List[ChargeOut],
+    dependencies=[Depends(secondary_reads)],
+)
+async def list_card_charges(
+    card_id: str,
+    request: Request,
+    status_filter: Optional[Literal["approved", "declined"]] = Query(default=None, alias="status"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    fields: Optional[str] = FIELDS_QUERY,
+) -> Response:
     """
-    Update only derived metadata: BIN and last4.
-    We NEVER accept or store the raw PAN on update.
-    Also keep pan_masked consistent with the new last4.
+    Charge history of a card, newest first, in keyset pages.
+
+    Query params:
+      - status: "approved" | "declined" (optional)
+      - since / until: ISO datetimes ([since, until))
+      - cursor: opaque position returned in the previous page's `Link` header
+      - limit: page size (1..1000)
+      - fields: comma-separated subset of the charge fields (optional)
+
+    Pages are bounded on the (card_id[, status], attempted_at, _id) index, so
+    page N costs the same as page 1. Archived charges are not listed.
     """
     if not ObjectId.is_valid(card_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid card_id")
-
-    doc = await CardDoc.get(ObjectId(card_id))
-    if not doc:
+    selected = parse_fields(fields, ChargeOut) or tuple(ChargeOut.model_fields)
+    after = decode_cursor(cursor) if cursor else None
+    if await card_version(card_id) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
 
-    # Update bin & last4 with simple numeric constraints enforced by schema
-    doc.bin = payload.bin
-    doc.last4 = payload.last4
+    charge_status = ChargeStatus(status_filter) if status_filter else None
+    # One extra row tells whether a next page exists
+    rows = await list_card_charge_rows(
+        card_id, projection(selected), charge_status, since, until, after, limit + 1
+    )
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = request.url.include_query_params(cursor=encode_cursor(rows[-1]["attempted_at"], rows[-1]["_id"]))
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(
+        content=dump_partial_list(ChargeOut, selected, [project_row(r, selected) for r in rows]),
+        media_type="application/json",
+        headers=headers,
+    )
 
-    # Keep masked representation consistent (same length, all masked except last4)
-    masked_len = max(len(doc.pan_masked), 12)  # safety net; create already enforces >=12
-    doc.pan_masked = "*" * (masked_len - 4) + payload.last4
 
-    doc.updated_at = datetime.now(timezone.utc)
-    await doc.save()
-    return CardOut(
-        id=str(doc.id),
-        client_id=str(doc.client_id),
-        pan_masked=doc.pan_masked,
-        last4=doc.last4,
-        bin=doc.bin,
-        created_at=doc.created_at,
-        updated_at=doc.updated_at,
+@router.put(
+    "/{card_id}",
+    response_model=CardOut,
+    responses={status.HTTP_412_PRECONDITION_FAILED: {"description": "`If-Match` names a stale version"}},
+)
+async def update_card_metadata(
+    card_id: str,
+    payload: CardUpdateMeta,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> CardOut:
+    """
+    Update only derived metadata: BIN and last4.
+    We NEVER accept or store the raw PAN on update.
+    Also keep pan_masked consistent with the new last4.
+
+    A single `find_one_and_update`; the masked PAN is rebuilt server-side by
+    an update pipeline, so no prior read is needed. Honours `If-Match` (412).
+    """
+    if not ObjectId.is_valid(card_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid card_id")
+
+    # Same length as before, all masked except the new last4 (>= 12 as a safety net)
+    mask = {"$substrCP": [_MASK, 0, {"$subtract": [{"$max": [{"$strLenCP": "$pan_masked"}, 12]}, 4]}]}
+    raw = await CardDoc.get_motor_collection().find_one_and_update(
+        precondition_filter(ObjectId(card_id), if_match),
+        versioned_set({"bin": payload.bin, "last4": payload.last4}, datetime.now(timezone.utc))
+        + [{"$set": {"pan_masked": {"$concat": [mask, "$last4"]}}}],
+        return_document=ReturnDocument.AFTER,
     )
+    if not raw:
+        raise await write_failed(CardDoc, ObjectId(card_id), if_match, "Card not found")
+    await invalidation_bus.publish("card", card_id)
+
+    doc = CardDoc.model_validate(raw)
+    response.headers["ETag"] = resource_etag(card_id, doc.updated_at)
+    return _to_out(doc)
 
 
 @router.delete(
     "/{card_id}",
     status_code=status.HTTP_204_NO_CONTENT,
     response_class=Response,
+    responses={status.HTTP_412_PRECONDITION_FAILED: {"description": "`If-Match` names a stale version"}},
 )
-async def delete_card(card_id: str) -> Response:
-    """Delete a card by id (204 on success)."""
+async def delete_card(card_id: str, if_match: str | None = Header(default=None)) -> Response:
+    """Delete a card by id with a single `delete_one` (204 on success, `If-Match` honoured)."""
     if not ObjectId.is_valid(card_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid card_id")
-    doc = await CardDoc.get(ObjectId(card_id))
-    if not doc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
-    await doc.delete()
+    result = await CardDoc.find_one(precondition_filter(ObjectId(card_id), if_match)).delete()
+    if not result or not result.deleted_count:
+        raise await write_failed(CardDoc, ObjectId(card_id), if_match, "Card not found")
+    await invalidation_bus.publish("card", card_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
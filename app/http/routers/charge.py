@@ -1,21 +1,55 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timezone
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, status, Query
+from beanie import PydanticObjectId
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from fastapi.responses import JSONResponse
 from bson import ObjectId
 from pymongo.errors import DuplicateKeyError
 
+from app.config import settings
+from app.infrastructure.cache import get_card_entity, get_client_entity
+from app.infrastructure.charge_feed import charge_feed
+from app.infrastructure.db.charge_store import (
+    charge_archived,
+    client_charges_version,
+    find_charge_by_request_id,
+    get_charge,
+    get_charge_row,
+    insert_charge,
+    list_client_charge_rows,
+    list_client_charges,
+    mark_refunded,
+    outbox_events,
+    release_request_id,
+    reserve_request_id,
+)
 from app.infrastructure.db.models import ChargeDoc, ClientDoc, CardDoc
-from app.http.schemas.charge import ChargeCreate, ChargeOut
+from app.infrastructure.db.pending_charges import PendingCharge, pending_charges
+from app.infrastructure.db.write_coalescer import get_charge_writer
+from app.infrastructure.observability.metrics import CHARGES_TOTAL, REFUNDS_TOTAL
+from app.http.etag import etag_matches, make_etag, not_modified
+from app.http.fields import (
+    FIELDS_QUERY,
+    dump_partial_list,
+    parse_fields,
+    partial_model,
+    project_row,
+    projection,
+)
+from app.http.rate_limit import limit_charge_rate
+from app.http.read_routing import secondary_reads
+from app.http.schemas.charge import ChargeAccepted, ChargeCreate, ChargeOut, ChargePersistenceOut
 from app.domain.entities.charge import ChargeStatus
 from app.domain.rules.rules import apply_rules
 
 router = APIRouter(prefix="/charges", tags=["charges"])
 
 
-def _to_out(doc: ChargeDoc) -> ChargeOut:
+def to_out(doc: ChargeDoc) -> ChargeOut:
     """Map a ChargeDoc (DB) to the API output schema."""
     return ChargeOut(
         id=str(doc.id),
@@ -31,14 +65,117 @@ def _to_out(doc: ChargeDoc) -> ChargeOut:
     )
 
 
-@router.post("", response_model=ChargeOut, status_code=status.HTTP_201_CREATED)
-async def create_charge(payload: ChargeCreate) -> ChargeOut:
+def _accepted(entry: PendingCharge) -> JSONResponse:
+    """202 response for a charge queued for asynchronous persistence."""
+    body = ChargeAccepted(**to_out(entry.doc).model_dump())
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=body.model_dump(mode="json"),
+        headers={"Location": f"/charges/by-id/{entry.doc.id}"},
+    )
+
+
+async def _existing_charge(request_id: str) -> ChargeOut:
+    """Charge already created for `request_id` (after losing an idempotency race)."""
+    existing = await find_charge_by_request_id(request_id)
+    if not existing:
+        # Claimed by a charge whose write has not landed yet
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="request_id is being processed")
+    return to_out(existing)
+
+
+def _wants_async(prefer: str | None) -> bool:
+    """RFC 7240 `Prefer: respond-async`."""
+    if not prefer or not settings.async_charges_enabled:
+        return False
+    return any(p.strip().lower() == "respond-async" for p in prefer.split(","))
+
+
+async def _accept_charge_async(payload: ChargeCreate) -> ChargeOut | Response | None:
+    """
+    Decide a charge from cached client/card data and queue it for a batched
+    insert, returning 202 with its pre-allocated id. Returns None when the
+    background writer is not running, so the caller falls back to the
+    synchronous path.
+
+    Idempotency: a request_id still queued returns the same 202, and one
+    already persisted returns its charge (an O(1) lookup), as the synchronous
+    path does. Only a retry racing the first write to Mongo is accepted again
+    and surfaces as `duplicate` when polling.
+    """
+    writer = get_charge_writer()
+    if writer is None:
+        return None
+
+    client = await get_client_entity(payload.client_id)
+    if not client:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+    card = await get_card_entity(payload.card_id)
+    if not card:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
+    if card.client_id != client.id:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Card does not belong to client")
+
+    if payload.request_id:
+        queued = pending_charges.find_request(payload.request_id)
+        if queued:
+            return _accepted(queued)
+        existing = await find_charge_by_request_id(payload.request_id)
+        if existing:
+            return to_out(existing)
+
+    status_decision, reason_code = apply_rules(card, payload.amount)
+    doc = ChargeDoc(
+        id=PydanticObjectId(),
+        client_id=ObjectId(payload.client_id),
+        card_id=ObjectId(payload.card_id),
+        amount=payload.amount,
+        attempted_at=datetime.now(timezone.utc),
+        status=status_decision,
+        reason_code=reason_code,
+        request_id=payload.request_id,
+        outbox=outbox_events("charge"),
+    )
+    try:
+        await reserve_request_id(doc)
+    except DuplicateKeyError:
+        return await _existing_charge(payload.request_id)
+    try:
+        entry = pending_charges.submit(doc, writer)
+    except asyncio.QueueFull:
+        await release_request_id(doc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Charge queue is full",
+            headers={"Retry-After": "1"},
+        )
+    return _accepted(entry)
+
+
+@router.post(
+    "",
+    response_model=ChargeOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_charge_rate)],
+    responses={
+        status.HTTP_202_ACCEPTED: {"model": ChargeAccepted, "description": "Accepted, persisted asynchronously"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Per-client or per-card rate limit exceeded"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Asynchronous charge queue is full"},
+    },
+)
+async def create_charge(
+    payload: ChargeCreate,
+    prefer: str | None = Header(default=None),
+) -> ChargeOut | Response:
     """
     Create a simulated charge.
 
+    - Rate limited per client and per card (429 with Retry-After).
     - Validates client and card existence.
     - Applies business rules (last4 blacklist, amount threshold).
     - Uses idempotency via optional `request_id` (unique & sparse).
+    - With `Prefer: respond-async`, decides from cached data and returns 202;
+      poll `GET /charges/by-id/{id}` for the persistence status.
     """
     # Validate ids
     if not ObjectId.is_valid(payload.client_id):
@@ -46,6 +183,11 @@ async def create_charge(payload: ChargeCreate) -> ChargeOut:
     if not ObjectId.is_valid(payload.card_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid card_id")
 
+    if _wants_async(prefer):
+        accepted = await _accept_charge_async(payload)
+        if accepted is not None:
+            return accepted
+
     client = await ClientDoc.get(ObjectId(payload.client_id))
     if not client:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
@@ -60,10 +202,10 @@ async def create_charge(payload: ChargeCreate) -> ChargeOut:
 
     # Idempotency: if request_id provided and already exists, return the existing charge
     if payload.request_id:
-        existing = await ChargeDoc.find_one(ChargeDoc.request_id == payload.request_id)
+        existing = await find_charge_by_request_id(payload.request_id)
         if existing:
             # 200 OK to indicate we are returning the already-created resource
-            return _to_out(existing)
+            return to_out(existing)
     status_decision, reason_code = apply_rules(card.to_entity(), payload.amount)
     now = datetime.now(timezone.utc)
     doc_data = {
@@ -75,30 +217,85 @@ async def create_charge(payload: ChargeCreate) -> ChargeOut:
         "reason_code": reason_code,
         "refunded": False,
         "refunded_at": None,
+        "outbox": outbox_events("charge"),
     }
     if payload.request_id:
         doc_data["request_id"] = payload.request_id
 
     doc = ChargeDoc(**doc_data)
     try:
-        await doc.insert()
+        # Batched with concurrent charge inserts when the coalescer is running
+        await insert_charge(doc)
     except DuplicateKeyError:
         # In case of a race on idempotency key
         if payload.request_id:
-            existing = await ChargeDoc.find_one(ChargeDoc.request_id == payload.request_id)
-            if existing:
-                return _to_out(existing)
+            return await _existing_charge(payload.request_id)
         raise  # re-raise if something else went wrong
-    return _to_out(doc)
+    CHARGES_TOTAL.labels(status_decision.value, reason_code or "").inc()
+    charge_feed.notify("charge", doc)
+    return to_out(doc)
+
+
+@router.get("/by-id/{charge_id}", response_model=ChargePersistenceOut)
+async def get_charge_status(charge_id: str, fields: Optional[str] = FIELDS_QUERY) -> ChargePersistenceOut | Response:
+    """
+    Persistence status of a charge by id: `queued` while waiting for its
+    batched insert, `persisted` once stored, `failed`/`duplicate` otherwise.
+    `fields=` selects the fields of the embedded charge.
+    """
+    if not ObjectId.is_valid(charge_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid charge_id")
+    selected = parse_fields(fields, ChargeOut)
 
+    entry = pending_charges.get(charge_id)
+    if entry is not None:
+        if selected:
+            return _partial_status(charge_id, entry.state, to_out(entry.doc).model_dump(), selected, entry.detail)
+        return ChargePersistenceOut(
+            id=charge_id, persistence=entry.state, charge=to_out(entry.doc), detail=entry.detail
+        )
 
-@router.get("/{client_id}", response_model=List[ChargeOut])
+    if selected:
+        raw = await get_charge_row(charge_id, projection(selected))
+        if not raw:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Charge not found")
+        return _partial_status(charge_id, "persisted", project_row(raw, selected), selected)
+
+    doc = await get_charge(charge_id)
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Charge not found")
+    return ChargePersistenceOut(id=charge_id, persistence="persisted", charge=to_out(doc))
+
+
+def _partial_status(
+    charge_id: str,
+    persistence: str,
+    charge: Dict[str, Any],
+    selected: Tuple[str, ...],
+    detail: str | None = None,
+) -> JSONResponse:
+    """`ChargePersistenceOut` body whose charge carries only the `fields=` selection."""
+    partial = partial_model(ChargeOut, selected).model_validate(charge)
+    return JSONResponse(
+        {"id": charge_id, "persistence": persistence, "charge": partial.model_dump(mode="json"), "detail": detail}
+    )
+
+
+@router.get(
+    "/{client_id}",
+    response_model=List[ChargeOut],
+    dependencies=[Depends(secondary_reads)],
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Matches `If-None-Match`"}},
+)
 async def list_charges(
     client_id: str,
+    response: Response,
     status_filter: Optional[Literal["approved", "declined"]] = Query(default=None, alias="status"),
     since: Optional[datetime] = None,
     until: Optional[datetime] = None,
-) -> List[ChargeOut]:
+    fields: Optional[str] = FIELDS_QUERY,
+    if_none_match: str | None = Header(default=None),
+) -> List[ChargeOut] | Response:
     """
     List charges for a client, newest first.
 
@@ -106,32 +303,50 @@ async def list_charges(
       - status: "approved" | "declined" (optional)
       - since: ISO datetime (inclusive)
       - until: ISO datetime (exclusive)
+      - fields: comma-separated subset of the charge fields (optional); only
+        those are read from Mongo and serialized
+
+    The ETag covers the filters plus the newest `attempted_at` / `refunded_at`
+    in the range, both read from index keys; a matching `If-None-Match`
+    answers 304 without loading any charge.
     """
     if not ObjectId.is_valid(client_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
+    charge_status = ChargeStatus(status_filter) if status_filter else None
+    selected = parse_fields(fields, ChargeOut)
 
-    q = [ChargeDoc.client_id == ObjectId(client_id)]
-    if status_filter:
-        q.append(ChargeDoc.status == ChargeStatus(status_filter))
-    if since:
-        q.append(ChargeDoc.attempted_at >= since)
-    if until:
-        q.append(ChargeDoc.attempted_at < until)
+    # Computed before the listing: a charge landing in between only costs a spare 200
+    version = await client_charges_version(client_id, charge_status, since, until)
+    etag = make_etag(client_id, status_filter, since, until, *version, *(selected or ()))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    docs = await ChargeDoc.find(*q).sort(-ChargeDoc.attempted_at).to_list()
-    return [_to_out(d) for d in docs]
+    # With partitioning only the months overlapping [since, until) are queried
+    if selected:
+        rows = await list_client_charge_rows(client_id, projection(selected), charge_status, since, until)
+        return Response(
+            content=dump_partial_list(ChargeOut, selected, [project_row(r, selected) for r in rows]),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+    docs = await list_client_charges(client_id, charge_status, since, until)
+    response.headers["ETag"] = etag
+    return [to_out(d) for d in docs]
 
 
 @router.post("/{charge_id}/refund", response_model=ChargeOut)
 async def refund_charge(charge_id: str) -> ChargeOut:
     """
-    Refund an approved charge. Fails with 409 if already refunded or not approved.
+    Refund an approved charge. Fails with 409 if already refunded, not
+    approved, or archived (archived charges are read-only).
     """
     if not ObjectId.is_valid(charge_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid charge_id")
 
-    doc = await ChargeDoc.get(ObjectId(charge_id))
+    doc = await get_charge(charge_id)
     if not doc:
+        if await charge_archived(charge_id):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Charge archived")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Charge not found")
 
     if doc.status != ChargeStatus.approved:
@@ -139,8 +354,9 @@ async def refund_charge(charge_id: str) -> ChargeOut:
     if doc.refunded:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Charge already refunded")
 
-    doc.refunded = True
-    doc.refunded_at = datetime.now(timezone.utc)
-    await doc.save()
+    if not await mark_refunded(doc):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Charge already refunded")
+    REFUNDS_TOTAL.inc()
+    charge_feed.notify("refund", doc)
 
-    return _to_out(doc)
+    return to_out(doc)
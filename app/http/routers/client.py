@@ -1,13 +1,32 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import JSONResponse
 from bson import ObjectId
+from pymongo import ReturnDocument
 
+from app.infrastructure.cache import client_version
 from app.infrastructure.db.models import ClientDoc
+from app.infrastructure.db.read_routing import reader
+from app.infrastructure.invalidation import invalidation_bus
+from app.jobs.cascade import enqueue_client_delete
+from app.jobs.runner import discard_job, release_job
+from app.http.etag import (
+    etag_matches,
+    not_modified,
+    precondition_filter,
+    resource_etag,
+    versioned_set,
+    write_failed,
+)
+from app.http.fields import FIELDS_QUERY, dump_partial, parse_fields, project_row, projection
+from app.http.read_routing import secondary_reads
+from app.http.routers.jobs import to_out as job_out
 from app.http.schemas.client import ClientCreate, ClientUpdate, ClientOut
+from app.http.schemas.job import JobOut
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
@@ -25,7 +44,7 @@ def _to_out(doc: ClientDoc) -> ClientOut:
 
 
 @router.post("", response_model=ClientOut, status_code=status.HTTP_201_CREATED)
-async def create_client(payload: ClientCreate) -> ClientOut:
+async def create_client(payload: ClientCreate, response: Response) -> ClientOut:
     """
     Create a new client.
     """
@@ -38,61 +57,121 @@ async def create_client(payload: ClientCreate) -> ClientOut:
         updated_at=now,
     )
     await doc.insert()
+    response.headers["ETag"] = resource_etag(doc.id, doc.updated_at)
     return _to_out(doc)
 
 
-@router.get("/{client_id}", response_model=ClientOut)
-async def get_client(client_id: str) -> ClientOut:
+@router.get(
+    "/{client_id}",
+    response_model=ClientOut,
+    dependencies=[Depends(secondary_reads)],
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Matches `If-None-Match`"}},
+)
+async def get_client(
+    client_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    fields: Optional[str] = FIELDS_QUERY,
+) -> ClientOut | Response:
     """
     Fetch a client by id.
+
+    Carries a strong ETag (`_id` + `updated_at`). With a matching
+    `If-None-Match` it answers 304, validated from the entity cache or a
+    covered index scan without loading the document. `fields=` returns only
+    the listed fields, fetched with a Mongo projection.
     """
     if not ObjectId.is_valid(client_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
-    doc = await ClientDoc.get(ObjectId(client_id))
-    if not doc:
+    selected = parse_fields(fields, ClientOut)
+    if if_none_match:
+        version = await client_version(client_id)
+        if version is not None and etag_matches(if_none_match, etag := resource_etag(client_id, version, *(selected or ()))):
+            return not_modified(etag)
+
+    if selected:
+        raw = await reader(ClientDoc.get_motor_collection()).find_one(
+            {"_id": ObjectId(client_id)}, projection(selected, "updated_at")
+        )
+        if not raw:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+        return Response(
+            content=dump_partial(ClientOut, selected, project_row(raw, selected)),
+            media_type="application/json",
+            headers={"ETag": resource_etag(client_id, raw.get("updated_at"), *selected)},
+        )
+
+    raw = await reader(ClientDoc.get_motor_collection()).find_one({"_id": ObjectId(client_id)})
+    if not raw:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+    doc = ClientDoc.model_validate(raw)
+    response.headers["ETag"] = resource_etag(client_id, doc.updated_at)
     return _to_out(doc)
 
 
-@router.put("/{client_id}", response_model=ClientOut)
-async def update_client(client_id: str, payload: ClientUpdate) -> ClientOut:
+@router.put(
+    "/{client_id}",
+    response_model=ClientOut,
+    responses={status.HTTP_412_PRECONDITION_FAILED: {"description": "`If-Match` names a stale version"}},
+)
+async def update_client(
+    client_id: str,
+    payload: ClientUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None),
+) -> ClientOut:
     """
     Update client fields (partial).
+
+    One atomic `find_one_and_update` that sets only the provided fields.
+    With `If-Match: <etag>` the write only applies to that version (412 otherwise).
     """
     if not ObjectId.is_valid(client_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
-    doc = await ClientDoc.get(ObjectId(client_id))
+    query = precondition_filter(ObjectId(client_id), if_match)
+
+    changes = payload.model_dump(exclude_none=True)
+    if changes:
+        raw = await ClientDoc.get_motor_collection().find_one_and_update(
+            query, versioned_set(changes, datetime.now(timezone.utc)), return_document=ReturnDocument.AFTER
+        )
+        doc = ClientDoc.model_validate(raw) if raw else None
+        await invalidation_bus.publish("client", client_id)
+    else:
+        doc = await ClientDoc.find_one(query)
     if not doc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
-
-    updated = False
-    if payload.name is not None:
-        doc.name = payload.name
-        updated = True
-    if payload.phone is not None:
-        doc.phone = payload.phone
-        updated = True
-
-    if updated:
-        doc.updated_at = datetime.now(timezone.utc)
-        await doc.save()
+        raise await write_failed(ClientDoc, ObjectId(client_id), if_match, "Client not found")
 
+    response.headers["ETag"] = resource_etag(client_id, doc.updated_at)
     return _to_out(doc)
 
 
 @router.delete(
     "/{client_id}",
-    status_code=status.HTTP_204_NO_CONTENT,
-    response_class=Response,
+    response_model=JobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={status.HTTP_412_PRECONDITION_FAILED: {"description": "`If-Match` names a stale version"}},
 )
-async def delete_client(client_id: str) -> Response:
+async def delete_client(client_id: str, if_match: str | None = Header(default=None)) -> JSONResponse:
     """
-    Delete a client by id. Returns 204 on success.
+    Delete a client by id with a single `delete_one` (honours `If-Match`
+    like the update) and hand its cards and charges to a background
+    cascade-delete job. Returns 202 with the job; poll `GET /jobs/{id}`.
+
+    The job is enqueued (held) before the delete, so no crash or
+    cancellation in between can leave the client's data without one.
     """
     if not ObjectId.is_valid(client_id):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
-    doc = await ClientDoc.get(ObjectId(client_id))
-    if not doc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
-    await doc.delete()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    job = await enqueue_client_delete(client_id)
+    result = await ClientDoc.find_one(precondition_filter(ObjectId(client_id), if_match)).delete()
+    if not result or not result.deleted_count:
+        await discard_job(job)
+        raise await write_failed(ClientDoc, ObjectId(client_id), if_match, "Client not found")
+    await release_job(job)
+    await invalidation_bus.publish("client", client_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job_out(job).model_dump(mode="json"),
+        headers={"Location": f"/jobs/{job.id}"},
+    )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.infrastructure.cache import client_version
+from app.infrastructure.charge_feed import ChargeEvent, EventKey, SubscriberDropped, charge_feed, events_since
+from app.http.pagination import decode_cursor, encode_cursor
+from app.http.read_routing import secondary_reads
+from app.http.routers.charge import to_out
+
+router = APIRouter(prefix="/clients", tags=["charges"])
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 1000
+
+
+def _frame(event: ChargeEvent) -> str:
+    """One SSE message; its id is the resume position sent back as `Last-Event-ID`."""
+    return f"id: {encode_cursor(*event.key)}\nevent: {event.kind}\ndata: {to_out(event.doc).model_dump_json()}\n\n"
+
+
+async def _stream(client_id: str, after: Optional[EventKey]) -> AsyncIterator[str]:
+    # Subscribe before catching up, so nothing written meanwhile is missed
+    sub = charge_feed.subscribe(client_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        if after is not None:
+            backlog, more = await events_since(client_id, after, settings.charge_feed_replay_max)
+            for event in backlog:
+                yield _frame(event)
+                after = event.key
+            if more:
+                return  # the client reconnects right away from the last id for the next batch
+        while True:
+            event = await sub.get(timeout=settings.charge_feed_heartbeat_s)
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif after is None or event.key > after:  # skip what the catch-up already sent
+                yield _frame(event)
+    except SubscriberDropped:
+        return  # fell behind; the client resumes from its last id
+    finally:
+        charge_feed.unsubscribe(sub)
+
+
+@router.get(
+    "/{client_id}/charges/stream",
+    response_class=StreamingResponse,
+    dependencies=[Depends(secondary_reads)],
+    responses={status.HTTP_200_OK: {"content": {"text/event-stream": {}}}},
+)
+async def stream_client_charges(
+    client_id: str,
+    last_event_id: str | None = Header(default=None),
+) -> StreamingResponse:
+    """
+    Live feed of a client's charges and refunds as Server-Sent Events
+    (`event: charge` / `event: refund`, `data:` a charge).
+
+    With `Last-Event-ID` the events missed since that id are sent first,
+    read from the (client_id, attempted_at) and refund indexes, up to
+    CHARGE_FEED_REPLAY_MAX per connection. A subscriber that falls behind
+    is disconnected and resumes the same way.
+    """
+    if not ObjectId.is_valid(client_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid client_id")
+    after = decode_cursor(last_event_id) if last_event_id else None
+    if await client_version(client_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+    return StreamingResponse(
+        _stream(client_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
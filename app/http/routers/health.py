@@ -1,8 +1,26 @@
+import pymongo
+from pymongo.errors import PyMongoError
 from fastapi import APIRouter
 
+from app.config import settings
+from app.infrastructure.db.breaker import data_breaker
+from app.infrastructure.db.models import ClientDoc
+
 router = APIRouter()
 
 
 @router.get("/health", tags=["health"])
 async def health() -> dict:
-    return {"status": "ok"}
+    """
+    Liveness. While the data-layer circuit is half-open this is also its
+    probe: one `ping` decides whether API requests may use Mongo again.
+    """
+    if settings.breaker_enabled and data_breaker.probe_due():
+        try:
+            with pymongo.timeout(settings.breaker_probe_timeout_ms / 1000):
+                await ClientDoc.get_motor_collection().database.command("ping")
+        except PyMongoError:
+            data_breaker.probe_result(False)
+        else:
+            data_breaker.probe_result(True)
+    return {"status": "ok" if data_breaker.state == "closed" else "degraded", "database": data_breaker.state}
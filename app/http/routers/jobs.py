@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, status
+
+from app.infrastructure.db.models import JobDoc
+from app.http.schemas.job import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def to_out(doc: JobDoc) -> JobOut:
+    """Map a JobDoc (DB) to the API output schema."""
+    return JobOut(
+        id=str(doc.id),
+        kind=doc.kind,
+        status=doc.status,
+        params=doc.params,
+        progress=doc.progress,
+        attempts=doc.attempts,
+        error=doc.error,
+        created_at=doc.created_at,
+        updated_at=doc.updated_at,
+        finished_at=doc.finished_at,
+    )
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: str) -> JobOut:
+    """Status and progress of a background job (e.g. a client cascade delete)."""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid job_id")
+    doc = await JobDoc.get(ObjectId(job_id))
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return to_out(doc)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Literal
+from typing import Dict, List, Literal
 from pydantic import BaseModel, Field
 
 
@@ -25,3 +25,36 @@ class ChargeOut(BaseModel):
     refunded: bool
     refunded_at: datetime | None
     request_id: str | None
+
+
+class ChargeAccepted(ChargeOut):
+    """Decision returned with 202 when the charge is persisted asynchronously."""
+    persistence: Literal["queued"] = "queued"
+
+
+class ChargePersistenceOut(BaseModel):
+    """Persistence status of a charge accepted asynchronously."""
+    id: str
+    persistence: Literal["queued", "persisted", "failed", "duplicate"]
+    charge: ChargeOut | None = None
+    detail: str | None = None
+
+
+class ChargeBucketOut(BaseModel):
+    """Charges attempted in one time bucket [start, start + bucket)."""
+    start: datetime
+    count: int
+    approved: int
+    declined: int
+    approval_rate: float | None
+    approved_amount: float
+    reason_codes: Dict[str, int]
+
+
+class ChargeHistogramOut(BaseModel):
+    """A client's charges per hour or day over [since, until), oldest bucket first."""
+    client_id: str
+    bucket: Literal["hour", "day"]
+    since: datetime
+    until: datetime
+    buckets: List[ChargeBucketOut]
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Literal
+
+from pydantic import BaseModel
+
+
+class JobOut(BaseModel):
+    """Status and progress of a background job."""
+    id: str
+    kind: str
+    status: Literal["queued", "running", "done", "failed"]
+    params: Dict[str, Any]
+    progress: Dict[str, int]
+    attempts: int
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None
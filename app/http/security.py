@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import secrets
+
+from fastapi import Header, HTTPException, status
+
+from app.config import settings
+
+
+async def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """
+    Guard for operational endpoints. Admin access is disabled unless
+    ADMIN_TOKEN is configured; the token is compared in constant time.
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from app.config import settings
+from app.infrastructure.db.partitions import month_key, overlapping
+
+MAGIC = b"CHARC1\n"
+FORMAT_VERSION = 1
+BLOCK_ROWS = 4096
+ID_SIZE = 12
+_STATUSES = ("approved", "declined")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_ms(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _from_ms(ms: int) -> datetime:
+    # Naive UTC, exactly what Mongo hands back for the hot documents
+    return datetime(1970, 1, 1) + timedelta(milliseconds=ms)
+
+
+def shard_of(client_id: Any, shards: int) -> int:
+    """Stable client-hash shard (independent of PYTHONHASHSEED)."""
+    digest = hashlib.blake2b(ObjectId(client_id).binary, digest_size=4).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """[start, end) of a `YYYYMM` month as aware UTC datetimes."""
+    year, mon = int(month[:4]), int(month[4:])
+    start = datetime(year, mon, 1, tzinfo=timezone.utc)
+    end = datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+# -----------------------------
+# Block codec
+# -----------------------------
+def _pack(*sections: bytes) -> bytes:
+    return b"".join(struct.pack("<I", len(s)) + s for s in sections)
+
+
+def _unpack(data: bytes) -> List[bytes]:
+    sections, pos = [], 0
+    while pos < len(data):
+        (size,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        sections.append(data[pos : pos + size])
+        pos += size
+    return sections
+
+
+def encode_block(client_id: ObjectId, rows: Sequence[Dict[str, Any]]) -> bytes:
+    """
+    Encode one client's charges column by column and zlib the result.
+
+    Ids are raw 12-byte columns, timestamps int64 milliseconds with
+    `attempted_at` delta-encoded, card ids and reason codes dictionary-encoded,
+    so repetitive columns shrink to almost nothing once compressed.
+    """
+    cards: Dict[ObjectId, int] = {}
+    reasons: Dict[Optional[str], int] = {}
+    attempted = array("q")
+    previous = 0
+    for row in rows:
+        ms = _to_ms(row["attempted_at"])
+        attempted.append(ms - previous)
+        previous = ms
+
+    body = _pack(
+        client_id.binary,
+        b"".join(ObjectId(r["_id"]).binary for r in rows),
+        attempted.tobytes(),
+        array("d", (float(r["amount"]) for r in rows)).tobytes(),
+        bytes(_STATUSES.index(r["status"]) for r in rows),
+        array("I", (cards.setdefault(ObjectId(r["card_id"]), len(cards)) for r in rows)).tobytes(),
+        b"".join(card.binary for card in cards),
+        bytes(reasons.setdefault(r.get("reason_code"), len(reasons)) for r in rows),
+        json.dumps(list(reasons)).encode(),
+        array("q", (_to_ms(r["refunded_at"]) if r.get("refunded_at") else -1 for r in rows)).tobytes(),
+        bytes(1 if r.get("refunded") else 0 for r in rows),
+        json.dumps([r.get("request_id") for r in rows]).encode(),
+    )
+    return zlib.compress(body, 6)
+
+
+def decode_block(data: bytes) -> List[Dict[str, Any]]:
+    """Inverse of `encode_block`: raw charge documents shaped like Mongo's."""
+    (client, ids, attempted_raw, amounts_raw, statuses, card_idx_raw, card_dict,
+     reason_idx, reason_dict, refunded_at_raw, refunded, request_ids) = _unpack(zlib.decompress(data))
+
+    client_id = ObjectId(client)
+    attempted, amounts = array("q"), array("d")
+    attempted.frombytes(attempted_raw)
+    amounts.frombytes(amounts_raw)
+    card_idx, refunded_at = array("I"), array("q")
+    card_idx.frombytes(card_idx_raw)
+    refunded_at.frombytes(refunded_at_raw)
+    card_ids = [ObjectId(card_dict[i : i + 12]) for i in range(0, len(card_dict), 12)]
+    reason_codes = json.loads(reason_dict)
+    requests = json.loads(request_ids)
+
+    rows, ms = [], 0
+    for i in range(len(attempted)):
+        ms += attempted[i]
+        rows.append({
+            "_id": ObjectId(ids[i * 12 : i * 12 + 12]),
+            "client_id": client_id,
+            "card_id": card_ids[card_idx[i]],
+            "amount": amounts[i],
+            "attempted_at": _from_ms(ms),
+            "status": _STATUSES[statuses[i]],
+            "reason_code": reason_codes[reason_idx[i]],
+            "refunded": bool(refunded[i]),
+            "refunded_at": _from_ms(refunded_at[i]) if refunded_at[i] >= 0 else None,
+            "request_id": requests[i],
+        })
+    return rows
+
+
+# -----------------------------
+# Files
+# -----------------------------
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class ShardWriter:
+    """
+    Writes one `YYYYMM/shard-NN.charges` file plus its `.idx.json` sidecar.
+    Rows must arrive grouped by client, newest first within a client.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.rows = 0
+        self._index: Dict[str, List[List[int]]] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = path.with_name(path.name + ".tmp")
+        self._fh = open(self._tmp, "wb")
+        self._fh.write(MAGIC)
+
+    def write_client(self, client_id: ObjectId, rows: Sequence[Dict[str, Any]]) -> None:
+        for start in range(0, len(rows), BLOCK_ROWS):
+            chunk = rows[start : start + BLOCK_ROWS]
+            block = encode_block(client_id, chunk)
+            offset = self._fh.tell()
+            self._fh.write(block)
+            newest, oldest = _to_ms(chunk[0]["attempted_at"]), _to_ms(chunk[-1]["attempted_at"])
+            self._index.setdefault(str(client_id), []).append([offset, len(block), len(chunk), oldest, newest])
+            self.rows += len(chunk)
+
+    def close(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+        sidecar = {"version": FORMAT_VERSION, "rows": self.rows, "clients": self._index}
+        _write_atomic(self.path.with_suffix(".idx.json"), json.dumps(sidecar).encode())
+
+
+class ChargeArchive:
+    """
+    Read side of the cold archive rooted at `root`.
+
+    `manifest.json` lists archived months (and their shard count); the sidecar
+    indexes are small and cached by mtime, so a lookup touches only the blocks
+    of one client in one shard file per month. Each month also keeps its
+    charge ids sorted in `ids.bin`, so whether an id is archived is a binary search.
+    """
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        self.root = Path(root)
+        self._manifest: Tuple[int, Dict[str, Any]] = (-1, {})
+        self._sidecars: Dict[Path, Tuple[int, Dict[str, Any]]] = {}
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    def shard_path(self, month: str, shard: int) -> Path:
+        return self.root / month / f"shard-{shard:02d}.charges"
+
+    def ids_path(self, month: str) -> Path:
+        return self.root / month / "ids.bin"
+
+    def manifest(self) -> Dict[str, Any]:
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {"version": FORMAT_VERSION, "months": {}}
+        if mtime != self._manifest[0]:
+            self._manifest = (mtime, json.loads(self.manifest_path.read_bytes()))
+        return self._manifest[1]
+
+    def record_month(self, month: str, shards: int, rows: int) -> None:
+        manifest = self.manifest()
+        months = dict(manifest.get("months", {}))
+        months[month] = {"shards": shards, "rows": rows, "archived_at": datetime.now(timezone.utc).isoformat()}
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.manifest_path, json.dumps({"version": FORMAT_VERSION, "months": months}).encode())
+
+    def write_ids(self, month: str, ids: Iterable[Any]) -> None:
+        """Store the ids of a month's archived charges (before the month is recorded)."""
+        path = self.ids_path(month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, b"".join(sorted(ObjectId(i).binary for i in ids)))
+
+    def _month_has(self, month: str, key: bytes) -> bool:
+        try:
+            fh = open(self.ids_path(month), "rb")
+        except FileNotFoundError:
+            return False  # month archived before ids were kept
+        with fh:
+            low, high = 0, os.fstat(fh.fileno()).st_size // ID_SIZE
+            while low < high:
+                mid = (low + high) // 2
+                fh.seek(mid * ID_SIZE)
+                probe = fh.read(ID_SIZE)
+                if probe == key:
+                    return True
+                if probe < key:
+                    low = mid + 1
+                else:
+                    high = mid
+        return False
+
+    def contains(self, charge_id: Any) -> bool:
+        """Whether a charge is archived: its id's month first, then the other archived months."""
+        charge_id = ObjectId(charge_id)
+        months = self.months()
+        hint = month_key(charge_id.generation_time)
+        order = ([hint] if hint in months else []) + [m for m in months if m != hint]
+        return any(self._month_has(month, charge_id.binary) for month in order)
+
+    def months(self) -> List[str]:
+        return sorted(self.manifest().get("months", {}), reverse=True)
+
+    def archived_before(self) -> Optional[datetime]:
+        """End of the newest archived month: nothing at or after it is in the archive."""
+        months = self.months()
+        return month_bounds(months[0])[1] if months else None
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        """Whether a range starting at `since` reaches into archived time."""
+        watermark = self.archived_before()
+        if watermark is None:
+            return False
+        return since is None or (since if since.tzinfo else since.replace(tzinfo=timezone.utc)) < watermark
+
+    def _sidecar(self, path: Path) -> Dict[str, Any]:
+        idx = path.with_suffix(".idx.json")
+        mtime = idx.stat().st_mtime_ns
+        cached = self._sidecars.get(idx)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, json.loads(idx.read_bytes()))
+            self._sidecars[idx] = cached
+        return cached[1]
+
+    def _read_blocks(self, path: Path, blocks: Iterable[Sequence[int]]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        with open(path, "rb") as fh:
+            for offset, length, *_ in blocks:
+                fh.seek(offset)
+                rows.extend(decode_block(fh.read(length)))
+        return rows
+
+    async def iter_client(
+        self,
+        client_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        status: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        A client's archived charges in [since, until), newest first. Each
+        month's matching blocks are read and decoded off the event loop and
+        yielded before the next month is touched.
+        """
+        months = self.manifest().get("months", {})
+        low = _to_ms(since) if since else None
+        high = _to_ms(until) if until else None
+        for month in overlapping(months, since, until):
+            path = self.shard_path(month, shard_of(client_id, months[month]["shards"]))
+            if not path.exists():
+                continue
+            blocks = [
+                b for b in self._sidecar(path)["clients"].get(str(client_id), [])
+                if (low is None or b[4] >= low) and (high is None or b[3] < high)
+            ]
+            if not blocks:
+                continue
+            for row in await asyncio.to_thread(self._read_blocks, path, blocks):
+                ms = _to_ms(row["attempted_at"])
+                if low is not None and ms < low:
+                    continue
+                if high is not None and ms >= high:
+                    continue
+                if status and row["status"] != status:
+                    continue
+                yield row
+
+
+    async def get_client_charge(self, client_id: Any, charge_id: Any, month: str) -> Optional[Dict[str, Any]]:
+        """One archived charge of a client, from the month it was archived in."""
+        start, end = month_bounds(month)
+        async for row in self.iter_client(str(client_id), start, end):
+            if row["_id"] == ObjectId(charge_id):
+                return row
+        return None
+
+
+_archives: Dict[str, ChargeArchive] = {}
+
+
+def get_archive() -> Optional[ChargeArchive]:
+    """Archive configured by ARCHIVE_DIR, or None when archiving is disabled."""
+    if not settings.archive_dir:
+        return None
+    archive = _archives.get(settings.archive_dir)
+    if archive is None:
+        archive = _archives[settings.archive_dir] = ChargeArchive(settings.archive_dir)
+    return archive
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Generic, Hashable, Optional, Tuple, Type, TypeVar
+
+from bson import ObjectId
+
+from app.config import settings
+from app.domain.entities.card import Card
+from app.domain.entities.client import Client
+from app.infrastructure.db.models import VERSION_INDEX, CardDoc, ClientDoc
+from app.infrastructure.db.read_routing import reader
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded LRU map whose entries expire `ttl` seconds after being stored.
+    Every operation is O(1); expired entries are dropped lazily on access and
+    the least recently used one is evicted when `maxsize` is exceeded.
+
+    Fills race with invalidations: a value loaded before an invalidation must
+    not be stored after it. Read `generation(key)` before loading and pass it
+    to `set`, which skips the store when the key was invalidated meanwhile.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        # Invalidation count of recently invalidated keys (LRU, at most maxsize)
+        self._generations: OrderedDict[K, int] = OrderedDict()
+        # Bumped by clear() and when a key's count is forgotten, voiding every pending fill
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires <= self._clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def generation(self, key: K) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key: K, value: V, generation: Optional[Tuple[int, int]] = None) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        if generation is not None and generation != self.generation(key):
+            return  # invalidated while the value was being loaded
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._generations.move_to_end(key)
+        if len(self._generations) > max(self.maxsize, 1):
+            self._generations.popitem(last=False)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+
+# -----------------------------
+# Entity caches (domain entities, never Beanie documents)
+# -----------------------------
+client_cache: TTLCache[str, Client] = TTLCache(settings.entity_cache_size, settings.entity_cache_ttl_s)
+card_cache: TTLCache[str, Card] = TTLCache(settings.entity_cache_size, settings.entity_cache_ttl_s)
+
+
+async def get_client_entity(client_id: str) -> Optional[Client]:
+    """Client by id from the cache, loading (and caching, unless invalidated meanwhile) it on a miss."""
+    entity = client_cache.get(client_id)
+    if entity is None:
+        generation = client_cache.generation(client_id)
+        doc = await ClientDoc.get(ObjectId(client_id))
+        if doc is None:
+            return None
+        entity = doc.to_entity()
+        client_cache.set(client_id, entity, generation)
+    return entity
+
+
+async def get_card_entity(card_id: str) -> Optional[Card]:
+    """Card by id from the cache, loading (and caching, unless invalidated meanwhile) it on a miss."""
+    entity = card_cache.get(card_id)
+    if entity is None:
+        generation = card_cache.generation(card_id)
+        doc = await CardDoc.get(ObjectId(card_id))
+        if doc is None:
+            return None
+        entity = doc.to_entity()
+        card_cache.set(card_id, entity, generation)
+    return entity
+
+
+async def _version(cache: TTLCache, doc_cls: Type[ClientDoc | CardDoc], entity_id: str) -> Optional[datetime]:
+    """
+    `updated_at` of a document: from its cached entity when present, else from
+    a covered `{_id, updated_at}` index scan (no document fetch). None when
+    the document does not exist.
+    """
+    entity = cache.get(entity_id)
+    if entity is not None:
+        return entity.updated_at
+    cursor = (
+        reader(doc_cls.get_motor_collection())
+        .find({"_id": ObjectId(entity_id)}, {"_id": 1, "updated_at": 1})
+        .hint(VERSION_INDEX)
+        .limit(1)
+    )
+    async for raw in cursor:
+        return raw.get("updated_at")
+    return None
+
+
+async def client_version(client_id: str) -> Optional[datetime]:
+    return await _version(client_cache, ClientDoc, client_id)
+
+
+async def card_version(card_id: str) -> Optional[datetime]:
+    return await _version(card_cache, CardDoc, card_id)
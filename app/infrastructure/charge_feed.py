@@ -0,0 +1,204 @@
+"""
+In-process fan-out of charge events to live subscribers (the SSE charge feed).
+
+Write paths call `charge_feed.notify` once a charge is persisted or
+refunded; every subscriber of that client gets the event on its own bounded
+queue. A subscriber that falls `CHARGE_FEED_QUEUE` events behind is dropped
+rather than buffered without limit: its stream ends and the client resumes
+with `Last-Event-ID`, catching up from the indexes (`events_since`).
+
+With `CHARGE_FEED_SOURCE=change_stream` events come from a Mongo change
+stream on the charge collections instead, so writes made by any worker
+reach every worker's subscribers (needs a replica set).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.config import settings
+from app.domain.entities.charge import ChargeStatus
+from app.infrastructure.db.charge_store import client_changes_since
+from app.infrastructure.db.models import ChargeDoc
+from app.infrastructure.db.partitions import PARTITION_RE, utc
+from app.infrastructure.observability.metrics import CHARGE_FEED_DROPPED_TOTAL, CHARGE_FEED_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+EventKind = Literal["charge", "refund"]
+# Position of an event in a client's feed: (time in ms, naive UTC; charge id)
+EventKey = Tuple[datetime, ObjectId]
+
+
+def event_key(at: datetime, charge_id: ObjectId) -> EventKey:
+    at = utc(at).replace(tzinfo=None)
+    return at - timedelta(microseconds=at.microsecond % 1000), charge_id
+
+
+@dataclass(frozen=True)
+class ChargeEvent:
+    kind: EventKind
+    doc: ChargeDoc
+
+    @property
+    def key(self) -> EventKey:
+        at = self.doc.refunded_at if self.kind == "refund" and self.doc.refunded_at else self.doc.attempted_at
+        return event_key(at, self.doc.id)
+
+
+class SubscriberDropped(Exception):
+    """The subscriber fell too far behind and was disconnected from the feed."""
+
+
+class Subscription:
+    def __init__(self, client_id: str, maxsize: int) -> None:
+        self.client_id = client_id
+        self.queue: asyncio.Queue[Optional[ChargeEvent]] = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def drop(self) -> None:
+        # Make room for the sentinel; the backlog is replayed from Mongo on resume
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[ChargeEvent]:
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is None:
+            raise SubscriberDropped(self.client_id)
+        return event
+
+
+class ChargeFeed:
+    def __init__(self, queue_size: int = 256) -> None:
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, client_id: str) -> Subscription:
+        sub = Subscription(client_id, self.queue_size)
+        self._subscribers.setdefault(client_id, set()).add(sub)
+        CHARGE_FEED_SUBSCRIBERS.labels().inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.client_id)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.client_id]
+        CHARGE_FEED_SUBSCRIBERS.labels().dec()
+
+    def publish(self, event: ChargeEvent) -> None:
+        """Hand `event` to the client's subscribers; never blocks the writer."""
+        for sub in list(self._subscribers.get(str(event.doc.client_id), ())):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sub.drop()
+                self.unsubscribe(sub)
+                CHARGE_FEED_DROPPED_TOTAL.inc()
+
+    def notify(self, kind: EventKind, doc: ChargeDoc) -> None:
+        """Called by write paths; ignored when the change stream is the source."""
+        if settings.charge_feed_source == "local":
+            self.publish(ChargeEvent(kind, doc))
+
+
+charge_feed = ChargeFeed(queue_size=settings.charge_feed_queue)
+
+
+# -----------------------------
+# Resume (Last-Event-ID)
+# -----------------------------
+async def events_since(client_id: str, after: EventKey, limit: int) -> Tuple[List[ChargeEvent], bool]:
+    """
+    A client's charges attempted and refunded after `after`, oldest first, up
+    to `limit`; the flag tells whether more remain. Reads the (client_id,
+    attempted_at) index and the partial (client_id, refunded_at) index.
+    """
+    charges, refunds = await client_changes_since(client_id, after[0], limit + 1)
+    events = [ChargeEvent("charge", d) for d in charges] + [ChargeEvent("refund", d) for d in refunds]
+    events = sorted((e for e in events if e.key > after), key=lambda e: e.key)
+    return events[:limit], len(events) > limit
+
+
+# -----------------------------
+# Change stream source (CHARGE_FEED_SOURCE=change_stream)
+# -----------------------------
+# `charges` and its monthly partitions
+_COLLECTIONS = f"^{ChargeDoc.Settings.name}$|{PARTITION_RE.pattern}"
+_watcher: Optional[asyncio.Task] = None
+
+
+def _charge_doc(raw: Dict[str, Any]) -> ChargeDoc:
+    """
+    ChargeDoc of a change event's stored document, built without validation:
+    it was validated when written, and Beanie's constructor needs an
+    initialized collection, which this pure mapping should not depend on.
+    """
+    return ChargeDoc.model_construct(**{**raw, "status": ChargeStatus(raw["status"])})
+
+
+def _event_from_change(change: Dict[str, Any]) -> Optional[ChargeEvent]:
+    doc = change.get("fullDocument")
+    if not doc:
+        return None
+    if change["operationType"] == "insert":
+        return ChargeEvent("charge", _charge_doc(doc))
+    updated = change.get("updateDescription", {}).get("updatedFields", {})
+    if "refunded_at" in updated or change["operationType"] == "replace":
+        if doc.get("refunded_at"):
+            return ChargeEvent("refund", _charge_doc(doc))
+    return None
+
+
+async def _watch_forever() -> None:
+    db = ChargeDoc.get_motor_collection().database
+    pipeline = [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}, "ns.coll": {"$regex": _COLLECTIONS}}}
+    ]
+    resume_token = None
+    backoff = 1.0
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                backoff = 1.0
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    event = _event_from_change(change)
+                    if event is not None:
+                        charge_feed.publish(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # transient errors: resume where the stream stopped
+            logger.exception("charge change stream failed, retrying in %.0fs", backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def start_charge_feed() -> None:
+    global _watcher
+    if settings.charge_feed_source == "change_stream" and _watcher is None:
+        _watcher = asyncio.create_task(_watch_forever())
+
+
+async def stop_charge_feed() -> None:
+    global _watcher
+    if _watcher is not None:
+        task, _watcher = _watcher, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,104 @@
+"""
+Per-client charge histograms (volume, approval rate and reason codes per
+hour or day).
+
+Charges never move between buckets: `attempted_at` is fixed and a refund
+does not change a charge's status. A bucket that ended more than
+HISTOGRAM_SETTLE_S ago is therefore final and cached as is. Repeated queries
+for a dashboard window then aggregate only the buckets still open (or
+evicted). The settle period covers charges accepted asynchronously that are
+still being written, and secondaries lagging up to READ_MAX_STALENESS_S.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Literal, Tuple
+
+from app.config import settings
+from app.infrastructure.cache import TTLCache
+from app.infrastructure.db.charge_store import client_charge_groups
+from app.infrastructure.db.partitions import utc
+
+BucketUnit = Literal["hour", "day"]
+STEPS: Dict[str, timedelta] = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+# (client_id, unit, bucket start) -> final bucket
+closed_buckets: TTLCache[Tuple[str, str, datetime], Dict[str, Any]] = TTLCache(
+    settings.histogram_cache_size, settings.histogram_cache_ttl_s
+)
+
+
+def floor_bucket(dt: datetime, unit: BucketUnit) -> datetime:
+    """Start (UTC) of the bucket holding `dt`, as `$dateTrunc` computes it."""
+    dt = utc(dt).replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0) if unit == "day" else dt
+
+
+def ceil_bucket(dt: datetime, unit: BucketUnit) -> datetime:
+    start = floor_bucket(dt, unit)
+    return start if start == utc(dt) else start + STEPS[unit]
+
+
+def bucket_starts(since: datetime, until: datetime, unit: BucketUnit) -> List[datetime]:
+    """Starts of the buckets covering [since, until), both already aligned."""
+    step = STEPS[unit]
+    return [since + i * step for i in range((until - since) // step)]
+
+
+def _empty(start: datetime) -> Dict[str, Any]:
+    return {
+        "start": start,
+        "count": 0,
+        "approved": 0,
+        "declined": 0,
+        "approval_rate": None,
+        "approved_amount": 0.0,
+        "reason_codes": {},
+    }
+
+
+def fold(groups: Iterable[Dict[str, Any]]) -> Dict[datetime, Dict[str, Any]]:
+    """Buckets from `client_charge_groups` rows."""
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    for row in groups:
+        key = row["_id"]
+        start = utc(key["start"])
+        bucket = buckets.setdefault(start, _empty(start))
+        bucket["count"] += row["count"]
+        if key["status"] == "approved":
+            bucket["approved"] += row["count"]
+            bucket["approved_amount"] += row["amount"]
+        else:
+            bucket["declined"] += row["count"]
+        if key.get("reason_code"):
+            codes = bucket["reason_codes"]
+            codes[key["reason_code"]] = codes.get(key["reason_code"], 0) + row["count"]
+    for bucket in buckets.values():
+        bucket["approval_rate"] = bucket["approved"] / bucket["count"]
+    return buckets
+
+
+async def client_histogram(
+    client_id: str, unit: BucketUnit, starts: List[datetime], now: datetime
+) -> List[Dict[str, Any]]:
+    """
+    Buckets starting at `starts` (aligned, ascending). Cached final buckets
+    are reused; one aggregation covers the span of the rest.
+    """
+    step = STEPS[unit]
+    settled = now - timedelta(seconds=settings.histogram_settle_s)
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    missing: List[datetime] = []
+    for start in starts:
+        cached = closed_buckets.get((client_id, unit, start))
+        if cached is None:
+            missing.append(start)
+        else:
+            buckets[start] = cached
+    if missing:
+        computed = fold(await client_charge_groups(client_id, unit, missing[0], missing[-1] + step))
+        for start in missing:
+            bucket = buckets[start] = computed.get(start) or _empty(start)
+            if start + step <= settled:
+                closed_buckets.set((client_id, unit, start), bucket)
+    return [buckets[start] for start in starts]
@@ -0,0 +1,129 @@
+"""
+Circuit breaker for the data layer.
+
+Requests that use Mongo report their outcome; once the failure ratio over
+the last `window` seconds reaches `failure_ratio` (with at least `min_calls`
+outcomes), the circuit opens and requests fail fast instead of each waiting
+out its deadline on a degraded database. After `open_for` seconds the
+circuit is half-open: the health path sends one probe (a `ping`), which
+closes it on success or keeps it open for another period on failure.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Deque, List, Literal, Optional
+
+from pymongo.errors import (
+    ConnectionFailure,
+    ExecutionTimeout,
+    PyMongoError,
+    WaitQueueTimeoutError,
+    WTimeoutError,
+)
+
+from app.config import settings
+from app.infrastructure.observability.metrics import DB_CIRCUIT_STATE
+
+State = Literal["closed", "open", "half_open"]
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+# Mongo commands issued by the current request (set by the request guard, bumped by a listener)
+current_db_calls: ContextVar[Optional[List[int]]] = ContextVar("current_db_calls", default=None)
+
+
+def is_data_layer_failure(exc: BaseException) -> bool:
+    """Outage-type errors (unreachable, overloaded, timed out), not query or business errors."""
+    if isinstance(exc, (ConnectionFailure, ExecutionTimeout, WTimeoutError, WaitQueueTimeoutError)):
+        return True
+    return isinstance(exc, PyMongoError) and exc.timeout
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_ratio: float,
+        min_calls: int,
+        window: float,
+        open_for: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.open_for = open_for
+        self._clock = clock
+        self._state: State = "closed"
+        self._opened_at = 0.0
+        # One [second, calls, failures] bucket per second of the window
+        self._buckets: Deque[List[int]] = deque()
+        # Outcomes also arrive from driver threads
+        self._lock = threading.Lock()
+        self._set_state("closed")
+
+    @property
+    def state(self) -> State:
+        return self._state
+
+    def _set_state(self, state: State) -> None:
+        self._state = state
+        DB_CIRCUIT_STATE.labels().set(_STATE_VALUES[state])
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may close the circuit."""
+        return max(self._opened_at + self.open_for - self._clock(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a request may use the database now (only while closed)."""
+        return self._state == "closed"
+
+    def record(self, ok: bool) -> None:
+        now = self._clock()
+        with self._lock:
+            if self._state != "closed":
+                return
+            second = int(now)
+            if self._buckets and self._buckets[-1][0] == second:
+                bucket = self._buckets[-1]
+            else:
+                bucket = [second, 0, 0]
+                self._buckets.append(bucket)
+            bucket[1] += 1
+            bucket[2] += 0 if ok else 1
+            while self._buckets and self._buckets[0][0] <= now - self.window:
+                self._buckets.popleft()
+            calls = sum(b[1] for b in self._buckets)
+            failures = sum(b[2] for b in self._buckets)
+            if calls >= self.min_calls and failures >= self.failure_ratio * calls:
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self._opened_at = now
+        self._buckets.clear()
+        self._set_state("open")
+
+    def probe_due(self) -> bool:
+        """Whether the health path should probe now; moves an expired open circuit to half-open."""
+        with self._lock:
+            if self._state == "open" and self._clock() >= self._opened_at + self.open_for:
+                self._set_state("half_open")
+            return self._state == "half_open"
+
+    def probe_result(self, ok: bool) -> None:
+        with self._lock:
+            if self._state != "half_open":
+                return
+            if ok:
+                self._set_state("closed")
+            else:
+                self._trip(self._clock())
+
+
+data_breaker = CircuitBreaker(
+    failure_ratio=settings.breaker_failure_ratio,
+    min_calls=settings.breaker_min_calls,
+    window=settings.breaker_window_s,
+    open_for=settings.breaker_open_s,
+)
@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Set, Tuple, TypeVar
+
+from beanie import PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.config import settings
+from app.domain.entities.charge import ChargeStatus
+from app.infrastructure.db.models import ChargeDoc, OutboxEvent
+from app.infrastructure.archive import get_archive
+from app.infrastructure.db.partitions import (
+    REQUEST_IDS_COLLECTION,
+    charge_partitions,
+    merge_sorted,
+    month_key,
+    overlapping,
+    utc,
+)
+from app.infrastructure.db.read_routing import reader
+from app.infrastructure.db.write_coalescer import WriteCoalescer, get_charge_writer, insert_document
+
+T = TypeVar("T")
+
+# Directory releases scheduled from sync callbacks (kept referenced until done)
+_releases: Set[asyncio.Task] = set()
+
+
+def partitioned() -> bool:
+    """Whether charges live in monthly partitions (CHARGE_PARTITIONING=monthly)."""
+    return settings.charge_partitioning == "monthly"
+
+
+def _charges() -> AsyncIOMotorCollection:
+    """The unpartitioned collection, for reads (routed per request, see read_routing)."""
+    return reader(ChargeDoc.get_motor_collection())
+
+
+def _to_doc(raw: Optional[Dict[str, Any]]) -> Optional[ChargeDoc]:
+    return ChargeDoc.model_validate(raw) if raw is not None else None
+
+
+def _payload(doc: ChargeDoc) -> Dict[str, Any]:
+    return get_dict(doc, to_db=True, keep_nulls=doc.get_settings().keep_nulls)
+
+
+async def charge_collection_for(document: Mapping[str, Any]) -> AsyncIOMotorCollection:
+    """Collection a raw charge document is written to (resolver for the charge writer)."""
+    if partitioned():
+        return await charge_partitions.collection_for(document)
+    return ChargeDoc.get_motor_collection()
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+async def get_charge(charge_id: str) -> Optional[ChargeDoc]:
+    if partitioned():
+        return _to_doc(await charge_partitions.get(ObjectId(charge_id)))
+    return await ChargeDoc.get(ObjectId(charge_id))
+
+
+async def get_charge_row(charge_id: str, projection: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """Raw charge by id restricted to a Mongo `projection`."""
+    if partitioned():
+        return await charge_partitions.get(ObjectId(charge_id), projection)
+    return await ChargeDoc.get_motor_collection().find_one({"_id": ObjectId(charge_id)}, projection)
+
+
+async def find_charge_by_request_id(request_id: str) -> Optional[ChargeDoc]:
+    """
+    O(1) in both layouts: unique index, or the request_id directory when
+    partitioned. A charge no longer hot is looked up through its archive tombstone.
+    """
+    if partitioned():
+        doc = _to_doc(await charge_partitions.find_by_request_id(request_id))
+    else:
+        doc = await ChargeDoc.find_one(ChargeDoc.request_id == request_id)
+    if doc is None:
+        doc = await _find_archived_by_request_id(request_id)
+    return doc
+
+
+async def _find_archived_by_request_id(request_id: str) -> Optional[ChargeDoc]:
+    archive = get_archive()
+    if archive is None:
+        return None
+    directory = ChargeDoc.get_motor_collection().database[REQUEST_IDS_COLLECTION]
+    entry = await directory.find_one({"_id": request_id, "archived": True})
+    if entry is None:
+        return None
+    return _to_doc(await archive.get_client_charge(entry["client_id"], entry["charge_id"], entry["partition"]))
+
+
+async def charge_archived(charge_id: str) -> bool:
+    """Whether a charge (not found hot) was moved to the cold archive."""
+    archive = get_archive()
+    return archive is not None and await asyncio.to_thread(archive.contains, charge_id)
+
+
+def _client_query(
+    client_id: str,
+    status: Optional[ChargeStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Raw filter for a client's charges (the `attempted_at` range only when bounded)."""
+    query: Dict[str, Any] = {"client_id": ObjectId(client_id)}
+    if status:
+        query["status"] = status.value
+    bounds: Dict[str, Any] = {}
+    if since:
+        bounds["$gte"] = since
+    if until:
+        bounds["$lt"] = until
+    if bounds:
+        query["attempted_at"] = bounds
+    return query
+
+
+async def list_client_charges(
+    client_id: str,
+    status: Optional[ChargeStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[ChargeDoc]:
+    """
+    A client's charges in [since, until), newest first. Archived months are
+    read (and merged in) only when `since` reaches into archived time.
+    """
+    if partitioned():
+        query = _client_query(client_id, status)
+        docs = [_to_doc(raw) async for raw in charge_partitions.find(query, since, until)]
+    else:
+        cursor = _charges().find(_client_query(client_id, status, since, until)).sort("attempted_at", -1)
+        docs = [_to_doc(raw) async for raw in cursor]
+
+    archive = get_archive()
+    if archive is None or not archive.covers(since):
+        return docs
+    archived = (_to_doc(raw) async for raw in archive.iter_client(client_id, since, until, status.value if status else None))
+    return await _merge_archived(docs, archived, key=lambda d: utc(d.attempted_at), ident=lambda d: d.id)
+
+
+async def list_client_charge_rows(
+    client_id: str,
+    projection: Mapping[str, Any],
+    status: Optional[ChargeStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    `list_client_charges` restricted to a Mongo `projection`: raw documents,
+    with the same filters, order and archive merge, and only the projected
+    fields read from Mongo (plus `_id` and `attempted_at`, needed to merge).
+    """
+    projection = {**projection, "_id": 1, "attempted_at": 1}
+    if partitioned():
+        query = _client_query(client_id, status)
+        rows = [raw async for raw in charge_partitions.find(query, since, until, projection)]
+    else:
+        cursor = _charges().find(_client_query(client_id, status, since, until), projection)
+        rows = await cursor.sort("attempted_at", -1).to_list(None)
+
+    archive = get_archive()
+    if archive is None or not archive.covers(since):
+        return rows
+    archived = (
+        {k: v for k, v in raw.items() if k in projection}
+        async for raw in archive.iter_client(client_id, since, until, status.value if status else None)
+    )
+    return await _merge_archived(rows, archived, key=lambda r: utc(r["attempted_at"]), ident=lambda r: r["_id"])
+
+
+async def list_card_charge_rows(
+    card_id: str,
+    projection: Mapping[str, Any],
+    status: Optional[ChargeStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, ObjectId]] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    One keyset page of a card's charges in [since, until), newest first by
+    (attempted_at, _id), starting after the `after` key. Served by the
+    (card_id[, status], attempted_at, _id) indexes: the page boundary is an
+    index bound, so every page costs about `limit` keys however deep it is.
+    Archived charges are not included (the archive is keyed by client).
+    """
+    query: Dict[str, Any] = {"card_id": ObjectId(card_id)}
+    if status:
+        query["status"] = status.value
+    bounds: Dict[str, Any] = {}
+    if since:
+        bounds["$gte"] = since
+    if until:
+        bounds["$lt"] = until
+    if after:
+        last_at, last_id = after
+        bounds["$lte"] = last_at
+        query["$or"] = [{"attempted_at": {"$lt": last_at}}, {"_id": {"$lt": last_id}}]
+    if bounds:
+        query["attempted_at"] = bounds
+    projection = {**projection, "_id": 1, "attempted_at": 1}
+    order = [("attempted_at", -1), ("_id", -1)]
+
+    if not partitioned():
+        cursor = _charges().find(query, projection).sort(order).limit(limit)
+        return await cursor.to_list(None)
+
+    # Months cover disjoint time ranges, so newest-first pages just chain them
+    high = after[0] + timedelta(milliseconds=1) if after else until
+    if after and until:
+        high = min(utc(high), utc(until))
+    rows: List[Dict[str, Any]] = []
+    for month in overlapping(await charge_partitions.months(), since, high):
+        cursor = charge_partitions.collection(month).find(query, projection).sort(order).limit(limit - len(rows))
+        rows.extend(await cursor.to_list(None))
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+async def client_changes_since(
+    client_id: str, since: datetime, limit: int
+) -> Tuple[List[ChargeDoc], List[ChargeDoc]]:
+    """
+    (charges attempted, charges refunded) at or after `since`, oldest first and
+    up to `limit` each: the catch-up of the live charge feed. Attempts come
+    from (client_id, attempted_at), refunds from the partial refunded_at index;
+    a refund can land on a charge of any month, so all partitions are read.
+    """
+    attempted = {"client_id": ObjectId(client_id), "attempted_at": {"$gte": since}}
+    refunded = {"client_id": ObjectId(client_id), "refunded_at": {"$gte": since, "$type": "date"}}
+    if partitioned():
+        months = await charge_partitions.months()
+        attempt_colls = [charge_partitions.collection(m) for m in reversed(overlapping(months, since, None))]
+        refund_colls = [charge_partitions.collection(m) for m in months]
+    else:
+        attempt_colls = refund_colls = [_charges()]
+
+    async def scan(
+        colls: List[AsyncIOMotorCollection], query: Dict[str, Any], field: str, disjoint: bool
+    ) -> List[ChargeDoc]:
+        found: List[Dict[str, Any]] = []
+        for coll in colls:
+            found.extend(await coll.find(query).sort(field, 1).limit(limit).to_list(None))
+            # Months in ascending order hold ascending attempts: the oldest `limit` are found
+            if disjoint and len(found) >= limit:
+                break
+        found.sort(key=lambda raw: utc(raw[field]))
+        return [ChargeDoc.model_validate(raw) for raw in found[:limit]]
+
+    charges, refunds = await asyncio.gather(
+        scan(attempt_colls, attempted, "attempted_at", disjoint=True),
+        scan(refund_colls, refunded, "refunded_at", disjoint=False),
+    )
+    return charges, refunds
+
+
+async def _newest(coll: AsyncIOMotorCollection, query: Dict[str, Any], field: str) -> Optional[datetime]:
+    """Largest `field` among the matches, read from index keys only (sorted, limit 1)."""
+    cursor = coll.find(query, {"_id": 0, field: 1}).sort(field, -1).limit(1)
+    async for raw in cursor:
+        return utc(raw[field])
+    return None
+
+
+async def client_charges_version(
+    client_id: str,
+    status: Optional[ChargeStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    (newest attempted_at, newest refunded_at) of a client's charges in
+    [since, until): the validator of `list_client_charges`. Charges are
+    immutable apart from refunds, so a new charge or a refund in the range
+    moves one of the two. Each value is a covered limit-1 index scan per
+    queried collection; archived charges never change and are not consulted.
+
+    A charge persisted out of `attempted_at` order (one accepted
+    asynchronously and still queued, or written by a worker whose clock lags)
+    does not move the validator until the next charge or refund.
+    """
+    attempted = _client_query(client_id, status, since, until)
+    # Only approved charges are refunded, so the status is implied (and kept out of the index)
+    refunded = None
+    if status != ChargeStatus.declined:
+        refunded = _client_query(client_id, None, since, until)
+        refunded["refunded_at"] = {"$type": "date"}
+
+    if partitioned():
+        colls = [charge_partitions.collection(m) for m in overlapping(await charge_partitions.months(), since, until)]
+    else:
+        colls = [_charges()]
+
+    newest_attempt: Optional[datetime] = None
+    for coll in colls:  # newest month first: the first hit is the newest charge
+        newest_attempt = await _newest(coll, attempted, "attempted_at")
+        if newest_attempt is not None:
+            break
+    newest_refund: Optional[datetime] = None
+    if refunded is not None:
+        refunds = [r for r in await asyncio.gather(*(_newest(c, refunded, "refunded_at") for c in colls)) if r]
+        newest_refund = max(refunds, default=None)
+    return newest_attempt, newest_refund
+
+
+async def client_charge_groups(
+    client_id: str, unit: str, since: datetime, until: datetime
+) -> List[Dict[str, Any]]:
+    """
+    A client's charges in [since, until) grouped by (`unit` bucket start in UTC,
+    status, reason_code) with their count and summed amount. The match is a
+    range on the (client_id, attempted_at) index; archived charges are not included.
+    """
+    pipeline = [
+        {"$match": _client_query(client_id, None, since, until)},
+        {
+            "$group": {
+                "_id": {
+                    "start": {"$dateTrunc": {"date": "$attempted_at", "unit": unit, "timezone": "UTC"}},
+                    "status": "$status",
+                    "reason_code": "$reason_code",
+                },
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"},
+            }
+        },
+    ]
+    if partitioned():
+        colls = [charge_partitions.collection(m) for m in overlapping(await charge_partitions.months(), since, until)]
+    else:
+        colls = [_charges()]
+    results = await asyncio.gather(*(coll.aggregate(pipeline).to_list(None) for coll in colls))
+    return [row for rows in results for row in rows]
+
+
+async def _merge_archived(
+    hot: List[T],
+    archived: AsyncIterator[T],
+    key: Callable[[T], datetime],
+    ident: Callable[[T], Any],
+) -> List[T]:
+    """Merge hot and archived charges newest first; a hot copy wins over its archived twin."""
+
+    async def hot_stream() -> AsyncIterator[Tuple[int, T]]:
+        for item in hot:
+            yield 0, item
+
+    async def archived_stream() -> AsyncIterator[Tuple[int, T]]:
+        async for item in archived:
+            yield 1, item
+
+    # Rank is part of the key so the hot copy sorts first on equal timestamps
+    merged: List[T] = []
+    seen: Set[Any] = set()
+    streams = [hot_stream(), archived_stream()]
+    async for _, item in merge_sorted(streams, key=lambda p: (key(p[1]), -p[0]), descending=True):
+        if ident(item) not in seen:
+            seen.add(ident(item))
+            merged.append(item)
+    return merged
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+async def reserve_request_id(doc: ChargeDoc) -> None:
+    """
+    Claim `doc.request_id` before its charge is written; raises DuplicateKeyError
+    when it is taken. Partitions have no global unique index, so the directory
+    enforces idempotency; with a single collection the unique index does.
+    A claim left behind by a request that died before writing its charge is
+    taken over after REQUEST_ID_CLAIM_GRACE_S.
+    """
+    if partitioned() and doc.request_id:
+        if doc.id is None:
+            doc.id = PydanticObjectId()
+        await charge_partitions.claim_request_id(
+            doc.request_id, doc.id, month_key(doc.attempted_at), settings.request_id_claim_grace_s
+        )
+
+
+async def release_request_id(doc: ChargeDoc) -> None:
+    if partitioned() and doc.request_id and doc.id is not None:
+        await charge_partitions.release_request_id(doc.request_id, doc.id)
+
+
+def release_request_id_soon(doc: ChargeDoc) -> None:
+    """`release_request_id` from a sync callback running on the event loop."""
+    if partitioned() and doc.request_id:
+        task = asyncio.get_running_loop().create_task(release_request_id(doc))
+        _releases.add(task)
+        task.add_done_callback(_releases.discard)
+
+
+async def insert_charge(doc: ChargeDoc, writer: Optional[WriteCoalescer] = None) -> ChargeDoc:
+    """
+    Insert a charge into its collection, batched through the charge writer when
+    it is running. Raises DuplicateKeyError when the request_id is taken.
+    """
+    if not partitioned():
+        return await insert_document(doc, writer)
+
+    if doc.id is None:
+        doc.id = PydanticObjectId()
+    await reserve_request_id(doc)
+    try:
+        payload = _payload(doc)
+        writer = writer or get_charge_writer()
+        if writer is not None:
+            await writer.insert(payload)
+        else:
+            await (await charge_partitions.collection_for(payload)).insert_one(payload)
+    except Exception:
+        await release_request_id(doc)
+        raise
+    return doc
+
+
+def outbox_events(kind: str) -> Optional[List[OutboxEvent]]:
+    """Outbox entry for a new charge document, or None when OUTBOX_ENABLED is off."""
+    return [OutboxEvent(kind=kind)] if settings.outbox_enabled else None
+
+
+async def mark_refunded(doc: ChargeDoc) -> bool:
+    """
+    Refund a charge in one conditional update that also queues its outbox
+    event; False when it was already refunded (e.g. by a concurrent request).
+    """
+    refunded_at = datetime.now(timezone.utc)
+    update: Dict[str, Any] = {"$set": {"refunded": True, "refunded_at": refunded_at}}
+    event = outbox_events("refund")
+    if event:
+        update["$push"] = {"outbox": {"$each": [e.model_dump() for e in event]}}
+    coll = charge_partitions.collection(month_key(doc.attempted_at)) if partitioned() else ChargeDoc.get_motor_collection()
+    result = await coll.update_one({"_id": doc.id, "refunded": False}, update)
+    if not result.modified_count:
+        return False
+    doc.refunded, doc.refunded_at = True, refunded_at
+    return True
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Optional, Self
+from typing import Any, Dict, List, Literal, Optional, Self
 
 from beanie import Document, Indexed, PydanticObjectId
-from pydantic import Field
+from pydantic import BaseModel, Field
 from pymongo import IndexModel
 
 from app.domain.entities.client import Client
@@ -12,6 +12,10 @@ from app.domain.entities.card import Card
 from app.domain.entities.charge import Charge, ChargeStatus
 
 
+# Covers the `{_id, updated_at}` projection used to validate ETags without a fetch
+VERSION_INDEX = [("_id", 1), ("updated_at", 1)]
+
+
 def _oid_or_none(id_str: Optional[str]) -> Optional[PydanticObjectId]:
     """Convert string id to ObjectId when present; otherwise return None."""
     if not id_str:
@@ -31,6 +35,7 @@ class ClientDoc(Document):
 
     class Settings:
         name = "clients"
+        indexes = [IndexModel(VERSION_INDEX)]
 
     # ---- Mapping helpers
     def to_entity(self) -> Client:
@@ -68,7 +73,7 @@ class CardDoc(Document):
 
     class Settings:
         name = "cards"
-        indexes = [IndexModel([("client_id", 1)])]
+        indexes = [IndexModel([("client_id", 1)]), IndexModel(VERSION_INDEX)]
 
     # ---- Mapping helpers
     def to_entity(self) -> Card:
@@ -98,9 +103,23 @@ class CardDoc(Document):
 # -----------------------------
 # Charge
 # -----------------------------
+class OutboxEvent(BaseModel):
+    """Event waiting in a charge's outbox for the relay (see app/jobs/outbox_relay.py)."""
+    id: PydanticObjectId = Field(default_factory=PydanticObjectId)
+    kind: Literal["charge", "refund"]
+
+
+# Charges with events still to relay (the outbox is unset once relayed)
+OUTBOX_KEY = [("outbox.id", 1)]
+OUTBOX_PENDING = {"outbox": {"$type": "array"}}
+OUTBOX_INDEX = IndexModel(OUTBOX_KEY, partialFilterExpression=OUTBOX_PENDING)
+# Deletes must keep charges with pending events: the relay reads them to log their events
+OUTBOX_RELAYED = {"outbox": {"$not": {"$type": "array"}}}
+
+
 class ChargeDoc(Document):
     client_id: Indexed(PydanticObjectId)
-    card_id: Indexed(PydanticObjectId)
+    card_id: PydanticObjectId
     amount: float
     attempted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     status: ChargeStatus
@@ -109,16 +128,29 @@ class ChargeDoc(Document):
     refunded_at: datetime | None = None
     # Unique idempotency key when provided; allow None with sparse index
     request_id: Indexed(str) | None = None
+    # Written by the same insert/update as the change it describes (OUTBOX_ENABLED)
+    outbox: List[OutboxEvent] | None = None
 
     class Settings:
         name = "charges"
         indexes = [
             IndexModel([("client_id", 1), ("attempted_at", -1)]),
+            # list_charges with a status filter: equality keys first, range/sort key last
+            IndexModel([("client_id", 1), ("status", 1), ("attempted_at", -1)]),
+            # Per-card history (keyset pages on attempted_at, _id); also serves card_id lookups
+            IndexModel([("card_id", 1), ("attempted_at", -1), ("_id", -1)]),
+            IndexModel([("card_id", 1), ("status", 1), ("attempted_at", -1), ("_id", -1)]),
+            # newest refund of a client (list_charges ETag); only refunded charges are indexed
+            IndexModel(
+                [("client_id", 1), ("refunded_at", -1), ("attempted_at", -1)],
+                partialFilterExpression={"refunded_at": {"$type": "date"}},
+            ),
             IndexModel(
                 [("request_id", 1)],
                 unique=True,
                 partialFilterExpression={"request_id": {"$type": "string"}},
             ),
+            OUTBOX_INDEX,
         ]
 
     # ---- Mapping helpers
@@ -150,3 +182,30 @@ class ChargeDoc(Document):
             refunded_at=e.refunded_at,
             request_id=e.request_id,
         )
+
+
+# -----------------------------
+# Background job
+# -----------------------------
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class JobDoc(Document):
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = "queued"
+    # Counters reported by the handler while it runs (e.g. {"charges": 1200})
+    progress: Dict[str, int] = Field(default_factory=dict)
+    attempts: int = 0
+    error: str | None = None
+    # Claimable once `lease_until` has passed: immediately when queued, after a
+    # crashed runner's lease expires when running
+    owner: str | None = None
+    lease_until: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: datetime | None = None
+
+    class Settings:
+        name = "jobs"
+        indexes = [IndexModel([("status", 1), ("lease_until", 1)])]
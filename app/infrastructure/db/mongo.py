@@ -1,26 +1,52 @@
 from __future__ import annotations
 
-from typing import Sequence, Optional
+from typing import List, Sequence, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
+from pymongo import monitoring
 
 from app.config import settings
-from app.infrastructure.db.models import ClientDoc, CardDoc, ChargeDoc
+from app.infrastructure.db.models import ClientDoc, CardDoc, ChargeDoc, JobDoc
+from app.infrastructure.db.partitions import charge_partitions
+from app.infrastructure.db.monitoring import (
+    MetricsCommandListener,
+    RequestDbCallsListener,
+    RequestTimingCommandListener,
+)
+from app.infrastructure.db.slow_queries import SlowQueryCommandListener, slow_query_log
 
 _client: Optional[AsyncIOMotorClient] = None
 
 
-async def init_mongo(models: Sequence[type] = (ClientDoc, CardDoc, ChargeDoc)) -> None:
+def _event_listeners() -> List[monitoring.CommandListener]:
+    """Command listeners registered on the Motor client, driven by settings."""
+    listeners: List[monitoring.CommandListener] = []
+    if settings.metrics_enabled:
+        listeners.append(MetricsCommandListener())
+    if settings.timing_sample_rate > 0:
+        listeners.append(RequestTimingCommandListener())
+    if settings.breaker_enabled:
+        listeners.append(RequestDbCallsListener())
+    if settings.slow_query_ms > 0:
+        slow_query_log.threshold_ms = settings.slow_query_ms
+        listeners.append(SlowQueryCommandListener(slow_query_log))
+    return listeners
+
+
+async def init_mongo(models: Sequence[type] = (ClientDoc, CardDoc, ChargeDoc, JobDoc)) -> None:
     """
     Create a singleton Motor client and initialize Beanie with the provided Documents.
     The database name should be present in MONGODB_URI (e.g., mongodb://host:27017/t1db).
     """
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(settings.mongodb_uri)
+        _client = AsyncIOMotorClient(settings.mongodb_uri, event_listeners=_event_listeners())
 
     db = _client.get_default_database()  # derives DB name from the URI
     await init_beanie(database=db, document_models=list(models))
+    charge_partitions.bind(db)
+    if settings.slow_query_ms > 0:
+        slow_query_log.start(_client)
 
 
 async def get_client() -> AsyncIOMotorClient:
@@ -32,6 +58,7 @@ async def get_client() -> AsyncIOMotorClient:
 async def close_mongo() -> None:
     """Close the Mongo client gracefully (optional: call on shutdown)."""
     global _client
+    await slow_query_log.stop()
     if _client is not None:
         _client.close()
         _client = None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping, Tuple
+
+from pymongo import monitoring
+
+from app.infrastructure.db.breaker import current_db_calls
+from app.infrastructure.observability.metrics import MONGO_COMMAND_DURATION
+from app.infrastructure.observability.timing import current_timings
+
+
+def command_collection(command_name: str, command: Mapping[str, Any]) -> str:
+    """
+    Best-effort collection name of a command document.
+    Most commands carry it as the value of their first key; getMore carries the
+    cursor id there and the collection under "collection".
+    """
+    if command_name == "getMore":
+        target = command.get("collection")
+    else:
+        target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MetricsCommandListener(monitoring.CommandListener):
+    """
+    Records driver-measured command latency by collection and command.
+
+    The collection is only present on the started event, so it is remembered
+    per request id until the matching succeeded/failed event arrives.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self._inflight[(event.connection_id, event.request_id)] = command_collection(
+            event.command_name, event.command
+        )
+
+    def _finish(self, event: Any, outcome: str) -> None:
+        collection = self._inflight.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name, outcome).observe(
+            event.duration_micros / 1e6
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "failed")
+
+
+class RequestTimingCommandListener(monitoring.CommandListener):
+    """Adds command time to the sampled request's timings, if any."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def _finish(self, event: Any) -> None:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.db += event.duration_micros / 1e6
+            timings.db_commands += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event)
+
+
+class RequestDbCallsListener(monitoring.CommandListener):
+    """Counts the commands of the current request, so the breaker only hears from requests that used Mongo."""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        calls = current_db_calls.get()
+        if calls is not None:
+            calls[0] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, TypeVar
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from app.infrastructure.db.models import OUTBOX_INDEX
+from app.infrastructure.db.read_routing import reader
+
+T = TypeVar("T")
+
+PARTITION_PREFIX = "charges_"
+PARTITION_RE = re.compile(r"^charges_(\d{6})$")
+# request_id -> (charge_id, partition, claimed_at); `_id` is the request_id, so lookups are O(1)
+REQUEST_IDS_COLLECTION = "charge_request_ids"
+
+# Same read paths as ChargeDoc; request_id uniqueness lives in the directory
+PARTITION_INDEXES = [
+    IndexModel([("client_id", 1), ("attempted_at", -1)]),
+    IndexModel([("client_id", 1), ("status", 1), ("attempted_at", -1)]),
+    IndexModel(
+        [("client_id", 1), ("refunded_at", -1), ("attempted_at", -1)],
+        partialFilterExpression={"refunded_at": {"$type": "date"}},
+    ),
+    IndexModel([("card_id", 1), ("attempted_at", -1), ("_id", -1)]),
+    IndexModel([("card_id", 1), ("status", 1), ("attempted_at", -1), ("_id", -1)]),
+    OUTBOX_INDEX,
+]
+
+
+# -----------------------------
+# Month arithmetic
+# -----------------------------
+def utc(dt: datetime) -> datetime:
+    """Naive datetimes are UTC (that is how Mongo stores them)."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def month_key(dt: datetime) -> str:
+    """`YYYYMM` of a datetime in UTC."""
+    dt = utc(dt)
+    return f"{dt.year:04d}{dt.month:02d}"
+
+
+def partition_name(month: str) -> str:
+    return f"{PARTITION_PREFIX}{month}"
+
+
+def partition_month(name: str) -> Optional[str]:
+    """Month of a partition collection name, None for any other collection."""
+    match = PARTITION_RE.match(name)
+    return match.group(1) if match else None
+
+
+def overlapping(months: Iterable[str], since: Optional[datetime], until: Optional[datetime]) -> List[str]:
+    """
+    Months (of `months`) that can hold charges in [since, until), newest first.
+    `until` is exclusive, so a range ending at midnight on the 1st skips that month.
+    """
+    low = month_key(since) if since else None
+    high = month_key(utc(until) - timedelta(microseconds=1)) if until else None
+    return sorted(
+        (m for m in set(months) if (low is None or m >= low) and (high is None or m <= high)),
+        reverse=True,
+    )
+
+
+# -----------------------------
+# k-way merge
+# -----------------------------
+_END = object()
+
+
+class _Reversed:
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Reversed) and other.key == self.key
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+async def merge_sorted(
+    streams: Sequence[AsyncIterator[T]],
+    key: Callable[[T], Any],
+    descending: bool = False,
+) -> AsyncIterator[T]:
+    """
+    Merge already sorted async streams into one sorted stream.
+
+    A heap holds the head of every stream, so producing n items from k streams
+    costs O(n log k) and only one item per stream is buffered. The first item
+    of each stream is fetched concurrently; ties keep stream order.
+    """
+    wrap = _Reversed if descending else (lambda k: k)
+
+    async def head(stream: AsyncIterator[T]) -> Any:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return _END
+
+    heap: List[Any] = []
+    firsts = await asyncio.gather(*(head(s) for s in streams))
+    for index, item in enumerate(firsts):
+        if item is not _END:
+            heap.append((wrap(key(item)), index, item))
+    heapq.heapify(heap)
+
+    while heap:
+        _, index, item = heap[0]
+        yield item
+        nxt = await head(streams[index])
+        if nxt is _END:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (wrap(key(nxt)), index, nxt))
+
+
+# -----------------------------
+# Partition catalog
+# -----------------------------
+class ChargePartitions:
+    """
+    Monthly charge collections (`charges_YYYYMM`, by `attempted_at` in UTC).
+
+    Partitions are created on first write with the indexes above; the list of
+    existing partitions is cached for `refresh_s` seconds so range queries do
+    not pay a `listCollections` round trip each time.
+    """
+
+    def __init__(self, refresh_s: float = 60.0) -> None:
+        self.refresh_s = refresh_s
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._ensured: Set[str] = set()
+        self._listed: Set[str] = set()
+        self._listed_at = float("-inf")
+
+    def bind(self, db: AsyncIOMotorDatabase) -> None:
+        if self._db is not db:
+            self._db = db
+            self.invalidate()
+            self._ensured.clear()
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        assert self._db is not None, "Charge partitions not bound to a database"
+        return self._db
+
+    @property
+    def request_ids(self) -> AsyncIOMotorCollection:
+        return self.db[REQUEST_IDS_COLLECTION]
+
+    def collection(self, month: str) -> AsyncIOMotorCollection:
+        # Reads follow the route's read routing; writes always go to the primary
+        return reader(self.db[partition_name(month)])
+
+    def invalidate(self) -> None:
+        """Forget the cached partition list (re-listed on next use)."""
+        self._listed_at = float("-inf")
+
+    async def ensure(self, month: str) -> AsyncIOMotorCollection:
+        """Partition for `month`, creating it with its indexes the first time."""
+        coll = self.collection(month)
+        if month not in self._ensured:
+            await coll.create_indexes(PARTITION_INDEXES)
+            self._ensured.add(month)
+            self._listed.add(month)
+        return coll
+
+    async def drop(self, month: str) -> None:
+        """Drop a partition (e.g. once archived)."""
+        await self.collection(month).drop()
+        self._ensured.discard(month)
+        self._listed.discard(month)
+
+    async def collection_for(self, document: Mapping[str, Any]) -> AsyncIOMotorCollection:
+        """Partition a raw charge document belongs to."""
+        return await self.ensure(month_key(document["attempted_at"]))
+
+    async def months(self) -> List[str]:
+        """Existing partitions, newest first."""
+        if time.monotonic() - self._listed_at > self.refresh_s:
+            names = await self.db.list_collection_names(
+                filter={"name": {"$regex": PARTITION_RE.pattern}}
+            )
+            self._listed = {m for m in map(partition_month, names) if m} | self._ensured
+            self._listed_at = time.monotonic()
+        return sorted(self._listed, reverse=True)
+
+    # ---- point lookups
+    async def get(
+        self, charge_id: ObjectId, projection: Optional[Mapping[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Charge by id. The id's timestamp names the partition for every charge
+        created by the API (one query); older or migrated ids fall back to
+        probing the remaining partitions newest first.
+        """
+        hint = month_key(charge_id.generation_time)
+        months = await self.months()
+        for month in [hint] + [m for m in months if m != hint]:
+            raw = await self.collection(month).find_one({"_id": charge_id}, projection)
+            if raw is not None:
+                return raw
+        return None
+
+    async def find_by_request_id(self, request_id: str) -> Optional[Dict[str, Any]]:
+        entry = await self.request_ids.find_one({"_id": request_id})
+        if entry is None:
+            return None
+        return await self.collection(entry["partition"]).find_one({"_id": entry["charge_id"]})
+
+    # ---- request_id directory
+    async def claim_request_id(
+        self, request_id: str, charge_id: ObjectId, month: str, stale_after: float = 0.0
+    ) -> None:
+        """
+        Reserve `request_id` for a charge; raises DuplicateKeyError when taken.
+        A claim older than `stale_after` seconds whose charge never landed (its
+        claimant crashed or was cancelled in between) is taken over instead.
+        """
+        now = datetime.now(timezone.utc)
+        claim = {"_id": request_id, "charge_id": charge_id, "partition": month, "claimed_at": now}
+        try:
+            await self.request_ids.insert_one(claim)
+        except DuplicateKeyError:
+            if not stale_after or not await self._take_over_stale(claim, stale_after):
+                raise
+
+    async def _take_over_stale(self, claim: Dict[str, Any], stale_after: float) -> bool:
+        entry = await self.request_ids.find_one({"_id": claim["_id"]})
+        if entry is None or entry.get("archived"):
+            return False
+        claimed_at = entry.get("claimed_at")  # absent on claims made before it was recorded
+        if claimed_at is not None and utc(claimed_at) > claim["claimed_at"] - timedelta(seconds=stale_after):
+            return False
+        # Read from the primary: a lagging secondary could miss a charge that did land
+        if await self.db[partition_name(entry["partition"])].find_one({"_id": entry["charge_id"]}, {"_id": 1}):
+            return False
+        # Only replaces the claim we judged stale, so two takers cannot both win
+        current = {"_id": claim["_id"], "charge_id": entry["charge_id"]}
+        return await self.request_ids.find_one_and_replace(current, claim) is not None
+
+    async def release_request_id(self, request_id: str, charge_id: ObjectId) -> None:
+        """Drop a claim whose charge was never written (only if it is still ours)."""
+        await self.request_ids.delete_one({"_id": request_id, "charge_id": charge_id})
+
+    # ---- range queries
+    async def find(
+        self,
+        query: Dict[str, Any],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        projection: Optional[Mapping[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Charges matching `query` in [since, until), newest first: only the
+        overlapping partitions are queried and their sorted cursors are
+        k-way merged on `attempted_at` (which a `projection` must keep).
+        """
+        query = dict(query)
+        bounds: Dict[str, Any] = {}
+        if since:
+            bounds["$gte"] = since
+        if until:
+            bounds["$lt"] = until
+        if bounds:
+            query["attempted_at"] = bounds
+
+        months = overlapping(await self.months(), since, until)
+        cursors = [self.collection(m).find(query, projection).sort("attempted_at", -1) for m in months]
+        async for raw in merge_sorted(cursors, key=lambda d: utc(d["attempted_at"]), descending=True):
+            yield raw
+
+
+charge_partitions = ChargePartitions()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Literal, Optional
+
+from beanie.odm.utils.dump import get_dict
+from pymongo.errors import DuplicateKeyError
+
+from app.infrastructure.charge_feed import charge_feed
+from app.infrastructure.db.charge_store import release_request_id_soon
+from app.infrastructure.db.models import ChargeDoc
+from app.infrastructure.db.write_coalescer import WriteCoalescer
+from app.infrastructure.observability.metrics import CHARGES_TOTAL
+
+PendingState = Literal["queued", "failed", "duplicate"]
+
+
+@dataclass
+class PendingCharge:
+    doc: ChargeDoc
+    state: PendingState = "queued"
+    detail: Optional[str] = None
+
+
+class PendingCharges:
+    """
+    Tracks charges accepted with 202 until their batched insert completes.
+
+    Persisted charges are forgotten as soon as the write lands (Mongo is the
+    source of truth from then on); failed or duplicate ones are remembered,
+    up to `max_failed` entries, so pollers can learn what happened.
+    """
+
+    def __init__(self, max_failed: int = 10_000) -> None:
+        self.max_failed = max_failed
+        self._entries: Dict[str, PendingCharge] = {}
+        self._by_request_id: Dict[str, str] = {}
+        self._failed: OrderedDict[str, PendingCharge] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, charge_id: str) -> Optional[PendingCharge]:
+        return self._entries.get(charge_id) or self._failed.get(charge_id)
+
+    def find_request(self, request_id: str) -> Optional[PendingCharge]:
+        charge_id = self._by_request_id.get(request_id)
+        return self._entries.get(charge_id) if charge_id else None
+
+    def submit(self, doc: ChargeDoc, writer: WriteCoalescer) -> PendingCharge:
+        """
+        Queue `doc` (whose id is already allocated) on the writer.
+        Raises asyncio.QueueFull when the writer has no room.
+        """
+        payload = get_dict(doc, to_db=True, keep_nulls=doc.get_settings().keep_nulls)
+        future = writer.submit(payload)
+        entry = PendingCharge(doc=doc)
+        charge_id = str(doc.id)
+        self._entries[charge_id] = entry
+        if doc.request_id:
+            self._by_request_id[doc.request_id] = charge_id
+        future.add_done_callback(lambda fut: self._on_written(charge_id, fut))
+        return entry
+
+    def _on_written(self, charge_id: str, future: asyncio.Future) -> None:
+        entry = self._entries.pop(charge_id, None)
+        if entry is None:
+            return
+        if entry.doc.request_id:
+            self._by_request_id.pop(entry.doc.request_id, None)
+
+        exc = None if future.cancelled() else future.exception()
+        if future.cancelled() or exc is not None:
+            if isinstance(exc, DuplicateKeyError):
+                entry.state, entry.detail = "duplicate", "request_id already used by another charge"
+            else:
+                entry.state, entry.detail = "failed", str(exc) if exc else "cancelled"
+                release_request_id_soon(entry.doc)
+            self._failed[charge_id] = entry
+            while len(self._failed) > self.max_failed:
+                self._failed.popitem(last=False)
+            return
+
+        status = entry.doc.status
+        CHARGES_TOTAL.labels(getattr(status, "value", status), entry.doc.reason_code or "").inc()
+        charge_feed.notify("charge", entry.doc)
+
+
+pending_charges = PendingCharges()
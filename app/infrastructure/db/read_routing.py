@@ -0,0 +1,57 @@
+"""
+Per-route read routing.
+
+Routes whose reads tolerate bounded staleness (GET listings and lookups)
+opt in with `offload_reads()`; for the rest of that request, collections
+passed through `reader()` use READ_PREFERENCE (e.g. `secondaryPreferred`)
+bounded by READ_MAX_STALENESS_S. Every other request, in particular
+`create_charge` idempotency checks and the reads that follow a write, keeps
+reading from the primary. Writes are unaffected: they always go to the primary.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.read_preferences import Nearest, PrimaryPreferred, Secondary, SecondaryPreferred, _ServerMode
+
+from app.config import settings
+
+_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondaryPreferred": SecondaryPreferred,
+    "secondary": Secondary,
+    "nearest": Nearest,
+}
+
+# Set by the routes that opt in (each request runs in its own task/context)
+_offloaded: ContextVar[bool] = ContextVar("reads_offloaded", default=False)
+
+
+def offload_reads() -> None:
+    """Let the current request read from secondaries."""
+    _offloaded.set(True)
+
+
+def offloaded_read_preference() -> Optional[_ServerMode]:
+    """Read preference of opted-in routes, or None when everything reads from the primary."""
+    mode = _MODES.get(settings.read_preference)
+    if mode is None:
+        return None
+    return mode(max_staleness=settings.read_max_staleness_s)
+
+
+def reader(coll: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    """`coll` with the current route's read preference (a cheap, I/O-free copy)."""
+    if not _offloaded.get():
+        return coll
+    preference = offloaded_read_preference()
+    return coll.with_options(read_preference=preference) if preference else coll
+
+
+def client_read_options() -> Dict[str, Any]:
+    """MongoClient options for batch exports (e.g. the settlement report)."""
+    if settings.read_preference == "primary":
+        return {}
+    return {"readPreference": settings.read_preference, "maxStalenessSeconds": settings.read_max_staleness_s}
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.config import settings
+from app.infrastructure.db.monitoring import command_collection
+
+logger = logging.getLogger(__name__)
+
+# Commands MongoDB can explain (inserts and getMores cannot)
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Parts of a command that shape the plan; everything else is driver/session noise
+_SHAPE_KEYS = {
+    "find": ("filter", "sort", "projection", "hint", "limit", "skip"),
+    "aggregate": ("pipeline", "hint"),
+    "count": ("query", "hint"),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort", "fields", "update", "remove", "upsert"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+# Keys stripped from a command before sending it back wrapped in `explain`
+_SESSION_KEYS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+
+def normalize(value: Any, key: str = "") -> Any:
+    """
+    Replace literal values with "?" while keeping field names, operators and
+    structure, so queries that only differ by their parameters share a shape.
+    Sort/projection/hint specs are structural and kept verbatim.
+    """
+    if key in ("sort", "projection", "fields", "hint", "key", "$sort", "$project"):
+        return value
+    if isinstance(value, Mapping):
+        return {k: normalize(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if key in ("$in", "$nin", "$all"):
+            return ["?"]
+        return [normalize(v, key) for v in value]
+    return "?"
+
+
+def command_shape(command_name: str, command: Mapping[str, Any]) -> str:
+    """Canonical, parameter-free JSON string identifying a query shape."""
+    parts: Dict[str, Any] = {
+        "command": command_name,
+        "collection": command_collection(command_name, command),
+    }
+    for key in _SHAPE_KEYS.get(command_name, ()):
+        if key in command:
+            if key in ("updates", "deletes"):
+                # Statement lists: shape of the first one is representative
+                stmts = command[key]
+                parts[key] = normalize(stmts[0]) if stmts else []
+            elif key in ("limit", "skip"):
+                parts[key] = "?"
+            else:
+                parts[key] = normalize(command[key], key)
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+def explain_command(command_name: str, command: Mapping[str, Any]) -> Dict[str, Any]:
+    """Wrap a captured command in an executionStats explain (never applies writes)."""
+    inner = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_KEYS}
+    for key in ("updates", "deletes"):
+        if key in inner and len(inner[key]) > 1:
+            inner[key] = inner[key][:1]  # explain accepts a single statement
+    return {"explain": inner, "verbosity": "executionStats"}
+
+
+def _plan_stages(plan: Mapping[str, Any]) -> str:
+    """Render a winning plan as `IXSCAN(index) <- FETCH <- SORT` style chain."""
+    stages: List[str] = []
+    node: Optional[Mapping[str, Any]] = plan
+    while node:
+        stage = node.get("stage", "?")
+        if node.get("indexName"):
+            stage = f"{stage}({node['indexName']})"
+        stages.append(stage)
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return " <- ".join(reversed(stages))
+
+
+def summarize_explain(explain: Mapping[str, Any]) -> Dict[str, Any]:
+    """Keep the fields that matter for index tuning from an explain result."""
+    planner = explain.get("queryPlanner", {})
+    if "winningPlan" not in planner and explain.get("stages"):
+        # aggregate explains nest the planner in the $cursor stage
+        cursor = explain["stages"][0].get("$cursor", {})
+        planner = cursor.get("queryPlanner", planner)
+        explain = cursor or explain
+    winning = planner.get("winningPlan", {})
+    winning = winning.get("queryPlan", winning)  # SBE plans wrap the classic tree
+    stats = explain.get("executionStats", {})
+    plan = _plan_stages(winning)
+    return {
+        "plan": plan,
+        "collscan": "COLLSCAN" in plan,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+@dataclass
+class ShapeStats:
+    shape: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_seen: float = field(default_factory=time.time)
+    explain: Optional[Dict[str, Any]] = None
+    explain_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "shape": json.loads(self.shape),
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "last_seen": self.last_seen,
+            "explain": self.explain,
+            "explain_error": self.explain_error,
+        }
+
+
+class SlowQueryLog:
+    """
+    Aggregates slow commands per shape and explains each shape once.
+
+    Recording happens on the driver's thread; explains are handed to the event
+    loop with `call_soon_threadsafe` and run one at a time by a background
+    task, so requests never wait for them.
+    """
+
+    def __init__(self, threshold_ms: float, max_shapes: int = 500) -> None:
+        self.threshold_ms = threshold_ms
+        self.max_shapes = max_shapes
+        self._shapes: Dict[str, ShapeStats] = {}
+        self._explained: set[str] = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- recording (driver threads)
+    def record(self, db_name: str, command_name: str, command: Mapping[str, Any], duration_ms: float) -> None:
+        shape = command_shape(command_name, command)
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    victim = min(self._shapes.values(), key=lambda s: s.total_ms)
+                    del self._shapes[victim.shape]
+                stats = self._shapes[shape] = ShapeStats(shape)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.last_seen = time.time()
+            needs_explain = (
+                self._loop is not None and command_name in EXPLAINABLE and shape not in self._explained
+            )
+            if needs_explain:
+                self._explained.add(shape)
+
+        logger.warning(
+            "slow mongo command %s.%s took %.1fms shape=%s",
+            db_name, command_name, duration_ms, shape,
+        )
+        if needs_explain and self._loop is not None:
+            item = (shape, db_name, explain_command(command_name, command))
+            try:
+                self._loop.call_soon_threadsafe(self._enqueue, item)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def _enqueue(self, item: Tuple[str, str, Dict[str, Any]]) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            with self._lock:
+                self._explained.discard(item[0])  # retry on the next occurrence
+
+    # ---- explain worker (event loop)
+    def start(self, client: Any) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=100)
+        self._task = asyncio.create_task(self._explain_worker(client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._queue = self._loop = None
+
+    async def _explain_worker(self, client: Any) -> None:
+        assert self._queue is not None
+        while True:
+            shape, db_name, explain = await self._queue.get()
+            try:
+                result = await client[db_name].command(explain)
+                summary, error = summarize_explain(result), None
+            except Exception as exc:  # explain must never take the app down
+                summary, error = None, str(exc)
+            with self._lock:
+                stats = self._shapes.get(shape)
+                if stats is not None:
+                    stats.explain, stats.explain_error = summary, error
+
+    # ---- reporting
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            ranked = sorted(self._shapes.values(), key=lambda s: s.total_ms, reverse=True)
+            return [s.as_dict() for s in ranked[:limit]]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self._explained.clear()
+
+
+class SlowQueryCommandListener(monitoring.CommandListener):
+    """Feeds commands slower than the log's threshold into the SlowQueryLog."""
+
+    def __init__(self, log: SlowQueryLog) -> None:
+        self.log = log
+        self._inflight: Dict[Tuple[Any, int], Tuple[str, Mapping[str, Any]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name != "explain":
+            self._inflight[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def _finish(self, event: Any) -> None:
+        captured = self._inflight.pop((event.connection_id, event.request_id), None)
+        if captured is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.log.threshold_ms:
+            db_name, command = captured
+            self.log.record(db_name, event.command_name, command, duration_ms)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event)
+
+
+slow_query_log = SlowQueryLog(threshold_ms=settings.slow_query_ms)
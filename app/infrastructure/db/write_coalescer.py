@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from beanie import Document, PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteConcernError, WriteError
+
+from app.config import settings
+
+_Pending = Tuple[Dict[str, Any], asyncio.Future]
+_Resolver = Callable[[Dict[str, Any]], Awaitable[AsyncIOMotorCollection]]
+
+
+class WriteCoalescer:
+    """
+    Group concurrent single-document inserts into unordered `insert_many` calls.
+
+    A background task takes whatever is queued, optionally waits `max_delay`
+    seconds for more, and writes up to `max_batch` documents in one round
+    trip. While `max_inflight` batches are being written new inserts keep
+    queueing, so batches grow with load and an idle system adds no latency
+    (group commit). Each caller's future resolves with its own outcome: the
+    per-index write errors of a BulkWriteError are routed back to the
+    documents that caused them, duplicates as DuplicateKeyError.
+
+    With `resolve`, each document's target collection is looked up at write
+    time and a batch becomes one `insert_many` per collection, issued together.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        max_batch: int = 500,
+        max_delay: float = 0.0,
+        max_inflight: int = 2,
+        max_queue: int = 0,
+        resolve: Optional[_Resolver] = None,
+    ) -> None:
+        self.collection = collection
+        self.resolve = resolve
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay)
+        self._queue: asyncio.Queue[Optional[_Pending]] = asyncio.Queue(maxsize=max(0, max_queue))
+        self._slots = asyncio.Semaphore(max(1, max_inflight))
+        self._writes: Set[asyncio.Task] = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._closed
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def insert(self, document: Dict[str, Any]) -> Any:
+        """
+        Queue a raw document (with `_id` set) and wait for its own result.
+        Waits for room when the queue is bounded and full.
+        """
+        if not self.running:
+            raise RuntimeError("WriteCoalescer is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((document, future))
+        return await future
+
+    def submit(self, document: Dict[str, Any]) -> asyncio.Future:
+        """
+        Queue a raw document without waiting for the write. Raises
+        asyncio.QueueFull when the bounded queue has no room (backpressure).
+        """
+        if not self.running:
+            raise RuntimeError("WriteCoalescer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((document, future))
+        return future
+
+    async def close(self) -> None:
+        """Stop accepting inserts, write everything already queued and wait for it."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._runner is not None:
+            await self._queue.put(None)
+            await self._runner
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    # ---- internals
+    def _drain(self, batch: List[_Pending]) -> bool:
+        """Move queued items into `batch`; returns False once the stop marker is seen."""
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if item is None:
+                return False
+            batch.append(item)
+        return True
+
+    async def _run(self) -> None:
+        running = True
+        while running:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            await self._slots.acquire()
+            running = self._drain(batch)
+            if running and self.max_delay and len(batch) < self.max_batch:
+                await asyncio.sleep(self.max_delay)
+                running = self._drain(batch)
+            task = asyncio.create_task(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+        # Shutdown: flush what is left (the stop marker is always last)
+        leftovers: List[_Pending] = []
+        self._drain(leftovers)
+        while leftovers:
+            batch, leftovers = leftovers[: self.max_batch], leftovers[self.max_batch :]
+            await self._slots.acquire()
+            await self._write(batch)
+
+    async def _write(self, batch: List[_Pending]) -> None:
+        try:
+            if self.resolve is None:
+                await self._insert(self.collection, batch)
+                return
+            groups: Dict[str, Tuple[AsyncIOMotorCollection, List[_Pending]]] = {}
+            for item in batch:
+                try:
+                    coll = await self.resolve(item[0])
+                except Exception as exc:
+                    if not item[1].done():  # the caller may have given up already
+                        item[1].set_exception(exc)
+                    continue
+                groups.setdefault(coll.name, (coll, []))[1].append(item)
+            await asyncio.gather(*(self._insert(coll, items) for coll, items in groups.values()))
+        finally:
+            self._slots.release()
+
+    async def _insert(self, collection: AsyncIOMotorCollection, batch: List[_Pending]) -> None:
+        docs = [doc for doc, _ in batch]
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            self._resolve_bulk_error(batch, exc.details)
+            return
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for doc, future in batch:
+            if not future.done():
+                future.set_result(doc["_id"])
+
+    @staticmethod
+    def _resolve_bulk_error(batch: List[_Pending], details: Dict[str, Any]) -> None:
+        failed: Dict[int, Exception] = {}
+        for err in details.get("writeErrors", []):
+            code, msg = err.get("code"), err.get("errmsg", "")
+            cls = DuplicateKeyError if code in (11000, 11001, 12582) else WriteError
+            failed[err["index"]] = cls(msg, code, err)
+        wc_errors = details.get("writeConcernErrors") or []
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            elif wc_errors:
+                first = wc_errors[0]
+                future.set_exception(WriteConcernError(first.get("errmsg", ""), first.get("code"), first))
+            else:
+                future.set_result(doc["_id"])
+
+
+# -----------------------------
+# Charge writer (started in the app lifespan)
+# -----------------------------
+_charge_writer: Optional[WriteCoalescer] = None
+
+
+async def start_charge_writer() -> None:
+    """Start the coalescer used by `insert_document` for ChargeDoc (if enabled)."""
+    from app.infrastructure.db.charge_store import charge_collection_for
+    from app.infrastructure.db.models import ChargeDoc
+
+    global _charge_writer
+    if settings.charge_insert_batching and _charge_writer is None:
+        _charge_writer = WriteCoalescer(
+            ChargeDoc.get_motor_collection(),
+            max_batch=settings.charge_insert_max_batch,
+            max_delay=settings.charge_insert_max_delay_ms / 1000,
+            max_queue=settings.charge_queue_max,
+            resolve=charge_collection_for,
+        )
+        _charge_writer.start()
+
+
+def get_charge_writer() -> Optional[WriteCoalescer]:
+    """The running charge coalescer, or None when batching is disabled/stopped."""
+    if _charge_writer is not None and _charge_writer.running:
+        return _charge_writer
+    return None
+
+
+async def stop_charge_writer() -> None:
+    """Flush pending charge inserts; called on shutdown before closing Mongo."""
+    global _charge_writer
+    if _charge_writer is not None:
+        writer, _charge_writer = _charge_writer, None
+        await writer.close()
+
+
+async def insert_document(doc: Document, writer: Optional[WriteCoalescer] = None) -> Document:
+    """
+    Insert a Beanie document through a coalescer when one is running, falling
+    back to a plain `insert()` otherwise. The `_id` is allocated client-side,
+    so the document is complete when this returns, exactly like `insert()`.
+    """
+    writer = writer or _charge_writer
+    if writer is None or not writer.running:
+        return await doc.insert()
+    if doc.id is None:
+        doc.id = PydanticObjectId()
+    payload = get_dict(doc, to_db=True, keep_nulls=doc.get_settings().keep_nulls)
+    await writer.insert(payload)
+    return doc
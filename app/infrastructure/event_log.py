@@ -0,0 +1,181 @@
+"""
+Append-only event log on local disk, split in segment files.
+
+A record is its payload prefixed by an 8-byte header: little-endian payload
+length and CRC32. Its offset is the byte position in the whole log. Segment
+files are named after the offset of their first byte
+(`00000000000000000000.log`), and a new segment starts once the active one
+reaches `segment_bytes`.
+
+`SegmentLog` (a single writer) appends a batch with one write and one
+`fsync` (group commit). On open it truncates a torn tail left by a crash.
+`LogReader` maps segments read-only with `mmap` and returns payloads as
+memoryviews into the mapping, so reading copies nothing. Any number of
+readers, in any process, can read by offset while the writer appends.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+HEADER = struct.Struct("<II")  # payload length, CRC32 of the payload
+SUFFIX = ".log"
+
+
+def segment_name(base: int) -> str:
+    return f"{base:020d}{SUFFIX}"
+
+
+def _segment_bases(directory: str) -> List[int]:
+    names = (n for n in os.listdir(directory) if n.endswith(SUFFIX) and n[: -len(SUFFIX)].isdigit())
+    return sorted(int(n[: -len(SUFFIX)]) for n in names)
+
+
+def _valid_prefix(data: bytes | mmap.mmap, size: int) -> int:
+    """Length of the run of complete, checksummed records at the start of `data`."""
+    pos = 0
+    while pos + HEADER.size <= size:
+        length, crc = HEADER.unpack_from(data, pos)
+        end = pos + HEADER.size + length
+        if end > size or zlib.crc32(memoryview(data)[pos + HEADER.size : end]) != crc:
+            break
+        pos = end
+    return pos
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SegmentLog:
+    def __init__(self, directory: str, segment_bytes: int) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        bases = _segment_bases(directory)
+        self._base = bases[-1] if bases else 0
+        path = os.path.join(directory, segment_name(self._base))
+        self._file = open(path, "a+b")
+        self._size = self._recover()
+        if not bases:
+            _fsync_dir(directory)
+
+    def _recover(self) -> int:
+        """Drop a torn tail (a batch cut short by a crash) from the active segment."""
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            return 0
+        with mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) as data:
+            valid = _valid_prefix(data, size)
+        if valid < size:
+            self._file.truncate(valid)
+            os.fsync(self._file.fileno())
+        return valid
+
+    @property
+    def end(self) -> int:
+        """Offset the next record will get."""
+        return self._base + self._size
+
+    def append(self, payloads: Sequence[bytes]) -> List[int]:
+        """Append records durably (one fsync per segment touched); returns their offsets."""
+        offsets: List[int] = []
+        buf = bytearray()
+        for payload in payloads:
+            record_size = HEADER.size + len(payload)
+            if self._size + len(buf) and self._size + len(buf) + record_size > self.segment_bytes:
+                self._write(buf)
+                buf.clear()
+                self._rotate()
+            offsets.append(self.end + len(buf))
+            buf += HEADER.pack(len(payload), zlib.crc32(payload))
+            buf += payload
+        self._write(buf)
+        return offsets
+
+    def _write(self, buf: bytearray) -> None:
+        if not buf:
+            return
+        self._file.write(buf)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size += len(buf)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._base, self._size = self._base + self._size, 0
+        self._file = open(os.path.join(self.directory, segment_name(self._base)), "a+b")
+        _fsync_dir(self.directory)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class LogReader:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._bases: List[int] = []
+        # base -> mapping of the segment as of its last read
+        self._maps: Dict[int, mmap.mmap] = {}
+
+    def _map(self, base: int) -> Optional[mmap.mmap]:
+        path = os.path.join(self.directory, segment_name(base))
+        size = os.path.getsize(path)
+        current = self._maps.get(base)
+        if current is not None and len(current) == size:
+            return current
+        if size == 0:
+            return None
+        # A grown segment is mapped again; an older mapping lives on while views into it do
+        with open(path, "rb") as f:
+            self._maps[base] = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        return self._maps[base]
+
+    def read(self, offset: int, max_records: int = 1_000) -> Tuple[List[memoryview], int]:
+        """
+        Up to `max_records` payloads from `offset`, and the offset to continue
+        from. Stops at the end of the complete records written so far.
+        """
+        records: List[memoryview] = []
+        while len(records) < max_records:
+            if not self._bases or offset >= self._bases[-1]:
+                self._bases = _segment_bases(self.directory)
+            index = bisect_right(self._bases, offset) - 1
+            if index < 0:
+                raise ValueError(f"offset {offset} is before the start of the log")
+            base = self._bases[index]
+            data = self._map(base)
+            pos = offset - base
+            size = len(data) if data is not None else 0
+            while data is not None and len(records) < max_records and pos + HEADER.size <= size:
+                length, crc = HEADER.unpack_from(data, pos)
+                end = pos + HEADER.size + length
+                if end > size:
+                    break
+                view = memoryview(data)[pos + HEADER.size : end]
+                if zlib.crc32(view) != crc:
+                    break  # being written (or torn): not readable yet
+                records.append(view)
+                pos = end
+            offset = base + pos
+            # Continue in the next segment once this one is sealed and fully read
+            if index + 1 < len(self._bases) and offset == self._bases[index + 1]:
+                continue
+            break
+        return records, offset
+
+    def close(self) -> None:
+        for data in self._maps.values():
+            try:
+                data.close()
+            except BufferError:
+                pass  # views still exported; released with them
+        self._maps.clear()
@@ -0,0 +1,125 @@
+"""
+Cross-worker invalidation of the entity caches.
+
+Each worker keeps its own client/card caches. When a `PUT`/`DELETE` changes
+an entity, `invalidation_bus.publish` drops it from the local cache at once
+and, with `CACHE_INVALIDATION=mongo`, appends a message to the capped
+collection `cache_invalidations`. Every worker tails that collection with a
+tailable cursor and drops the named entities from its own caches, so other
+workers (in this pod or any other) stop serving the old version within the
+tail latency instead of after ENTITY_CACHE_TTL_S. Works on a standalone
+`mongod`, unlike change streams.
+
+A worker that loses its cursor may have missed messages, so it clears its
+caches before tailing again. The collection holds CACHE_INVALIDATION_CAPPED_BYTES
+of recent messages; older ones are overwritten.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict, Literal, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from app.config import settings
+from app.infrastructure.cache import TTLCache, card_cache, client_cache
+from app.infrastructure.db.models import ClientDoc
+
+logger = logging.getLogger(__name__)
+
+EntityKind = Literal["client", "card"]
+
+COLLECTION = "cache_invalidations"
+
+
+class InvalidationBus:
+    def __init__(self, caches: Dict[str, TTLCache], origin: Optional[str] = None) -> None:
+        self.caches = caches
+        # Messages from this worker are skipped when tailed: already applied
+        self.origin = origin or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._coll: Optional[AsyncIOMotorCollection] = None
+        self._tail: Optional[asyncio.Task] = None
+
+    def apply(self, message: dict) -> None:
+        """Drop the entity named by a bus message from the local caches."""
+        if message.get("origin") == self.origin:
+            return
+        cache = self.caches.get(message.get("kind"))
+        if cache is not None:
+            cache.invalidate(message["entity_id"])
+
+    def clear(self) -> None:
+        for cache in self.caches.values():
+            cache.clear()
+
+    async def publish(self, kind: EntityKind, entity_id: str) -> None:
+        """Invalidate here, then broadcast. A failed broadcast leaves other workers on the TTL."""
+        self.caches[kind].invalidate(entity_id)
+        if self._coll is None:
+            return
+        try:
+            await self._coll.insert_one({"kind": kind, "entity_id": entity_id, "origin": self.origin})
+        except Exception:
+            logger.exception("cache invalidation broadcast failed for %s %s", kind, entity_id)
+
+    async def start(self, db: AsyncIOMotorDatabase, size_bytes: int) -> None:
+        try:
+            await db.create_collection(COLLECTION, capped=True, size=size_bytes)
+        except CollectionInvalid:
+            pass  # created by another worker
+        self._coll = db[COLLECTION]
+        self._tail = asyncio.create_task(self._tail_forever())
+
+    async def stop(self) -> None:
+        self._coll = None
+        if self._tail is not None:
+            task, self._tail = self._tail, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _tail_forever(self) -> None:
+        backoff = 1.0
+        resumed = False
+        while True:
+            try:
+                if await self._coll.find_one() is None:
+                    # A tailable cursor on an empty capped collection dies at once
+                    await self._coll.insert_one({"kind": None, "origin": self.origin})
+                if resumed:
+                    self.clear()
+                # Natural order from the oldest message: replaying history is
+                # harmless (invalidating twice is a no-op) and, unlike an _id
+                # bound, misses nothing inserted by workers with skewed clocks
+                cursor = self._coll.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for message in cursor:
+                        backoff = 1.0
+                        self.apply(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("cache invalidation tail failed, retrying in %.0fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+            resumed = True
+
+
+invalidation_bus = InvalidationBus({"client": client_cache, "card": card_cache})
+
+
+async def start_invalidation_bus() -> None:
+    if settings.cache_invalidation == "mongo":
+        db = ClientDoc.get_motor_collection().database
+        await invalidation_bus.start(db, settings.cache_invalidation_capped_bytes)
+
+
+async def stop_invalidation_bus() -> None:
+    await invalidation_bus.stop()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+# Latency buckets in seconds (Prometheus defaults plus sub-5ms resolution)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0,
+)
+# Mongo commands are usually sub-millisecond on a healthy deployment
+DB_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """
+    Base class for a labelled metric family.
+
+    Children are created on first use of a label combination and cached, so the
+    hot path is a dict lookup plus a short critical section. A lock is needed
+    because pymongo listeners fire from Motor's executor threads.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_label_str(self.labelnames, values)} {_fmt(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    __slots__ = ("_upper", "counts", "sum", "_lock")
+
+    def __init__(self, upper: Tuple[float, ...]) -> None:
+        self._upper = upper
+        self.counts = [0] * (len(upper) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._upper, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_fmt(bound)}"'
+                yield f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}"
+            labels = _label_str(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_fmt(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Collection of metric families rendered in the text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# -----------------------------
+# Application metrics
+# -----------------------------
+HTTP_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method", "route"))
+)
+MONGO_COMMAND_DURATION = REGISTRY.register(
+    Histogram(
+        "mongodb_command_duration_seconds",
+        "MongoDB command latency as reported by the driver.",
+        ("collection", "command", "outcome"),
+        buckets=DB_LATENCY_BUCKETS,
+    )
+)
+CHARGES_TOTAL = REGISTRY.register(
+    Counter("charges_total", "Charges created, by decision.", ("status", "reason_code"))
+)
+REFUNDS_TOTAL = REGISTRY.register(Counter("charge_refunds_total", "Charges refunded."))
+RATE_LIMITED_TOTAL = REGISTRY.register(
+    Counter("charge_rate_limited_total", "Charge requests rejected with 429, by limit scope.", ("scope",))
+)
+REQUESTS_SHED_TOTAL = REGISTRY.register(
+    Counter("http_requests_shed_total", "Requests rejected by admission control.", ("lane", "reason"))
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("admission_queue_depth", "Requests waiting for an admission slot.", ("lane",))
+)
+CHARGE_FEED_SUBSCRIBERS = REGISTRY.register(
+    Gauge("charge_feed_subscribers", "Open live charge feed (SSE) subscriptions.")
+)
+CHARGE_FEED_DROPPED_TOTAL = REGISTRY.register(
+    Counter("charge_feed_dropped_total", "Charge feed subscribers dropped for falling behind.")
+)
+REQUEST_DEADLINE_EXCEEDED_TOTAL = REGISTRY.register(
+    Counter("http_request_deadline_exceeded_total", "Requests answered 504 after running out of deadline.")
+)
+DB_CIRCUIT_STATE = REGISTRY.register(
+    Gauge("db_circuit_state", "Data-layer circuit breaker state (0 closed, 1 half-open, 2 open).")
+)
+DB_CIRCUIT_REJECTED_TOTAL = REGISTRY.register(
+    Counter("db_circuit_rejected_total", "Requests failed fast with 503 while the data-layer circuit was open.")
+)
+HTTP_COMPRESSION_BYTES_TOTAL = REGISTRY.register(
+    Counter(
+        "http_compression_bytes_total",
+        "Response body bytes through compression, before (in) and after (out), by encoding.",
+        ("encoding", "stage"),
+    )
+)
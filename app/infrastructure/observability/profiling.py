@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a single thread (the event loop).
+
+    A daemon thread wakes up every `interval` seconds, grabs the target
+    thread's current frame through `sys._current_frames()` and counts the
+    collapsed stack. The profiled thread is never paused or traced, so the
+    overhead is bounded by the sampling rate rather than by call volume.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 128) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels: List[str] = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, ready for flamegraph.pl/speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def sample_event_loop(seconds: float, interval: float = 0.005) -> SamplingProfiler:
+    """Sample the calling event loop's thread for `seconds` without blocking it."""
+    profiler = SamplingProfiler(threading.get_ident(), interval=interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+async def cprofile_event_loop(seconds: float, sort: str = "cumulative", limit: int = 80) -> str:
+    """
+    Run cProfile on the event loop thread for `seconds` and return the pstats
+    report. Unlike sampling this traces every call, so keep windows short.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+class AllocationTracker:
+    """
+    Thin wrapper over tracemalloc keeping a baseline snapshot, so allocation
+    growth between two points in time can be attributed to source lines.
+    """
+
+    def __init__(self) -> None:
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = None
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._baseline = None
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    def snapshot(self, key_type: str = "lineno", limit: int = 30) -> Dict[str, object]:
+        """Take a snapshot, make it the new baseline and return the top allocators."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        with self._lock:
+            snap = self._take()
+            self._baseline = snap
+        stats = snap.statistics(key_type)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": _trace_location(s.traceback), "size": s.size, "count": s.count}
+                for s in stats[:limit]
+            ],
+        }
+
+    def diff(self, key_type: str = "lineno", limit: int = 30) -> Dict[str, object]:
+        """Compare a fresh snapshot against the baseline (which is left untouched)."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        if self._baseline is None:
+            raise RuntimeError("no baseline snapshot; take one first")
+        snap = self._take()
+        stats = snap.compare_to(self._baseline, key_type)
+        return {
+            "top": [
+                {
+                    "location": _trace_location(s.traceback),
+                    "size_diff": s.size_diff,
+                    "size": s.size,
+                    "count_diff": s.count_diff,
+                }
+                for s in stats[:limit]
+            ],
+        }
+
+
+def _trace_location(tb: tracemalloc.Traceback) -> str:
+    frame = tb[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class RequestTimings:
+    """
+    Phase boundaries of a sampled request (perf_counter seconds).
+
+    `db` accumulates driver-reported command time; it can be fed from Motor's
+    executor threads because Motor copies the caller's context into them.
+    """
+    started: float = field(default_factory=time.perf_counter)
+    endpoint_started: Optional[float] = None
+    endpoint_finished: Optional[float] = None
+    response_started: Optional[float] = None
+    db: float = 0.0
+    db_commands: int = 0
+
+    def phases(self) -> List[Tuple[str, float]]:
+        """(name, milliseconds) pairs for a Server-Timing header."""
+        end = self.response_started or time.perf_counter()
+        out: List[Tuple[str, float]] = []
+        if self.endpoint_started is not None:
+            out.append(("validation", self.endpoint_started - self.started))
+            finished = self.endpoint_finished or end
+            handler = finished - self.endpoint_started
+            out.append(("db", self.db))
+            out.append(("app", max(handler - self.db, 0.0)))
+            out.append(("serialization", end - finished))
+        out.append(("total", end - self.started))
+        return [(name, seconds * 1000) for name, seconds in out]
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={ms:.3f}" for name, ms in self.phases()]
+        parts.append(f'dbcmds;desc="{self.db_commands}"')
+        return ", ".join(parts)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.infrastructure.db.models import ChargeDoc
+
+
+class TokenBuckets:
+    """
+    In-memory token buckets: `rate` tokens per second, up to `burst`.
+
+    Buckets live in an OrderedDict kept in last-use order, so refills are
+    computed lazily on access and idle eviction pops from the front: every
+    operation is O(1) amortized. A bucket idle for `burst / rate` seconds is
+    full again, so evicting it after that (or after `idle_s`, whichever is
+    longer) never changes a decision; `max_keys` caps memory on top.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        idle_s: float = 300.0,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.idle_s = max(idle_s, self.burst / rate)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, List[float]] = OrderedDict()  # key -> [tokens, updated_at]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        horizon = now - self.idle_s
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated > horizon and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+
+    def _tokens(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def wait(self, key: str, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available (0 when they are now)."""
+        tokens = self._tokens(key, self._clock())
+        return 0.0 if tokens >= cost else (cost - tokens) / self.rate
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Consume `cost` tokens if available; otherwise return the wait and consume nothing."""
+        now = self._clock()
+        tokens = self._tokens(key, now)
+        if tokens < cost:
+            return (cost - tokens) / self.rate
+        self._buckets[key] = [tokens - cost, now]
+        self._buckets.move_to_end(key)
+        self._evict(now)
+        return 0.0
+
+
+class MongoBuckets:
+    """
+    Shared limiter for several workers: each key gets a counter per window of
+    `burst / rate` seconds, bumped with an atomic `$inc` upsert. That admits
+    `burst` requests per window, the same long-run rate as the token bucket,
+    with windows expired by a TTL index.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, rate: float, burst: float) -> None:
+        self.collection = collection
+        self.burst = max(burst, 1.0)
+        self.window = self.burst / rate
+
+    async def take(self, key: str) -> Tuple[float, str]:
+        """Count one request for `key`; returns (retry_after_seconds, counter id for `give_back`)."""
+        now = time.time()
+        index = int(now // self.window)
+        window_end = (index + 1) * self.window
+        counter = f"{key}:{index}"
+        doc = await self.collection.find_one_and_update(
+            {"_id": counter},
+            {
+                "$inc": {"n": 1},
+                "$setOnInsert": {"expires_at": datetime.fromtimestamp(window_end, timezone.utc) + timedelta(seconds=60)},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return (0.0 if doc["n"] <= self.burst else window_end - now), counter
+
+    async def give_back(self, counter: str) -> None:
+        """Undo a `take` (same window, even if a new one started since)."""
+        await self.collection.update_one({"_id": counter}, {"$inc": {"n": -1}})
+
+
+class ChargeRateLimiter:
+    """Per-client and per-card limits for charge creation (settings are read on each call)."""
+
+    collection_name = "rate_limits"
+
+    def __init__(self) -> None:
+        self._local: Dict[Tuple[str, float, float], TokenBuckets] = {}
+        self._shared: Dict[Tuple[str, float, float], MongoBuckets] = {}
+        self._db: Optional[AsyncIOMotorDatabase] = None
+
+    def _limits(self) -> List[Tuple[str, float, float]]:
+        limits = []
+        if settings.rate_limit_client_rps > 0:
+            limits.append(("client", settings.rate_limit_client_rps, settings.rate_limit_client_burst))
+        if settings.rate_limit_card_rps > 0:
+            limits.append(("card", settings.rate_limit_card_rps, settings.rate_limit_card_burst))
+        return limits
+
+    def _local_buckets(self, limit: Tuple[str, float, float]) -> TokenBuckets:
+        buckets = self._local.get(limit)
+        if buckets is None:
+            _, rate, burst = limit
+            buckets = self._local[limit] = TokenBuckets(rate, burst, idle_s=settings.rate_limit_idle_s)
+        return buckets
+
+    async def _shared_buckets(self, limit: Tuple[str, float, float]) -> MongoBuckets:
+        db = ChargeDoc.get_motor_collection().database
+        if db is not self._db:
+            await db[self.collection_name].create_index("expires_at", expireAfterSeconds=0)
+            self._db = db
+            self._shared.clear()
+        buckets = self._shared.get(limit)
+        if buckets is None:
+            _, rate, burst = limit
+            buckets = self._shared[limit] = MongoBuckets(db[self.collection_name], rate, burst)
+        return buckets
+
+    async def check(self, keys: Dict[str, str]) -> Optional[Tuple[str, float]]:
+        """
+        Take one token per scope for `keys` ({"client": id, "card": id}).
+        Returns (scope, retry_after_seconds) for the first exhausted scope,
+        or None when the request is admitted.
+        """
+        limits = [limit for limit in self._limits() if limit[0] in keys]
+        if settings.rate_limit_backend == "mongo":
+            # Counted one scope at a time: a rejection gives back what this call took
+            taken: List[Tuple[MongoBuckets, str]] = []
+            for limit in limits:
+                buckets = await self._shared_buckets(limit)
+                wait, counter = await buckets.take(f"{limit[0]}:{keys[limit[0]]}")
+                taken.append((buckets, counter))
+                if wait > 0:
+                    await asyncio.gather(*(b.give_back(c) for b, c in taken))
+                    return limit[0], wait
+            return None
+
+        # In memory: check every scope before consuming, so a rejection costs no tokens
+        for limit in limits:
+            wait = self._local_buckets(limit).wait(keys[limit[0]])
+            if wait > 0:
+                return limit[0], wait
+        for limit in limits:
+            self._local_buckets(limit).take(keys[limit[0]])
+        return None
+
+
+charge_rate_limiter = ChargeRateLimiter()
@@ -0,0 +1,295 @@
+"""
+Cold-archive job: moves charges older than a cutoff out of Mongo into the
+compressed files read by `app.infrastructure.archive`.
+
+Only whole months strictly before the cutoff are archived, each one once:
+its charges are spilled per client-hash shard to temporary BSON files, each
+shard is sorted (client, newest first) and encoded into blocks, the month's
+charge ids and the manifest are written, and only then are the hot documents
+deleted (an emptied monthly partition is dropped). Reads stay correct at
+every step because `list_charges` merges hot and archived rows and drops
+duplicates.
+
+Before deleting, every archived charge with a `request_id` gets a tombstone
+in the `charge_request_ids` directory (`archived: True`, with its client and
+month), in both layouts: a retried request then finds its archived charge
+instead of creating a second one or waiting on a claim whose partition is gone.
+
+A month with outbox events the relay has not written yet is left for a later
+run, and the deletes never take a charge with pending events (the relay reads
+the charge to log them); such a charge stays hot next to its archived copy.
+
+Usage:
+    python -m app.jobs.archive                  # cutoff: ARCHIVE_AFTER_DAYS ago
+    python -m app.jobs.archive --after-days 730 --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fcntl
+import logging
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.infrastructure.archive import ChargeArchive, ShardWriter, get_archive, month_bounds, shard_of
+from app.infrastructure.db.charge_store import partitioned
+from app.infrastructure.db.models import OUTBOX_KEY, OUTBOX_PENDING, OUTBOX_RELAYED, ChargeDoc
+from app.infrastructure.db.partitions import REQUEST_IDS_COLLECTION, charge_partitions, month_key
+
+logger = logging.getLogger(__name__)
+
+_DELETE_BATCH = 1_000
+_archiver: Optional[asyncio.Task] = None
+
+
+@contextmanager
+def _exclusive(root: Path) -> Iterator[bool]:
+    """Non-blocking lock so concurrent workers never archive the same month."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _next_month(month: str) -> str:
+    return month_key(month_bounds(month)[1])
+
+
+async def candidate_months(archive: ChargeArchive, cutoff: datetime) -> List[str]:
+    """Months ending at or before `cutoff` that still have hot charges, oldest first."""
+    done = set(archive.months())
+    if partitioned():
+        months = await charge_partitions.months()
+    else:
+        # _id embeds the creation time, so the oldest charge is an _id index lookup
+        oldest = await ChargeDoc.get_motor_collection().find_one({}, {"_id": 1}, sort=[("_id", 1)])
+        months = []
+        if oldest is not None:
+            month = month_key(oldest["_id"].generation_time)
+            while month_bounds(month)[1] <= cutoff:
+                months.append(month)
+                month = _next_month(month)
+    return sorted(m for m in months if m not in done and month_bounds(m)[1] <= cutoff)
+
+
+def _month_source(month: str) -> Tuple[AsyncIOMotorCollection, Dict[str, Any]]:
+    """Collection and filter selecting one month of hot charges."""
+    if partitioned():
+        return charge_partitions.collection(month), {}
+    start, end = month_bounds(month)
+    # Range on the _id index (widened a day for clock skew), exact on attempted_at
+    return ChargeDoc.get_motor_collection(), {
+        "_id": {"$gte": ObjectId.from_datetime(start - timedelta(days=1)), "$lt": ObjectId.from_datetime(end + timedelta(days=1))},
+        "attempted_at": {"$gte": start, "$lt": end},
+    }
+
+
+def _spill(paths: List[Path], shards: int, docs: List[Dict[str, Any]]) -> None:
+    handles: Dict[int, Any] = {}
+    try:
+        for doc in docs:
+            shard = shard_of(doc["client_id"], shards)
+            if shard not in handles:
+                handles[shard] = open(paths[shard], "ab")
+            handles[shard].write(bson.encode(doc))
+    finally:
+        for fh in handles.values():
+            fh.close()
+
+
+def _read_spill(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, "rb") as fh:
+        return list(bson.decode_file_iter(fh))
+
+
+def _write_shard(archive: ChargeArchive, month: str, shard: int, spill: Path) -> List[ObjectId]:
+    """Encode one shard; returns the ids of the charges written."""
+    docs = _read_spill(spill)
+    if not docs:
+        return []
+    # Stable sorts: newest first, then grouped by client
+    docs.sort(key=lambda d: d["attempted_at"], reverse=True)
+    docs.sort(key=lambda d: d["client_id"].binary)
+    writer = ShardWriter(archive.shard_path(month, shard))
+    for client_id, rows in groupby(docs, key=lambda d: d["client_id"]):
+        writer.write_client(client_id, list(rows))
+    writer.close()
+    return [d["_id"] for d in docs]
+
+
+async def _tombstone(month: str, docs: List[Dict[str, Any]]) -> None:
+    """Point the request_ids of archived charges at the archive."""
+    updates = [
+        UpdateOne(
+            {"_id": d["request_id"]},
+            {"$set": {"charge_id": d["_id"], "partition": month, "client_id": d["client_id"], "archived": True}},
+            upsert=True,
+        )
+        for d in docs
+        if isinstance(d.get("request_id"), str)
+    ]
+    if updates:
+        await ChargeDoc.get_motor_collection().database[REQUEST_IDS_COLLECTION].bulk_write(updates, ordered=False)
+
+
+async def _delete_hot(coll: AsyncIOMotorCollection, docs: List[Dict[str, Any]]) -> None:
+    """
+    Delete archived documents. A charge refunded while it was being archived
+    no longer matches and stays hot (hot rows win over archived duplicates),
+    as does one with outbox events still to relay.
+    """
+    for start in range(0, len(docs), _DELETE_BATCH):
+        batch = docs[start : start + _DELETE_BATCH]
+        refunded = [d["_id"] for d in batch if d.get("refunded")]
+        pending = [d["_id"] for d in batch if not d.get("refunded")]
+        if refunded:
+            await coll.delete_many({"_id": {"$in": refunded}, **OUTBOX_RELAYED})
+        if pending:
+            await coll.delete_many({"_id": {"$in": pending}, "refunded": False, **OUTBOX_RELAYED})
+
+
+async def archive_month(archive: ChargeArchive, month: str, shards: int, batch_size: int = 5_000) -> int:
+    """Archive one month and remove it from Mongo; returns the rows archived."""
+    coll, query = _month_source(month)
+    if await coll.find_one({**query, **OUTBOX_PENDING}, {"_id": 1}, hint=OUTBOX_KEY) is not None:
+        logger.info("%s has outbox events to relay, leaving it for a later run", month)
+        return 0
+    with tempfile.TemporaryDirectory(dir=archive.root, prefix=f".spill-{month}-") as tmp:
+        spills = [Path(tmp) / f"{shard:02d}.bson" for shard in range(shards)]
+        cursor = coll.find(query).batch_size(batch_size)
+        batch: List[Dict[str, Any]] = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(_spill, spills, shards, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(_spill, spills, shards, batch)
+
+        ids: List[ObjectId] = []
+        for shard in range(shards):
+            ids += await asyncio.to_thread(_write_shard, archive, month, shard, spills[shard])
+        rows = len(ids)
+        if rows == 0:
+            return 0
+        await asyncio.to_thread(archive.write_ids, month, ids)
+        archive.record_month(month, shards, rows)
+
+        for shard in range(shards):
+            docs = await asyncio.to_thread(_read_spill, spills[shard])
+            await _tombstone(month, docs)
+            await _delete_hot(coll, docs)
+
+    if partitioned() and await coll.estimated_document_count() == 0:
+        await charge_partitions.drop(month)
+    logger.info("archived %d charges of %s", rows, month)
+    return rows
+
+
+async def run_archiver(cutoff: Optional[datetime] = None, dry_run: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Archive every eligible month before `cutoff` (default: ARCHIVE_AFTER_DAYS
+    ago). Returns rows per month, or None when another archiver holds the lock.
+    """
+    archive = get_archive()
+    if archive is None:
+        raise RuntimeError("ARCHIVE_DIR is not configured")
+    cutoff = cutoff or datetime.now(timezone.utc) - timedelta(days=settings.archive_after_days)
+    with _exclusive(archive.root) as acquired:
+        if not acquired:
+            return None
+        months = await candidate_months(archive, cutoff)
+        if dry_run:
+            return {month: 0 for month in months}
+        return {month: await archive_month(archive, month, settings.archive_shards) for month in months}
+
+
+# -----------------------------
+# Background loop (started in the app lifespan)
+# -----------------------------
+async def _archive_forever(interval: float) -> None:
+    while True:
+        try:
+            archived = await run_archiver()
+            if archived:
+                logger.info("archiver run: %s", archived)
+        except Exception:  # keep the loop alive; the next run retries
+            logger.exception("archiver run failed")
+        await asyncio.sleep(interval)
+
+
+def start_archiver() -> None:
+    global _archiver
+    if settings.archive_dir and settings.archive_interval_s > 0 and _archiver is None:
+        _archiver = asyncio.create_task(_archive_forever(settings.archive_interval_s))
+
+
+async def stop_archiver() -> None:
+    global _archiver
+    if _archiver is not None:
+        task, _archiver = _archiver, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--after-days", type=int, default=None, help="archive charges older than this (ARCHIVE_AFTER_DAYS)")
+    p.add_argument("--archive-dir", default=None, help="defaults to ARCHIVE_DIR")
+    p.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    return p.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> Optional[Dict[str, int]]:
+    from app.infrastructure.db.mongo import close_mongo, init_mongo
+
+    if args.archive_dir:
+        settings.archive_dir = args.archive_dir
+    days = args.after_days if args.after_days is not None else settings.archive_after_days
+    await init_mongo()
+    try:
+        return await run_archiver(datetime.now(timezone.utc) - timedelta(days=days), dry_run=args.dry_run)
+    finally:
+        await close_mongo()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = _parse_args(argv)
+    if not (args.archive_dir or settings.archive_dir):
+        sys.exit("ARCHIVE_DIR (or --archive-dir) is required")
+    result = asyncio.run(_main(args))
+    if result is None:
+        sys.exit("another archiver is running")
+    print(f"[archive] {result}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
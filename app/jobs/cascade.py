@@ -0,0 +1,94 @@
+"""
+Cascade delete of a client's cards and charges, run as a background job.
+
+The API request enqueues this job (held, see `enqueue_job`) before it
+deletes the client document, so a request that dies after the delete still
+leaves a job behind; the job does nothing while the client exists. It
+removes the client's charges (every partition when partitioned) and cards in chunks:
+ids are read from the `client_id` indexes, deleted with one `delete_many` per
+chunk, and a pause follows each chunk so live traffic keeps the database.
+Progress is counted per collection kind and the job is idempotent, so a
+resumed attempt simply drains whatever is left.
+
+A charge whose outbox still holds events the relay has not written is kept
+(the relay reads the charge to log them): the attempt fails once the rest is
+gone and the runner retries it after a backoff, by when the relay has caught up.
+
+Charges already moved to the cold archive are immutable and stay there.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from app.config import settings
+from app.infrastructure.db.charge_store import partitioned
+from app.infrastructure.db.models import OUTBOX_RELAYED, CardDoc, ChargeDoc, ClientDoc, JobDoc
+from app.infrastructure.db.partitions import charge_partitions
+from app.jobs.runner import Report, enqueue_job, handler
+
+KIND = "delete_client"
+
+
+class PendingOutbox(RuntimeError):
+    """Charges with unrelayed events were kept; the job is retried later."""
+
+
+async def enqueue_client_delete(client_id: str) -> JobDoc:
+    """Cascade job for a client about to be deleted, held for JOB_LEASE_S unless released."""
+    return await enqueue_job(KIND, {"client_id": client_id}, hold_s=settings.job_lease_s)
+
+
+async def _charge_collections() -> List[AsyncIOMotorCollection]:
+    if partitioned():
+        return [charge_partitions.collection(month) for month in await charge_partitions.months()]
+    return [ChargeDoc.get_motor_collection()]
+
+
+async def drain(
+    coll: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    label: str,
+    report: Report,
+    directory: bool = False,
+) -> int:
+    """
+    Delete everything matching `query` in chunks of CASCADE_DELETE_BATCH,
+    pausing CASCADE_DELETE_PAUSE_MS between chunks; returns the count deleted.
+    With `directory`, the chunk's `request_id` directory entries go too.
+    """
+    projection = {"_id": 1, "request_id": 1} if directory else {"_id": 1}
+    deleted = 0
+    while True:
+        batch = await coll.find(query, projection).limit(settings.cascade_delete_batch).to_list(None)
+        if not batch:
+            return deleted
+        # `query` again: a document that stopped matching since the find stays
+        result = await coll.delete_many({**query, "_id": {"$in": [d["_id"] for d in batch]}})
+        if directory:
+            request_ids = [d["request_id"] for d in batch if isinstance(d.get("request_id"), str)]
+            if request_ids:
+                await charge_partitions.request_ids.delete_many({"_id": {"$in": request_ids}})
+        deleted += result.deleted_count
+        await report({label: result.deleted_count})
+        await asyncio.sleep(settings.cascade_delete_pause_ms / 1000)
+
+
+@handler(KIND)
+async def delete_client_data(job: JobDoc, report: Report) -> None:
+    client_id = ObjectId(job.params["client_id"])
+    if await ClientDoc.get_motor_collection().count_documents({"_id": client_id}, limit=1):
+        return  # the delete that queued this job never happened
+    query = {"client_id": client_id}
+    # Charges first: they reference the cards
+    pending = False
+    for coll in await _charge_collections():
+        await drain(coll, {**query, **OUTBOX_RELAYED}, "charges", report, directory=partitioned())
+        if await coll.find_one(query, {"_id": 1}) is not None:
+            pending = True
+    if pending:
+        raise PendingOutbox(f"charges of client {client_id} still have events to relay")
+    await drain(CardDoc.get_motor_collection(), query, "cards", report)
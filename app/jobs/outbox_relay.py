@@ -0,0 +1,158 @@
+"""
+Outbox relay: moves charge and refund events from the charges' outboxes to
+the local event log that downstream consumers (ledger, notifications) read.
+
+With OUTBOX_ENABLED, `create_charge` and `refund_charge` put an event in the
+charge's `outbox` array within the same single-document write as the change
+itself, so an event exists if and only if its change was committed. No
+transaction (or replica set) is needed. The relay:
+
+  1. takes up to OUTBOX_BATCH charges with pending events (partial index on
+     `outbox`, so only those are scanned);
+  2. appends one record per event to the segment log and fsyncs once;
+  3. removes exactly the relayed events from each outbox (an event pushed
+     meanwhile stays) and unsets emptied outboxes, dropping them from the index.
+
+A crash between 2 and 3 relays those events again: delivery is at least
+once, and consumers dedupe by `event_id`. Run a single relay per log.
+
+Usage:
+    python -m app.jobs.outbox_relay run [--uri URI] [--dir DIR]
+    python -m app.jobs.outbox_relay read --offset 0 [--max 100] [--dir DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from app.config import settings
+from app.infrastructure.db.models import OUTBOX_KEY, OUTBOX_PENDING
+from app.infrastructure.db.partitions import PARTITION_RE
+from app.infrastructure.event_log import LogReader, SegmentLog
+
+_CHARGE_FIELDS = ("amount", "status", "reason_code", "refunded", "request_id")
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # ObjectId
+
+
+def event_record(raw: Dict[str, Any], event: Dict[str, Any]) -> bytes:
+    """Log record of one outbox event: the event and the charge as of relaying (ChargeOut fields)."""
+    charge = {
+        "id": raw["_id"],
+        "client_id": raw["client_id"],
+        "card_id": raw["card_id"],
+        "attempted_at": raw["attempted_at"],
+        "refunded_at": raw.get("refunded_at"),
+        **{field: raw.get(field) for field in _CHARGE_FIELDS},
+    }
+    at = raw.get("refunded_at") if event["kind"] == "refund" else raw["attempted_at"]
+    record = {"event_id": event["id"], "kind": event["kind"], "at": at, "charge": charge}
+    return json.dumps(record, default=_json_default, separators=(",", ":")).encode()
+
+
+def _relayed(ids: List[Any]) -> List[Dict[str, Any]]:
+    """Update pipeline removing `ids` from the outbox, and the outbox itself once empty."""
+    left = {"$filter": {"input": "$outbox", "cond": {"$not": [{"$in": ["$$this.id", ids]}]}}}
+    return [
+        {
+            "$set": {
+                "outbox": {
+                    "$let": {
+                        "vars": {"left": left},
+                        "in": {"$cond": [{"$eq": [{"$size": "$$left"}, 0]}, "$$REMOVE", "$$left"]},
+                    }
+                }
+            }
+        }
+    ]
+
+
+def charge_collections(db: Database) -> List[Collection]:
+    if settings.charge_partitioning != "monthly":
+        return [db["charges"]]
+    return [db[name] for name in sorted(db.list_collection_names()) if PARTITION_RE.match(name)]
+
+
+def relay_batch(collections: Iterable[Collection], log: SegmentLog, batch: int) -> int:
+    """Relay up to `batch` charges' pending events; returns the number of events relayed."""
+    relayed = 0
+    for coll in collections:
+        pending = list(coll.find(OUTBOX_PENDING).hint(OUTBOX_KEY).limit(batch))
+        if not pending:
+            continue
+        records = [event_record(raw, event) for raw in pending for event in raw["outbox"]]
+        log.append(records)
+        coll.bulk_write(
+            [UpdateOne({"_id": raw["_id"]}, _relayed([e["id"] for e in raw["outbox"]])) for raw in pending],
+            ordered=False,
+        )
+        relayed += len(records)
+    return relayed
+
+
+def run_relay(uri: str, directory: str) -> None:
+    log = SegmentLog(directory, settings.outbox_segment_bytes)
+    print(f"[outbox] relaying to {directory} from offset {log.end}", file=sys.stderr)
+    try:
+        with MongoClient(uri) as client:
+            db = client.get_default_database()
+            while True:
+                # Partitions appear over time: list them on every pass
+                if not relay_batch(charge_collections(db), log, settings.outbox_batch):
+                    time.sleep(settings.outbox_poll_interval_ms / 1000)
+    finally:
+        log.close()
+
+
+def read_events(directory: str, offset: int, max_records: int) -> None:
+    reader = LogReader(directory)
+    try:
+        records, next_offset = reader.read(offset, max_records)
+        for record in records:
+            sys.stdout.write(bytes(record).decode() + "\n")
+    finally:
+        reader.close()
+    print(f"[outbox] next offset {next_offset}", file=sys.stderr)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--dir", default=None, help="event log directory (defaults to OUTBOX_LOG_DIR)")
+    sub = p.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="relay outbox events to the log until interrupted")
+    run.add_argument("--uri", default=None, help="MongoDB URI with database (defaults to MONGODB_URI)")
+    read = sub.add_parser("read", help="print events from an offset as JSON lines")
+    read.add_argument("--offset", type=int, default=0)
+    read.add_argument("--max", type=int, default=100)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    directory = args.dir or settings.outbox_log_dir
+    if args.command == "run":
+        try:
+            run_relay(args.uri or settings.mongodb_uri, directory)
+        except KeyboardInterrupt:
+            pass
+    else:
+        read_events(directory, args.offset, args.max)
+
+
+if __name__ == "__main__":
+    main()
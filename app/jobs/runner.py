@@ -0,0 +1,197 @@
+"""
+Durable background jobs stored in the `jobs` collection.
+
+A job is claimed with one atomic `find_one_and_update` that takes a lease
+(`owner`, `lease_until`); the handler renews it each time it reports progress.
+Work left behind by a crashed or restarted worker becomes claimable again once
+its lease expires, so handlers must be idempotent and able to pick up where a
+previous attempt stopped. Failures are retried up to JOB_MAX_ATTEMPTS times.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.infrastructure.db.models import JobDoc
+
+logger = logging.getLogger(__name__)
+
+Report = Callable[[Mapping[str, int]], Awaitable[None]]
+Handler = Callable[[JobDoc, Report], Awaitable[None]]
+
+HANDLERS: Dict[str, Handler] = {}
+# Identifies this process' leases
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_runner: Optional[asyncio.Task] = None
+_current: Optional[JobDoc] = None
+_wakeup = asyncio.Event()
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed by another worker (this one stalled past its lease)."""
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """Register the coroutine that runs jobs of `kind`."""
+
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_job(kind: str, params: Dict[str, Any], hold_s: float = 0.0) -> JobDoc:
+    """
+    Persist a queued job and wake this worker's runner. A job enqueued ahead
+    of the change that needs it is held for `hold_s` seconds: `release_job`
+    starts it once the change is made, `discard_job` drops it if the change
+    fails, and if the caller dies in between it becomes claimable anyway.
+    """
+    job = JobDoc(kind=kind, params=params, lease_until=_now() + timedelta(seconds=hold_s))
+    await job.insert()
+    if not hold_s:
+        _wakeup.set()
+    return job
+
+
+async def release_job(job: JobDoc) -> None:
+    """Make a held job claimable now."""
+    await JobDoc.get_motor_collection().update_one(
+        {"_id": job.id, "status": "queued"}, {"$set": {"lease_until": _now()}}
+    )
+    _wakeup.set()
+
+
+async def discard_job(job: JobDoc) -> None:
+    """Delete a held job whose change did not happen."""
+    await JobDoc.get_motor_collection().delete_one({"_id": job.id, "status": "queued"})
+
+
+async def claim_job() -> Optional[JobDoc]:
+    """Atomically take the oldest claimable job (queued, or running with an expired lease)."""
+    now = _now()
+    raw = await JobDoc.get_motor_collection().find_one_and_update(
+        {"status": {"$in": ["queued", "running"]}, "lease_until": {"$lte": now}},
+        {
+            "$set": {
+                "status": "running",
+                "owner": WORKER_ID,
+                "lease_until": now + timedelta(seconds=settings.job_lease_s),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("lease_until", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+    return JobDoc.model_validate(raw) if raw else None
+
+
+def _reporter(job: JobDoc) -> Report:
+    async def report(counts: Mapping[str, int]) -> None:
+        now = _now()
+        update: Dict[str, Any] = {"$set": {"lease_until": now + timedelta(seconds=settings.job_lease_s), "updated_at": now}}
+        if counts:
+            update["$inc"] = {f"progress.{name}": n for name, n in counts.items()}
+        result = await JobDoc.get_motor_collection().update_one({"_id": job.id, "owner": WORKER_ID}, update)
+        if not result.matched_count:
+            raise LeaseLost(str(job.id))
+
+    return report
+
+
+async def _finish(job: JobDoc, **fields: Any) -> None:
+    now = _now()
+    await JobDoc.get_motor_collection().update_one(
+        {"_id": job.id, "owner": WORKER_ID},
+        {"$set": {**fields, "owner": None, "updated_at": now}},
+    )
+
+
+async def run_job(job: JobDoc) -> None:
+    """Run a claimed job to completion, recording the outcome (or scheduling a retry)."""
+    global _current
+    fn = HANDLERS.get(job.kind)
+    if fn is None:
+        await _finish(job, status="failed", error=f"unknown job kind {job.kind!r}", finished_at=_now())
+        return
+    _current = job
+    try:
+        await fn(job, _reporter(job))
+    except LeaseLost:
+        logger.warning("job %s was reclaimed by another worker", job.id)
+        return
+    except Exception as exc:
+        if job.attempts >= settings.job_max_attempts:
+            logger.exception("job %s failed for good", job.id)
+            await _finish(job, status="failed", error=repr(exc), finished_at=_now())
+        else:
+            logger.exception("job %s failed (attempt %d), will retry", job.id, job.attempts)
+            backoff = timedelta(seconds=min(2 ** job.attempts, 300))
+            await _finish(job, status="queued", error=repr(exc), lease_until=_now() + backoff)
+        return
+    finally:
+        _current = None
+    await _finish(job, status="done", error=None, finished_at=_now())
+
+
+async def run_pending_jobs() -> int:
+    """Run claimable jobs until none is left; returns how many were run."""
+    ran = 0
+    while (job := await claim_job()) is not None:
+        await run_job(job)
+        ran += 1
+    return ran
+
+
+# -----------------------------
+# Background loop (started in the app lifespan)
+# -----------------------------
+async def _run_forever(interval: float) -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            await run_pending_jobs()
+        except Exception:  # keep the loop alive; the next poll retries
+            logger.exception("job runner iteration failed")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_job_runner() -> None:
+    global _runner
+    if _runner is None:
+        _runner = asyncio.create_task(_run_forever(settings.jobs_poll_interval_s))
+
+
+async def stop_job_runner() -> None:
+    """Cancel the runner and hand an interrupted job back (claimable right away, progress kept)."""
+    global _runner
+    if _runner is not None:
+        task, _runner = _runner, None
+        interrupted = _current
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if interrupted is not None:
+            await JobDoc.get_motor_collection().update_one(
+                {"_id": interrupted.id, "owner": WORKER_ID},
+                {"$set": {"owner": None, "lease_until": _now()}},
+            )
@@ -0,0 +1,238 @@
+"""
+End-of-day settlement report: approved minus refunded amounts per client and
+card for one UTC day, written as a deterministic CSV plus a SHA-256 checksum.
+
+Charges approved on the day count as approved (by `attempted_at`); charges
+refunded on the day count as refunded (by `refunded_at`, whatever day they
+were attempted). The `client_id` space is cut into contiguous ObjectId ranges
+at quantiles of the `clients` index, and each range is aggregated
+server-side by a process-pool worker with `$match` + `$group` pipelines
+served by the (client_id, status, attempted_at) and partial refunded_at
+indexes. Amounts are summed as Decimal128, so partial results merge exactly
+and the output does not depend on partitioning or scheduling. There are more
+ranges than workers, so skewed (heavy) clients do not leave workers idle.
+
+Days already moved to the cold archive cannot be settled from Mongo.
+
+Usage:
+    python -m app.jobs.settlement --date 2026-01-31
+    python -m app.jobs.settlement --date 2026-01-31 --workers 8 --ranges 64 --out /tmp/settlement.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bson import Decimal128, ObjectId
+from pymongo import MongoClient
+from pymongo.database import Database
+
+from app.config import settings
+from app.infrastructure.archive import get_archive
+from app.infrastructure.db.partitions import PARTITION_RE, month_key, partition_name
+from app.infrastructure.db.read_routing import client_read_options
+
+COLUMNS = (
+    "client_id",
+    "card_id",
+    "approved_count",
+    "approved_amount",
+    "refunded_count",
+    "refunded_amount",
+    "net_amount",
+)
+_CENTS = Decimal("0.01")
+
+# (client_id, card_id) as hex -> [approved_count, approved_amount, refunded_count, refunded_amount]
+Totals = Dict[Tuple[str, str], List[Any]]
+# (kind, client_id, card_id, count, amount) rows returned by a worker
+Partial = List[Tuple[str, str, str, int, str]]
+ClientRange = Tuple[Optional[str], Optional[str]]
+
+# Per-process state set by the pool initializer
+_db: Optional[Database] = None
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def client_ranges(db: Database, count: int) -> List[ClientRange]:
+    """
+    Up to `count` contiguous [lo, hi) client_id ranges (hex, None = open end)
+    of roughly equal client counts, read from the `_id` index of `clients`.
+    Together they cover every ObjectId, so charges of deleted clients count too.
+    """
+    total = db.clients.estimated_document_count()
+    bounds: List[str] = []
+    for i in range(1, count):
+        doc = next(db.clients.find({}, {"_id": 1}).sort("_id", 1).skip(i * total // count).limit(1), None)
+        if doc is not None and (not bounds or str(doc["_id"]) > bounds[-1]):
+            bounds.append(str(doc["_id"]))
+    edges: List[Optional[str]] = [None, *bounds, None]
+    return list(zip(edges, edges[1:]))
+
+
+def _range_filter(client_range: ClientRange) -> Dict[str, Any]:
+    lo, hi = client_range
+    spec: Dict[str, Any] = {}
+    if lo:
+        spec["$gte"] = ObjectId(lo)
+    if hi:
+        spec["$lt"] = ObjectId(hi)
+    return {"client_id": spec} if spec else {}
+
+
+def _pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"client_id": "$client_id", "card_id": "$card_id"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": {"$toDecimal": "$amount"}},
+            }
+        },
+    ]
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+def _init_worker(uri: str) -> None:
+    global _db
+    _db = MongoClient(uri, **client_read_options()).get_default_database()
+
+
+def _settle_range(
+    client_range: ClientRange,
+    start: datetime,
+    end: datetime,
+    attempt_colls: Sequence[str],
+    refund_colls: Sequence[str],
+) -> Partial:
+    assert _db is not None, "worker not initialized"
+    by_client = _range_filter(client_range)
+    approved = {**by_client, "status": "approved", "attempted_at": {"$gte": start, "$lt": end}}
+    refunded = {**by_client, "refunded_at": {"$gte": start, "$lt": end, "$type": "date"}}
+    rows: Partial = []
+    for kind, match, colls in (("approved", approved, attempt_colls), ("refunded", refunded, refund_colls)):
+        for name in colls:
+            for group in _db[name].aggregate(_pipeline(match), allowDiskUse=True):
+                amount = group["amount"]
+                amount = amount.to_decimal() if isinstance(amount, Decimal128) else Decimal(amount)
+                key = group["_id"]
+                rows.append((kind, str(key["client_id"]), str(key["card_id"]), group["count"], str(amount)))
+    return rows
+
+
+# -----------------------------
+# Merge and output
+# -----------------------------
+def merge(partials: Iterable[Partial]) -> Totals:
+    """Sum worker rows per (client, card); exact, so the order they arrive in does not matter."""
+    totals: Totals = {}
+    for partial in partials:
+        for kind, client_id, card_id, count, amount in partial:
+            entry = totals.setdefault((client_id, card_id), [0, Decimal(0), 0, Decimal(0)])
+            offset = 0 if kind == "approved" else 2
+            entry[offset] += count
+            entry[offset + 1] += Decimal(amount)
+    return totals
+
+
+def render_csv(totals: Totals) -> bytes:
+    """CSV sorted by (client_id, card_id), amounts rounded to cents."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for (client_id, card_id), (n_ok, ok, n_ref, ref) in sorted(totals.items()):
+        writer.writerow(
+            (
+                client_id,
+                card_id,
+                n_ok,
+                ok.quantize(_CENTS),
+                n_ref,
+                ref.quantize(_CENTS),
+                (ok - ref).quantize(_CENTS),
+            )
+        )
+    return out.getvalue().encode()
+
+
+def write_report(path: Path, data: bytes) -> str:
+    """Write the CSV and `<path>.sha256` (sha256sum format) atomically; returns the digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    for target, content in ((path, data), (path.with_name(path.name + ".sha256"), f"{digest}  {path.name}\n".encode())):
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, target)
+    return digest
+
+
+def _charge_collections(db: Database, day: date) -> Tuple[List[str], List[str]]:
+    """Collections holding the day's attempts, and those that can hold its refunds."""
+    if settings.charge_partitioning != "monthly":
+        return ["charges"], ["charges"]
+    months = sorted(m.group(1) for m in map(PARTITION_RE.match, db.list_collection_names()) if m)
+    month = month_key(day_bounds(day)[0])
+    attempts = [partition_name(month)] if month in months else []
+    # A refund can land on a charge of any earlier month
+    return attempts, [partition_name(m) for m in months if m <= month]
+
+
+def run_settlement(uri: str, day: date, workers: Optional[int] = None, ranges: Optional[int] = None) -> Totals:
+    workers = workers or os.cpu_count() or 1
+    with MongoClient(uri, **client_read_options()) as client:
+        db = client.get_default_database()
+        attempt_colls, refund_colls = _charge_collections(db, day)
+        tasks = client_ranges(db, ranges or workers * 4)
+    start, end = day_bounds(day)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(uri,)) as pool:
+        futures = [pool.submit(_settle_range, r, start, end, attempt_colls, refund_colls) for r in tasks]
+        return merge(fut.result() for fut in as_completed(futures))
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--date", type=date.fromisoformat, required=True, help="UTC day to settle (YYYY-MM-DD)")
+    p.add_argument("--uri", default=None, help="MongoDB URI with database (defaults to MONGODB_URI)")
+    p.add_argument("--out", type=Path, default=None, help="defaults to settlement-<date>.csv")
+    p.add_argument("--workers", type=int, default=None, help="process pool size (CPU count)")
+    p.add_argument("--ranges", type=int, default=None, help="client_id ranges (4 per worker)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    archive = get_archive()
+    if archive is not None and month_key(day_bounds(args.date)[0]) in archive.months():
+        sys.exit(f"{args.date} is archived; settle it before ARCHIVE_AFTER_DAYS")
+    started = time.monotonic()
+    totals = run_settlement(args.uri or settings.mongodb_uri, args.date, args.workers, args.ranges)
+    out = args.out or Path(f"settlement-{args.date.isoformat()}.csv")
+    digest = write_report(out, render_csv(totals))
+    print(
+        f"[settlement] {args.date}: {len(totals)} client/card rows in {time.monotonic() - started:.1f}s "
+        f"-> {out} (sha256 {digest})",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,83 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from app.config import settings
+from app.infrastructure.charge_feed import start_charge_feed, stop_charge_feed
 from app.infrastructure.db.mongo import init_mongo, close_mongo
+from app.infrastructure.db.write_coalescer import start_charge_writer, stop_charge_writer
+from app.infrastructure.invalidation import start_invalidation_bus, stop_invalidation_bus
+from app.jobs.archive import start_archiver, stop_archiver
+from app.jobs.runner import start_job_runner, stop_job_runner
+from app.http.middleware.admission import AdmissionMiddleware
+from app.http.middleware.compression import CompressionMiddleware
+from app.http.middleware.data_guard import DataLayerGuardMiddleware
+from app.http.middleware.metrics import MetricsMiddleware
+from app.http.middleware.timing import PhaseTimingMiddleware, instrument_endpoints
+from app.http.routers import admin as admin_router
+from app.http.routers import analytics as analytics_router
 from app.http.routers import card as card_router
 from app.http.routers import charge as charge_router
 from app.http.routers import client as client_router
+from app.http.routers import feed as feed_router
 from app.http.routers import health as health_router
+from app.http.routers import jobs as jobs_router
+from app.http.routers import metrics as metrics_router
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await init_mongo()
+    await start_invalidation_bus()
+    await start_charge_writer()
+    start_archiver()
+    # Resumes jobs left unfinished by a previous run
+    start_job_runner()
+    start_charge_feed()
     try:
         yield
     finally:
+        await stop_charge_feed()
+        await stop_job_runner()
+        await stop_archiver()
+        # Flush batched writes before the client goes away
+        await stop_charge_writer()
+        await stop_invalidation_bus()
         await close_mongo()
 
 
 app = FastAPI(title="T1 Technical Test API", lifespan=lifespan)
 
+if settings.timing_sample_rate > 0:
+    app.add_middleware(PhaseTimingMiddleware, sample_rate=settings.timing_sample_rate)
+# Deadlines and the data-layer breaker only see admitted requests
+if settings.request_deadline_ms > 0 or settings.breaker_enabled:
+    app.add_middleware(DataLayerGuardMiddleware)
+# Admission sits inside metrics so shed requests are still measured
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+# Outside admission so compressing holds no slot; inside metrics so latency includes it
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 
 # Public routers
 app.include_router(health_router.router)
+if settings.metrics_enabled:
+    app.include_router(metrics_router.router)
 app.include_router(client_router.router)
 app.include_router(card_router.router)
 app.include_router(charge_router.router)
+app.include_router(feed_router.router)
+app.include_router(analytics_router.router)
+app.include_router(jobs_router.router)
+
+# Operational routers (X-Admin-Token)
+app.include_router(admin_router.router)
+
+if settings.timing_sample_rate > 0:
+    instrument_endpoints(app.router.routes)
 
 
 @app.get("/", include_in_schema=False)
@@ -0,0 +1,149 @@
+"""
+Production entry point: `python -m app.serve [--host H] [--port P] [--workers N]`.
+
+Runs SERVER_WORKERS worker processes (one per CPU by default) with uvloop
+and httptools when installed, a keep-alive longer than the usual load
+balancer idle timeout (SERVER_KEEPALIVE_S) and a deep listen backlog.
+
+With gunicorn installed the app is preloaded in the master (`preload_app`),
+so workers fork with the imported code shared copy-on-write and an import
+error stops the deploy before any worker starts; each worker still runs the
+lifespan (Mongo client, background tasks) itself. Without gunicorn, uvicorn's
+own supervisor spawns the workers.
+
+State kept per worker must be shared for the workers to agree. With more
+than one worker, the cache invalidation and rate-limit backends default to
+their Mongo-backed variants unless set explicitly; the remaining per-worker
+settings are checked at startup.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+
+from app.config import Settings, settings
+
+logger = logging.getLogger("app.serve")
+
+APP = "app.main:app"
+
+# Backends shared by all workers, used when several run and the setting was left unset
+SHARED_DEFAULTS = {"cache_invalidation": "mongo", "rate_limit_backend": "mongo"}
+
+
+def worker_count(requested: Optional[int] = None) -> int:
+    workers = requested if requested is not None else settings.server_workers
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def share_state(workers: int) -> List[str]:
+    """
+    Switch unset SHARED_DEFAULTS settings to their shared backend when running
+    `workers` > 1 processes; returns the variables set. They are exported too,
+    so workers that re-import the settings (uvicorn spawns them) agree.
+    """
+    if workers <= 1:
+        return []
+    changed = []
+    for field, value in SHARED_DEFAULTS.items():
+        if field in settings.model_fields_set:
+            continue
+        alias = Settings.model_fields[field].alias
+        setattr(settings, field, value)
+        os.environ[alias] = value
+        changed.append(f"{alias}={value}")
+    return changed
+
+
+def shared_state_warnings(workers: int) -> List[str]:
+    """Per-worker state that diverges between `workers` processes with the current settings."""
+    if workers <= 1:
+        return []
+    warnings = []
+    if settings.cache_invalidation == "local" and settings.entity_cache_ttl_s > 0:
+        warnings.append("CACHE_INVALIDATION=local: other workers serve cached clients/cards until ENTITY_CACHE_TTL_S")
+    if settings.rate_limit_backend == "memory":
+        warnings.append("RATE_LIMIT_BACKEND=memory: each worker enforces the charge limits on its own")
+    if settings.charge_feed_source == "local":
+        warnings.append("CHARGE_FEED_SOURCE=local: SSE subscribers only see charges written by their own worker")
+    return warnings
+
+
+def _gunicorn_options(host: str, port: int, workers: int) -> Dict[str, Any]:
+    return {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "keepalive": settings.server_keepalive_s,
+        "backlog": settings.server_backlog,
+        "graceful_timeout": settings.server_graceful_timeout_s,
+        "forwarded_allow_ips": "*",
+    }
+
+
+def _run_gunicorn(options: Dict[str, Any]) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    Server().run()
+
+
+def _run_uvicorn(host: str, port: int, workers: int) -> None:
+    uvicorn.run(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        loop="auto",  # uvloop when installed
+        http="auto",  # httptools when installed
+        timeout_keep_alive=settings.server_keepalive_s,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_s,
+        backlog=settings.server_backlog,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        access_log=False,
+    )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: SERVER_WORKERS)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = _parse_args(argv)
+    workers = worker_count(args.workers)
+    for variable in share_state(workers):
+        logger.info("%d workers: defaulting to %s", workers, variable)
+    for warning in shared_state_warnings(workers):
+        logger.warning(warning)
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        logger.info("serving %s with %d uvicorn worker(s)", APP, workers)
+        _run_uvicorn(args.host, args.port, workers)
+    else:
+        logger.info("serving %s with %d preloaded gunicorn worker(s)", APP, workers)
+        _run_gunicorn(_gunicorn_options(args.host, args.port, workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+CPU cost vs. bytes saved of response compression.
+
+Builds a `GET /charges/{client_id}` body the way the API serializes it
+(a list of ChargeOut for one busy client) and compresses it with every
+installed coding at a few levels, both in one go (complete responses) and
+chunk by chunk with a flush after each chunk (streamed responses). For each
+combination it reports the ratio, the bytes saved, the CPU time per MB of
+input and the throughput of a single core, which is what
+`CompressionMiddleware` spends per response.
+
+Usage:
+    python -m scripts.bench_compression --rows 20000 --repeat 5
+    python -m scripts.bench_compression --rows 2000 --chunk-rows 100
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app.http.middleware import compression
+from app.http.middleware.compression import Encoder, GzipEncoder
+from app.http.schemas.charge import ChargeOut
+
+# (coding, level label, encoder factory)
+Variant = Tuple[str, str, Callable[[], Encoder]]
+
+
+def variants() -> List[Variant]:
+    out: List[Variant] = [("gzip", str(level), lambda level=level: GzipEncoder(level)) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        out += [("br", str(q), lambda q=q: compression.BrotliEncoder(q)) for q in (1, 4, 6, 11)]
+    if compression.zstandard is not None:
+        out += [("zstd", str(level), lambda level=level: compression.ZstdEncoder(level)) for level in (1, 3, 9, 19)]
+    return out
+
+
+def charges_body(rows: int, seed: int) -> Tuple[bytes, List[bytes]]:
+    """A listing body and the same rows as NDJSON lines."""
+    rng = random.Random(seed)
+    client_id = str(ObjectId.from_datetime(datetime(2024, 1, 1, tzinfo=timezone.utc)))
+    cards = [str(ObjectId()) for _ in range(8)]
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    charges = []
+    for i in range(rows):
+        declined = rng.random() < 0.15
+        refunded = not declined and rng.random() < 0.05
+        attempted_at = now - timedelta(seconds=i * 37 + rng.randrange(30))
+        charges.append(
+            ChargeOut(
+                id=str(ObjectId()),
+                client_id=client_id,
+                card_id=rng.choice(cards),
+                amount=round(rng.uniform(1, 6000), 2),
+                attempted_at=attempted_at,
+                status="declined" if declined else "approved",
+                reason_code=rng.choice(("LIMIT_EXCEEDED", "SUSPECT_PAN")) if declined else None,
+                refunded=refunded,
+                refunded_at=attempted_at + timedelta(hours=2) if refunded else None,
+                request_id=f"req-{rng.getrandbits(64):016x}" if rng.random() < 0.7 else None,
+            )
+        )
+    body = TypeAdapter(List[ChargeOut]).dump_json(charges)
+    lines = [c.model_dump_json().encode() + b"\n" for c in charges]
+    return body, lines
+
+
+def _cpu(run: Callable[[], int], repeat: int) -> Tuple[float, int]:
+    """Best CPU time over `repeat` runs, and the output size."""
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        started = time.process_time()
+        size = run()
+        best = min(best, time.process_time() - started)
+    return best, size
+
+
+def bench(body: bytes, chunks: Sequence[bytes], repeat: int) -> List[Tuple[str, str, str, int, float, float]]:
+    results = []
+    for coding, level, factory in variants():
+        def whole() -> int:
+            encoder = factory()
+            return len(encoder.compress(body) + encoder.finish())
+
+        def streamed() -> int:
+            encoder = factory()
+            return sum(len(encoder.compress(c) + encoder.flush()) for c in chunks) + len(encoder.finish())
+
+        for mode, run, size_in in (("whole", whole, len(body)), ("stream", streamed, sum(map(len, chunks)))):
+            cpu, size_out = _cpu(run, repeat)
+            results.append((coding, level, mode, size_out, size_in / max(size_out, 1), cpu / (size_in / 1e6)))
+    return results
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--rows", type=int, default=5_000, help="charges in the listing (default: 5000)")
+    p.add_argument("--chunk-rows", type=int, default=50, help="rows per flushed chunk when streaming (default: 50)")
+    p.add_argument("--repeat", type=int, default=3, help="runs per combination, best CPU time kept (default: 3)")
+    p.add_argument("--seed", type=int, default=7)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    body, lines = charges_body(args.rows, args.seed)
+    chunks = [b"".join(lines[i : i + args.chunk_rows]) for i in range(0, len(lines), args.chunk_rows)]
+    print(f"{args.rows} charges: {len(body):,} bytes as JSON, {len(chunks)} chunks of {args.chunk_rows} rows streamed")
+    print(f"{'coding':<6} {'level':>5} {'mode':<6} {'out bytes':>12} {'saved':>12} {'ratio':>7} {'cpu ms/MB':>10} {'MB/s':>8}")
+    size_in = {"whole": len(body), "stream": sum(map(len, chunks))}
+    for coding, level, mode, size_out, ratio, cpu_per_mb in bench(body, chunks, args.repeat):
+        saved = size_in[mode] - size_out
+        mbps = 1 / cpu_per_mb if cpu_per_mb else float("inf")
+        print(
+            f"{coding:<6} {level:>5} {mode:<6} {size_out:>12,} {saved:>12,} {ratio:>7.1f} "
+            f"{cpu_per_mb * 1e3:>10.2f} {mbps:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the T1 API.
+
+Two sources of traffic are supported:
+  - Replay of a JSONL capture: one request per line with `method`, `path`
+    and an optional `json` (or `body`) payload and `headers`.
+  - A synthesized workload mix (charge-heavy, read-heavy, refund-burst) that
+    first provisions clients and cards with Luhn-valid PANs.
+
+Requests are scheduled at a fixed target rate regardless of how fast the
+server answers (open loop), and latency is measured from the *intended* send
+time so queueing delay is not hidden (no coordinated omission).
+
+Usage:
+    python -m scripts.loadgen --mix charge-heavy --rps 200 --duration 30
+    python -m scripts.loadgen --replay capture.jsonl --rps 100,200,400,800
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.domain.rules.luhn import generate_luhn
+
+
+_OBJECT_ID_RE = re.compile(r"^[0-9a-fA-F]{24}$")
+
+# Test BINs used for synthetic cards (same ones documented in the README)
+_SYNTH_BINS = ("411111", "424242", "555555", "410000")
+
+
+# -----------------------------
+# HDR-style histogram
+# -----------------------------
+class LatencyHistogram:
+    """
+    Log-linear histogram in the spirit of HdrHistogram.
+
+    Values (microseconds) are bucketed by their power-of-two magnitude and a
+    fixed number of linear sub-buckets inside it, so the relative error of any
+    reported percentile is bounded by `1 / 2**(sub_bucket_bits - 1)` whatever
+    the range of the recorded values.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8) -> None:
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max = 0
+        self.sum = 0
+
+    def _key(self, value: int) -> Tuple[int, int]:
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return shift, value >> shift
+
+    def record(self, value_us: int, count: int = 1) -> None:
+        value_us = max(int(value_us), 0)
+        key = self._key(value_us)
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.total += count
+        self.sum += value_us * count
+        self.max = max(self.max, value_us)
+        self.min = value_us if self.min is None else min(self.min, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, p: float) -> int:
+        """Return the highest value equivalent to the p-th percentile (0-100)."""
+        if self.total == 0:
+            return 0
+        target = max(1, int(round(p / 100.0 * self.total)))
+        seen = 0
+        for shift, mantissa in sorted(self.counts):
+            seen += self.counts[(shift, mantissa)]
+            if seen >= target:
+                upper = ((mantissa + 1) << shift) - 1
+                return min(upper, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def buckets(self) -> List[Tuple[int, int]]:
+        """(upper bound, count) pairs in ascending order, for plotting."""
+        return [
+            (((mantissa + 1) << shift) - 1, self.counts[(shift, mantissa)])
+            for shift, mantissa in sorted(self.counts)
+        ]
+
+
+# -----------------------------
+# Requests and per-route stats
+# -----------------------------
+@dataclass
+class RequestSpec:
+    method: str
+    path: str
+    json: Any = None
+    headers: Dict[str, str] | None = None
+    # Called with the decoded response body on 2xx (used by synthetic mixes)
+    on_success: Callable[[Any], None] | None = None
+
+    @property
+    def route(self) -> str:
+        return route_template(self.method, self.path)
+
+
+def route_template(method: str, path: str) -> str:
+    """Collapse ObjectId path segments so stats are grouped per route."""
+    path = path.split("?", 1)[0]
+    parts = ["{id}" if _OBJECT_ID_RE.match(p) else p for p in path.split("/")]
+    return f"{method.upper()} {'/'.join(parts)}"
+
+
+@dataclass
+class RouteStats:
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    ok: int = 0
+    client_errors: int = 0
+    server_errors: int = 0
+    transport_errors: int = 0
+
+    @property
+    def count(self) -> int:
+        return self.ok + self.client_errors + self.server_errors + self.transport_errors
+
+    @property
+    def error_rate(self) -> float:
+        failed = self.server_errors + self.transport_errors
+        return failed / self.count if self.count else 0.0
+
+
+@dataclass
+class StageResult:
+    offered_rps: float
+    duration: float
+    routes: Dict[str, RouteStats]
+    dropped: int
+    elapsed: float
+
+    @property
+    def completed(self) -> int:
+        return sum(s.count for s in self.routes.values())
+
+    @property
+    def achieved_rps(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def overall(self) -> RouteStats:
+        total = RouteStats()
+        for s in self.routes.values():
+            total.histogram.merge(s.histogram)
+            total.ok += s.ok
+            total.client_errors += s.client_errors
+            total.server_errors += s.server_errors
+            total.transport_errors += s.transport_errors
+        return total
+
+
+# -----------------------------
+# Traffic sources
+# -----------------------------
+def load_capture(path: str) -> List[RequestSpec]:
+    """
+    Read a JSONL capture. Lines without `method` and `path`/`url` are skipped
+    (and counted) so mixed logs can be replayed as-is.
+    """
+    specs: List[RequestSpec] = []
+    skipped = 0
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if not isinstance(row, dict):
+                skipped += 1
+                continue
+            method = row.get("method")
+            target = row.get("path") or row.get("url")
+            if not method or not target:
+                skipped += 1
+                continue
+            if "://" in target:
+                target = "/" + target.split("://", 1)[1].split("/", 1)[-1]
+            specs.append(
+                RequestSpec(
+                    method=method.upper(),
+                    path=target,
+                    json=row.get("json", row.get("body")),
+                    headers=row.get("headers"),
+                )
+            )
+    if skipped:
+        print(f"[loadgen] skipped {skipped} line(s) without method/path", file=sys.stderr)
+    if not specs:
+        raise SystemExit(f"No replayable requests found in {path}")
+    return specs
+
+
+class SyntheticWorkload:
+    """
+    Weighted request mix over a provisioned population of clients and cards.
+
+    Approved charge ids returned by the API are remembered so refunds can be
+    issued against real charges.
+    """
+
+    MIXES: Dict[str, Dict[str, float]] = {
+        "charge-heavy": {"charge": 0.70, "list": 0.20, "get_card": 0.05, "get_client": 0.05},
+        "read-heavy": {"charge": 0.10, "list": 0.40, "get_card": 0.25, "get_client": 0.25},
+        "refund-burst": {"charge": 0.60, "list": 0.20, "get_card": 0.10, "get_client": 0.10},
+    }
+
+    def __init__(
+        self,
+        mix: str,
+        rng: random.Random,
+        burst_every: float = 10.0,
+        burst_length: float = 2.0,
+        max_amount: float = 6000.0,
+    ) -> None:
+        if mix not in self.MIXES:
+            raise ValueError(f"Unknown mix {mix!r}; choose from {sorted(self.MIXES)}")
+        self.mix = mix
+        self.rng = rng
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.max_amount = max_amount
+        self.cards: List[Tuple[str, str]] = []  # (client_id, card_id)
+        self.refundable: deque[str] = deque(maxlen=100_000)
+        self._started = time.monotonic()
+
+    async def provision(
+        self, http: httpx.AsyncClient, clients: int, cards_per_client: int, concurrency: int
+    ) -> None:
+        """Create the client/card population through the API (closed loop)."""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one_client(i: int) -> None:
+            async with sem:
+                resp = await http.post(
+                    "/clients",
+                    json={"name": f"Load Client {i}", "email": f"load{i}@example.com"},
+                )
+                resp.raise_for_status()
+                client_id = resp.json()["id"]
+            for _ in range(cards_per_client):
+                pan = generate_luhn(self.rng.choice(_SYNTH_BINS))
+                async with sem:
+                    resp = await http.post("/cards", json={"client_id": client_id, "pan": pan})
+                    resp.raise_for_status()
+                    self.cards.append((client_id, resp.json()["id"]))
+
+        await asyncio.gather(*(one_client(i) for i in range(clients)))
+
+    def _in_burst(self) -> bool:
+        if self.mix != "refund-burst":
+            return False
+        return (time.monotonic() - self._started) % self.burst_every < self.burst_length
+
+    def _remember(self, body: Any) -> None:
+        if isinstance(body, dict) and body.get("status") == "approved" and not body.get("refunded"):
+            self.refundable.append(body["id"])
+
+    def __iter__(self) -> Iterator[RequestSpec]:
+        weights = self.MIXES[self.mix]
+        kinds, probs = list(weights), list(weights.values())
+        while True:
+            if self._in_burst() and self.refundable and self.rng.random() < 0.8:
+                charge_id = self.refundable.popleft()
+                yield RequestSpec("POST", f"/charges/{charge_id}/refund")
+                continue
+            client_id, card_id = self.rng.choice(self.cards)
+            kind = self.rng.choices(kinds, probs)[0]
+            if kind == "charge":
+                yield RequestSpec(
+                    "POST",
+                    "/charges",
+                    json={
+                        "client_id": client_id,
+                        "card_id": card_id,
+                        "amount": round(self.rng.uniform(1, self.max_amount), 2),
+                    },
+                    on_success=self._remember,
+                )
+            elif kind == "list":
+                yield RequestSpec("GET", f"/charges/{client_id}")
+            elif kind == "get_card":
+                yield RequestSpec("GET", f"/cards/{card_id}")
+            else:
+                yield RequestSpec("GET", f"/clients/{client_id}")
+
+
+# -----------------------------
+# Open-loop driver
+# -----------------------------
+async def run_stage(
+    http: httpx.AsyncClient,
+    source: Iterator[RequestSpec],
+    rps: float,
+    duration: float,
+    max_inflight: int,
+    poisson: bool,
+    rng: random.Random,
+) -> StageResult:
+    """
+    Issue requests at `rps` for `duration` seconds. Each request is its own
+    task; when `max_inflight` are outstanding the request is dropped and
+    counted, which means the client itself has saturated.
+    """
+    loop = asyncio.get_running_loop()
+    routes: Dict[str, RouteStats] = {}
+    inflight: set[asyncio.Task] = set()
+    dropped = 0
+
+    async def fire(spec: RequestSpec, intended: float) -> None:
+        stats = routes.setdefault(spec.route, RouteStats())
+        try:
+            resp = await http.request(spec.method, spec.path, json=spec.json, headers=spec.headers)
+        except httpx.HTTPError:
+            stats.transport_errors += 1
+            stats.histogram.record((loop.time() - intended) * 1e6)
+            return
+        stats.histogram.record((loop.time() - intended) * 1e6)
+        if resp.status_code >= 500:
+            stats.server_errors += 1
+        elif resp.status_code >= 400:
+            stats.client_errors += 1
+        else:
+            stats.ok += 1
+            if spec.on_success is not None:
+                try:
+                    spec.on_success(resp.json())
+                except ValueError:
+                    pass
+
+    start = loop.time()
+    end = start + duration
+    intended = start
+    interval = 1.0 / rps
+    for spec in source:
+        intended += rng.expovariate(rps) if poisson else interval
+        if intended >= end:
+            break
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= max_inflight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(fire(spec, intended))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+
+    if inflight:
+        await asyncio.gather(*inflight, return_exceptions=True)
+    return StageResult(rps, duration, routes, dropped, loop.time() - start)
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def _ms(us: int | float) -> str:
+    return f"{us / 1000:.2f}"
+
+
+def format_stage(result: StageResult) -> str:
+    header = (
+        f"{'route':<36} {'count':>7} {'err%':>6} {'4xx':>5} "
+        f"{'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}  (ms)"
+    )
+    lines = [
+        f"== offered {result.offered_rps:.0f} rps for {result.duration:.0f}s: "
+        f"achieved {result.achieved_rps:.1f} rps, dropped {result.dropped}",
+        header,
+    ]
+    rows = sorted(result.routes.items()) + [("TOTAL", result.overall())]
+    for route, s in rows:
+        h = s.histogram
+        lines.append(
+            f"{route:<36} {s.count:>7} {s.error_rate * 100:>6.2f} {s.client_errors:>5} "
+            f"{_ms(h.percentile(50)):>8} {_ms(h.percentile(90)):>8} {_ms(h.percentile(99)):>8} "
+            f"{_ms(h.percentile(99.9)):>8} {_ms(h.max):>8}"
+        )
+    return "\n".join(lines)
+
+
+def stage_to_dict(result: StageResult) -> Dict[str, Any]:
+    def route_dict(s: RouteStats) -> Dict[str, Any]:
+        h = s.histogram
+        return {
+            "count": s.count,
+            "ok": s.ok,
+            "client_errors": s.client_errors,
+            "server_errors": s.server_errors,
+            "transport_errors": s.transport_errors,
+            "error_rate": s.error_rate,
+            "latency_us": {
+                "mean": h.mean,
+                "p50": h.percentile(50),
+                "p90": h.percentile(90),
+                "p99": h.percentile(99),
+                "p99.9": h.percentile(99.9),
+                "max": h.max,
+                "buckets": h.buckets(),
+            },
+        }
+
+    return {
+        "offered_rps": result.offered_rps,
+        "achieved_rps": result.achieved_rps,
+        "dropped": result.dropped,
+        "routes": {r: route_dict(s) for r, s in result.routes.items()},
+        "total": route_dict(result.overall()),
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--replay", metavar="FILE", help="JSONL capture to replay (looped)")
+    src.add_argument("--mix", choices=sorted(SyntheticWorkload.MIXES), help="synthetic workload mix")
+    p.add_argument("--base-url", default="http://localhost:8000")
+    p.add_argument("--rps", default="100", help="target rate, or comma-separated steps to ramp")
+    p.add_argument("--duration", type=float, default=30.0, help="seconds per rate step")
+    p.add_argument("--connections", type=int, default=64, help="max concurrent HTTP connections")
+    p.add_argument("--max-inflight", type=int, default=10_000)
+    p.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--clients", type=int, default=50, help="synthetic mix: clients to provision")
+    p.add_argument("--cards-per-client", type=int, default=2)
+    p.add_argument("--json-out", metavar="FILE", help="write per-stage results as JSON")
+    return p.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> List[StageResult]:
+    args = _parse_args(argv)
+    rng = random.Random(args.seed)
+    if args.seed is not None:
+        # generate_luhn draws from the module-level RNG
+        random.seed(args.seed)
+    steps = [float(x) for x in args.rps.split(",") if x.strip()]
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as http:
+        if args.replay:
+            source: Iterator[RequestSpec] = itertools.cycle(load_capture(args.replay))
+        else:
+            workload = SyntheticWorkload(args.mix, rng)
+            await workload.provision(http, args.clients, args.cards_per_client, args.connections)
+            source = iter(workload)
+
+        results = []
+        for rps in steps:
+            result = await run_stage(
+                http, source, rps, args.duration, args.max_inflight, args.poisson, rng
+            )
+            print(format_stage(result), flush=True)
+            results.append(result)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump([stage_to_dict(r) for r in results], fh, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Copy the single `charges` collection into monthly partitions.
+
+Charges are read in `_id` order and written, per batch, with one unordered
+bulk of `_id`-keyed upserting replaces per month (`charges_YYYYMM`, by
+`attempted_at` in UTC); every `request_id` gets its entry in the
+`charge_request_ids` directory. A copy already refunded in its partition is
+never replaced (refunds are final), so the copy can be re-run or resumed
+(`--after` with the last id printed) at any time, including while the API
+keeps writing to `charges`.
+
+A resumed pass only sees new charges. Charges refunded since an earlier pass
+started are picked up by `--refunded-since` with the start time that pass
+printed. Switch the API over with CHARGE_PARTITIONING=monthly once a final
+pass has caught up; `--verify` compares per-month counts, refunded counts
+and refunded amounts, and `--drop-source` removes the old collection only
+when they all match.
+
+Usage:
+    python -m scripts.partition_charges --batch-size 5000
+    python -m scripts.partition_charges --after <last_id> --refunded-since <started_at>
+    python -m scripts.partition_charges --skip-copy --verify --drop-source
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import MongoClient, ReplaceOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from app.infrastructure.db.partitions import (
+    PARTITION_INDEXES,
+    PARTITION_RE,
+    REQUEST_IDS_COLLECTION,
+    month_key,
+    partition_name,
+)
+
+SOURCE = "charges"
+_DUPLICATE_CODES = {11000, 11001, 12582}
+
+
+def group_by_month(docs: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Charges of one batch keyed by the month of their `attempted_at`."""
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for doc in docs:
+        groups[month_key(doc["attempted_at"])].append(doc)
+    return dict(groups)
+
+
+def directory_entries(groups: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """`charge_request_ids` documents for the charges carrying a request_id."""
+    return [
+        {"_id": doc["request_id"], "charge_id": doc["_id"], "partition": month}
+        for month, docs in groups.items()
+        for doc in docs
+        if isinstance(doc.get("request_id"), str)
+    ]
+
+
+def _insert_new(db: Database, name: str, docs: List[Dict[str, Any]]) -> int:
+    """Unordered insert that ignores documents already present; returns how many were new."""
+    if not docs:
+        return 0
+    try:
+        return len(db[name].insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        unexpected = [e for e in errors if e.get("code") not in _DUPLICATE_CODES]
+        if unexpected:
+            raise
+        return exc.details.get("nInserted", 0)
+
+
+def _replace_unrefunded(db: Database, name: str, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Upsert `docs` by `_id` unless their copy is already refunded; returns
+    (inserted, updated). A refunded copy fails the filter and its upsert hits
+    the `_id` index: that duplicate error means "partition is ahead" and is ignored.
+    """
+    if not docs:
+        return 0, 0
+    requests = [ReplaceOne({"_id": doc["_id"], "refunded": {"$ne": True}}, doc, upsert=True) for doc in docs]
+    try:
+        result = db[name].bulk_write(requests, ordered=False)
+        return result.upserted_count, result.modified_count
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        unexpected = [e for e in errors if e.get("code") not in _DUPLICATE_CODES]
+        if unexpected:
+            raise
+        return exc.details.get("nUpserted", 0), exc.details.get("nModified", 0)
+
+
+def copy_charges(
+    db: Database,
+    batch_size: int,
+    after: Optional[ObjectId] = None,
+    refunded_since: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """Copy charges after `after` (all by default), or only those refunded since `refunded_since`."""
+    ensured: set = set()
+    totals = {"read": 0, "inserted": 0, "updated": 0, "request_ids": 0}
+    base = {"refunded_at": {"$gte": refunded_since}} if refunded_since else {}
+    query = {**base, "_id": {"$gt": after}} if after else dict(base)
+    started = time.monotonic()
+    print(f"[partition] pass started at {datetime.now(timezone.utc).isoformat()}", file=sys.stderr)
+    last_id = after
+
+    while True:
+        batch = list(db[SOURCE].find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+        groups = group_by_month(batch)
+        for month, docs in groups.items():
+            if month not in ensured:
+                db[partition_name(month)].create_indexes(PARTITION_INDEXES)
+                ensured.add(month)
+            inserted, updated = _replace_unrefunded(db, partition_name(month), docs)
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+        totals["request_ids"] += _insert_new(db, REQUEST_IDS_COLLECTION, directory_entries(groups))
+        totals["read"] += len(batch)
+
+        last_id = batch[-1]["_id"]
+        query = {**base, "_id": {"$gt": last_id}}
+        rate = totals["read"] / max(time.monotonic() - started, 1e-9)
+        print(f"[partition] {totals} last_id={last_id} ({rate:,.0f} docs/s)", file=sys.stderr)
+    return totals
+
+
+# Per month: charges, refunded charges and refunded amount
+MONTH_TOTALS = [
+    {
+        "$group": {
+            "_id": {"$dateToString": {"format": "%Y%m", "date": "$attempted_at"}},
+            "n": {"$sum": 1},
+            "refunded": {"$sum": {"$cond": ["$refunded", 1, 0]}},
+            "refunded_amount": {"$sum": {"$cond": ["$refunded", "$amount", 0]}},
+        }
+    }
+]
+
+
+def month_totals(rows: Iterable[Dict[str, Any]]) -> Dict[str, Tuple[int, int, float]]:
+    totals: Dict[str, Tuple[int, int, float]] = {}
+    for row in rows:
+        n, refunded, amount = totals.get(row["_id"], (0, 0, 0.0))
+        totals[row["_id"]] = (n + row["n"], refunded + row["refunded"], round(amount + row["refunded_amount"], 2))
+    return totals
+
+
+def verify(db: Database) -> bool:
+    """Compare exact per-month counts, refunded counts and refunded amounts of the source and partitions."""
+    source = month_totals(db[SOURCE].aggregate(MONTH_TOTALS))
+    names = db.list_collection_names(filter={"name": {"$regex": PARTITION_RE.pattern}})
+    partitions = month_totals(row for name in names for row in db[name].aggregate(MONTH_TOTALS))
+
+    ok = True
+    empty = (0, 0, 0.0)
+    for month in sorted(set(source) | set(partitions)):
+        marker = "ok" if source.get(month, empty) == partitions.get(month, empty) else "MISMATCH"
+        ok = ok and marker == "ok"
+        print(
+            f"[partition] {month}: (charges, refunded, refunded amount) "
+            f"source={source.get(month, empty)} partition={partitions.get(month, empty)} {marker}",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--uri", default=None, help="MongoDB URI with database (defaults to MONGODB_URI)")
+    p.add_argument("--batch-size", type=int, default=5_000)
+    p.add_argument("--after", default=None, help="resume after this charge _id")
+    p.add_argument(
+        "--refunded-since",
+        default=None,
+        help="also re-copy charges refunded since this ISO datetime (an earlier pass's start)",
+    )
+    p.add_argument("--skip-copy", action="store_true", help="only run --verify / --drop-source")
+    p.add_argument("--verify", action="store_true", help="compare per-month totals afterwards")
+    p.add_argument("--drop-source", action="store_true", help="drop `charges` if verification passes")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.config import settings
+
+    args = _parse_args(argv)
+    db = MongoClient(args.uri or settings.mongodb_uri).get_default_database()
+
+    if not args.skip_copy:
+        totals = copy_charges(db, args.batch_size, ObjectId(args.after) if args.after else None)
+        print(f"[partition] copy done: {totals}", file=sys.stderr)
+        if args.refunded_since:
+            since = datetime.fromisoformat(args.refunded_since)
+            totals = copy_charges(db, args.batch_size, refunded_since=since)
+            print(f"[partition] refunds caught up: {totals}", file=sys.stderr)
+
+    if args.verify or args.drop_source:
+        if not verify(db):
+            sys.exit("[partition] totals differ; source kept")
+        if args.drop_source:
+            db[SOURCE].drop()
+            print(f"[partition] dropped `{SOURCE}`", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator for scale testing.
+
+Writes clients, cards and charges straight into MongoDB (bypassing the API)
+with the same document shapes the Beanie models use:
+  - charges are spread across clients following a Zipf law (client #0 is the
+    heaviest), so a handful of clients own most of the history;
+  - `attempted_at` is spread over a time window with a diurnal profile;
+  - the approve/decline/refund mix is configurable.
+
+With CHARGE_PARTITIONING=monthly (or `--partitioning monthly`) charges go to
+their `charges_YYYYMM` partition, created with its indexes, and every
+`request_id` gets its `charge_request_ids` entry, as the API writes them.
+
+Work is cut into independent chunks executed by a process pool, each worker
+issuing unordered `insert_many` batches through its own client. Every id and
+value derives from `--seed` (and `--end`), so two runs with the same
+arguments produce byte-identical data.
+
+Usage:
+    python -m scripts.seed_dataset --clients 10000 --charges 5000000 --seed 7
+    python -m scripts.seed_dataset --uri mongodb://localhost:27017/t1db --drop --create-indexes
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.database import Database
+
+from app.domain.rules.luhn import derive_bin_last4, generate_luhn, mask_pan
+from app.domain.rules.rules import BLOCKED_LAST4, MAX_APPROVED_AMOUNT
+from app.infrastructure.db.partitions import PARTITION_INDEXES, PARTITION_RE, REQUEST_IDS_COLLECTION, partition_name
+from scripts.partition_charges import directory_entries, group_by_month
+
+_BINS = ("411111", "424242", "555555", "410000", "510510", "601100")
+
+# Relative traffic per UTC hour (quiet nights, lunchtime and evening peaks)
+_DIURNAL = (
+    0.25, 0.15, 0.10, 0.08, 0.08, 0.12, 0.25, 0.45, 0.65, 0.80, 0.90, 0.95,
+    1.00, 0.95, 0.85, 0.80, 0.80, 0.85, 0.95, 1.00, 0.90, 0.70, 0.50, 0.35,
+)
+
+# Per-process state set by the pool initializer
+_db: Optional[Database] = None
+_plan: Optional["Plan"] = None
+_ensured: Set[str] = set()
+
+
+# -----------------------------
+# Deterministic helpers
+# -----------------------------
+def _rng(seed: int, *parts: Any) -> random.Random:
+    """Independent RNG stream for a (seed, parts...) key."""
+    digest = hashlib.blake2b(repr((seed,) + parts).encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+def _oid(seed: int, ts: datetime, *parts: Any) -> ObjectId:
+    """ObjectId whose timestamp is `ts` and whose remaining 8 bytes hash the key."""
+    tail = hashlib.blake2b(repr((seed,) + parts).encode(), digest_size=8).digest()
+    return ObjectId(struct.pack(">I", int(ts.timestamp())) + tail)
+
+
+def zipf_counts(total: int, n: int, s: float) -> List[int]:
+    """
+    Split `total` items over `n` ranks proportionally to 1/rank**s.
+    Remainders go to the largest fractional parts so the sum is exact.
+    """
+    weights = [1.0 / (rank ** s) for rank in range(1, n + 1)]
+    norm = sum(weights)
+    raw = [total * w / norm for w in weights]
+    counts = [math.floor(x) for x in raw]
+    leftover = total - sum(counts)
+    by_fraction = sorted(range(n), key=lambda i: (counts[i] - raw[i], i))
+    for i in by_fraction[:leftover]:
+        counts[i] += 1
+    return counts
+
+
+def _attempted_at(rng: random.Random, start: datetime, days: int) -> datetime:
+    """Uniform day in the window, hour following the diurnal profile."""
+    day = rng.randrange(days)
+    hour = rng.choices(range(24), weights=_DIURNAL)[0]
+    seconds = rng.randrange(3600)
+    micros = rng.randrange(1000) * 1000  # Mongo stores millisecond precision
+    return start + timedelta(days=day, hours=hour, seconds=seconds, microseconds=micros)
+
+
+# -----------------------------
+# Plan
+# -----------------------------
+class Plan:
+    """Everything a worker needs to regenerate any chunk on its own."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.seed: int = args.seed
+        self.clients: int = args.clients
+        self.cards_per_client: float = args.cards_per_client
+        self.days: int = args.days
+        self.end: datetime = args.end
+        self.start: datetime = args.end - timedelta(days=args.days)
+        self.decline_rate: float = args.decline_rate
+        self.refund_rate: float = args.refund_rate
+        self.request_id_rate: float = args.request_id_rate
+        self.batch_size: int = args.batch_size
+        self.partitioned: bool = args.partitioning == "monthly"
+        self.charge_counts = zipf_counts(args.charges, args.clients, args.zipf_s)
+
+    def created_at(self, client_idx: int) -> datetime:
+        return self.start - timedelta(minutes=1 + client_idx)
+
+    def client_id(self, client_idx: int) -> ObjectId:
+        return _oid(self.seed, self.created_at(client_idx), "client", client_idx)
+
+    def card_count(self, client_idx: int) -> int:
+        # Geometric around the configured mean, at least one card per client
+        p = 1.0 / max(self.cards_per_client, 1.0)
+        rng = _rng(self.seed, "card_count", client_idx)
+        n = 1
+        while rng.random() > p and n < 1000:
+            n += 1
+        return n
+
+    def card_id(self, client_idx: int, card_idx: int) -> ObjectId:
+        return _oid(self.seed, self.created_at(client_idx), "card", client_idx, card_idx)
+
+    def tasks(self) -> Iterator[Tuple[str, int, int, int]]:
+        """(kind, client_idx_or_start, offset_or_end, count) work units."""
+        step = max(1, self.batch_size // 2)
+        for start in range(0, self.clients, step):
+            yield ("clients", start, min(start + step, self.clients), 0)
+            yield ("cards", start, min(start + step, self.clients), 0)
+        for client_idx, count in enumerate(self.charge_counts):
+            for offset in range(0, count, self.batch_size):
+                yield ("charges", client_idx, offset, min(self.batch_size, count - offset))
+
+
+def build_clients(plan: Plan, start: int, end: int) -> List[Dict[str, Any]]:
+    docs = []
+    for i in range(start, end):
+        created = plan.created_at(i)
+        docs.append(
+            {
+                "_id": plan.client_id(i),
+                "name": f"Seed Client {i}",
+                "email": f"seed{i}@example.com",
+                "phone": f"+52{_rng(plan.seed, 'phone', i).randrange(10**9, 10**10)}",
+                "created_at": created,
+                "updated_at": created,
+            }
+        )
+    return docs
+
+
+def build_cards(plan: Plan, start: int, end: int) -> List[Dict[str, Any]]:
+    docs = []
+    for i in range(start, end):
+        rng = _rng(plan.seed, "cards", i)
+        # generate_luhn draws from the module-level RNG; pin it per client
+        random.seed(rng.random())
+        created = plan.created_at(i)
+        for j in range(plan.card_count(i)):
+            pan = generate_luhn(rng.choice(_BINS), length=rng.choice((16, 16, 16, 15, 19)))
+            bin6, last4 = derive_bin_last4(pan)
+            docs.append(
+                {
+                    "_id": plan.card_id(i, j),
+                    "client_id": plan.client_id(i),
+                    "pan_masked": mask_pan(pan),
+                    "last4": last4,
+                    "bin": bin6,
+                    "created_at": created,
+                    "updated_at": created,
+                }
+            )
+    return docs
+
+
+def build_charges(plan: Plan, client_idx: int, offset: int, count: int) -> List[Dict[str, Any]]:
+    rng = _rng(plan.seed, "charges", client_idx, offset)
+    client_id = plan.client_id(client_idx)
+    n_cards = plan.card_count(client_idx)
+    # Recompute last4 of this client's cards to keep decisions consistent with rules.py
+    card_last4 = [c["last4"] for c in build_cards(plan, client_idx, client_idx + 1)]
+
+    docs = []
+    for k in range(offset, offset + count):
+        card_idx = rng.randrange(n_cards)
+        attempted = _attempted_at(rng, plan.start, plan.days)
+        if card_last4[card_idx] in BLOCKED_LAST4:
+            amount = round(rng.uniform(1, MAX_APPROVED_AMOUNT), 2)
+            status, reason = "declined", "SUSPECT_PAN"
+        elif rng.random() < plan.decline_rate:
+            amount = round(rng.uniform(MAX_APPROVED_AMOUNT + 0.01, MAX_APPROVED_AMOUNT * 4), 2)
+            status, reason = "declined", "LIMIT_EXCEEDED"
+        else:
+            amount = round(rng.lognormvariate(4.0, 1.2), 2)
+            amount = min(max(amount, 0.01), MAX_APPROVED_AMOUNT)
+            status, reason = "approved", None
+
+        refunded = status == "approved" and rng.random() < plan.refund_rate
+        doc: Dict[str, Any] = {
+            "_id": _oid(plan.seed, attempted, "charge", client_idx, k),
+            "client_id": client_id,
+            "card_id": plan.card_id(client_idx, card_idx),
+            "amount": amount,
+            "attempted_at": attempted,
+            "status": status,
+            "reason_code": reason,
+            "refunded": refunded,
+            "refunded_at": (
+                min(attempted + timedelta(hours=rng.uniform(1, 72)), plan.end) if refunded else None
+            ),
+        }
+        if rng.random() < plan.request_id_rate:
+            doc["request_id"] = f"seed-{plan.seed}-{client_idx}-{k}"
+        docs.append(doc)
+    return docs
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+def _init_worker(uri: str, plan: Plan) -> None:
+    global _db, _plan
+    _db = MongoClient(uri, w=1).get_default_database()
+    _plan = plan
+
+
+def _run_task(task: Tuple[str, int, int, int]) -> Tuple[str, int]:
+    assert _db is not None and _plan is not None, "worker not initialized"
+    plan = _plan
+    kind, a, b, c = task
+    if kind == "clients":
+        docs, coll = build_clients(plan, a, b), "clients"
+    elif kind == "cards":
+        docs, coll = build_cards(plan, a, b), "cards"
+    else:
+        docs, coll = build_charges(plan, a, b, c), "charges"
+        if plan.partitioned:
+            _insert_partitioned(docs)
+            return kind, len(docs)
+    for i in range(0, len(docs), plan.batch_size):
+        _db[coll].insert_many(docs[i : i + plan.batch_size], ordered=False)
+    return kind, len(docs)
+
+
+def _insert_partitioned(docs: List[Dict[str, Any]]) -> None:
+    """Charges into their monthly partitions, request_ids into the directory."""
+    assert _db is not None
+    groups = group_by_month(docs)
+    for month, rows in groups.items():
+        if month not in _ensured:
+            _db[partition_name(month)].create_indexes(PARTITION_INDEXES)
+            _ensured.add(month)
+        _db[partition_name(month)].insert_many(rows, ordered=False)
+    entries = directory_entries(groups)
+    if entries:
+        _db[REQUEST_IDS_COLLECTION].insert_many(entries, ordered=False)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    from app.config import settings
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--uri", default=None, help="MongoDB URI with database (defaults to MONGODB_URI)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--clients", type=int, default=1_000)
+    p.add_argument("--cards-per-client", type=float, default=2.0, help="mean cards per client")
+    p.add_argument("--charges", type=int, default=1_000_000, help="total charges")
+    p.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent across clients")
+    p.add_argument("--days", type=int, default=365, help="attempted_at window length")
+    p.add_argument(
+        "--end",
+        type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+        default=today,
+        help="window end (ISO date, UTC); defaults to today's midnight",
+    )
+    p.add_argument("--decline-rate", type=float, default=0.08)
+    p.add_argument("--refund-rate", type=float, default=0.02)
+    p.add_argument("--request-id-rate", type=float, default=0.5)
+    p.add_argument("--batch-size", type=int, default=5_000)
+    p.add_argument("--workers", type=int, default=None, help="process pool size")
+    p.add_argument(
+        "--partitioning",
+        choices=("none", "monthly"),
+        default=settings.charge_partitioning,
+        help="charge layout (defaults to CHARGE_PARTITIONING)",
+    )
+    p.add_argument("--drop", action="store_true", help="empty the collections first")
+    p.add_argument("--create-indexes", action="store_true", help="build the Beanie indexes afterwards")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.config import settings
+
+    args = _parse_args(argv)
+    uri = args.uri or settings.mongodb_uri
+    plan = Plan(args)
+
+    if args.drop:
+        db = MongoClient(uri).get_default_database()
+        for name in ("clients", "cards", "charges", REQUEST_IDS_COLLECTION):
+            db[name].drop()
+        for name in db.list_collection_names(filter={"name": {"$regex": PARTITION_RE.pattern}}):
+            db[name].drop()
+
+    started = time.monotonic()
+    totals = {"clients": 0, "cards": 0, "charges": 0}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(uri, plan)) as pool:
+        futures = [pool.submit(_run_task, task) for task in plan.tasks()]
+        for done, fut in enumerate(as_completed(futures), start=1):
+            kind, n = fut.result()
+            totals[kind] += n
+            if done % 50 == 0 or done == len(futures):
+                rate = totals["charges"] / max(time.monotonic() - started, 1e-9)
+                print(
+                    f"[seed] {done}/{len(futures)} chunks, "
+                    f"{totals['clients']} clients, {totals['cards']} cards, "
+                    f"{totals['charges']} charges ({rate:,.0f} charges/s)",
+                    file=sys.stderr,
+                )
+
+    if args.create_indexes:
+        from app.infrastructure.db.mongo import close_mongo, init_mongo
+
+        async def _indexes() -> None:
+            settings.mongodb_uri = uri
+            await init_mongo()
+            await close_mongo()
+
+        asyncio.run(_indexes())
+
+    print(f"[seed] done in {time.monotonic() - started:.1f}s: {totals}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
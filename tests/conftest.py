@@ -7,7 +7,9 @@ from fastapi.testclient import TestClient
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.config import settings
-from app.infrastructure.db.models import ClientDoc, CardDoc, ChargeDoc
+from app.infrastructure.db.models import ClientDoc, CardDoc, ChargeDoc, JobDoc
+from app.infrastructure.db.partitions import REQUEST_IDS_COLLECTION, partition_month
+from app.infrastructure.rate_limit import ChargeRateLimiter
 from app.main import app
 
 
@@ -38,6 +40,13 @@ async def _clear_collections(uri: str) -> None:
         await db[ClientDoc.get_settings().name].delete_many({})
         await db[CardDoc.get_settings().name].delete_many({})
         await db[ChargeDoc.get_settings().name].delete_many({})
+        await db[JobDoc.get_settings().name].delete_many({})
+        # Shared rate-limit windows outlive a test (keys may repeat across tests)
+        await db[ChargeRateLimiter.collection_name].delete_many({})
+        # Monthly charge partitions and their request_id directory (indexes are kept)
+        for name in await db.list_collection_names():
+            if partition_month(name) or name == REQUEST_IDS_COLLECTION:
+                await db[name].delete_many({})
     finally:
         client.close()
 
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import pytest
+
+from app.config import settings
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture
+def admin_headers(monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+
+def test_admin_endpoints_require_token(test_client, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert test_client.post("/admin/profile", params={"seconds": 0.1}).status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    resp = test_client.post(
+        "/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "wrong"}
+    )
+    assert resp.status_code == 401
+
+
+def test_profile_returns_collapsed_stacks(test_client, admin_headers) -> None:
+    resp = test_client.post(
+        "/admin/profile", params={"seconds": 0.2, "interval_ms": 2}, headers=admin_headers
+    )
+    assert resp.status_code == 200
+    assert int(resp.headers["x-profile-samples"]) > 0
+    assert resp.text.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_tracemalloc_snapshot_and_diff(test_client, admin_headers) -> None:
+    assert test_client.get("/admin/tracemalloc/diff", headers=admin_headers).status_code == 409
+
+    test_client.post("/admin/tracemalloc/start", headers=admin_headers)
+    try:
+        snap = test_client.post("/admin/tracemalloc/snapshot", headers=admin_headers)
+        assert snap.status_code == 200
+        assert snap.json()["traced_bytes"] > 0
+
+        test_client.post("/clients", json={"name": "Mem", "email": "mem@example.com"})
+        diff = test_client.get("/admin/tracemalloc/diff", params={"limit": 5}, headers=admin_headers)
+        assert diff.status_code == 200
+        assert len(diff.json()["top"]) <= 5
+    finally:
+        test_client.post("/admin/tracemalloc/stop", headers=admin_headers)
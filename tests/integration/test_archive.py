@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterator
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.database import Database
+
+from app.config import settings
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+UTC = timezone.utc
+
+
+@pytest.fixture
+def admin_headers(monkeypatch, tmp_path) -> dict:
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "archive_shards", 4)
+    return {"X-Admin-Token": "test-admin-token"}
+
+
+@pytest.fixture
+def db() -> Iterator[Database]:
+    client = MongoClient(settings.mongodb_uri)
+    try:
+        yield client.get_default_database()
+    finally:
+        client.close()
+
+
+def _old_charge(client_id: str, card_id: str, attempted_at: datetime) -> dict:
+    return {
+        "_id": ObjectId.from_datetime(attempted_at),
+        "client_id": ObjectId(client_id),
+        "card_id": ObjectId(card_id),
+        "amount": 42.0,
+        "attempted_at": attempted_at,
+        "status": "approved",
+        "reason_code": None,
+        "refunded": False,
+        "refunded_at": None,
+    }
+
+
+def test_archive_moves_old_months_and_list_reads_them(test_client, admin_headers, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    old = [
+        _old_charge(client["id"], card["id"], datetime(2020, 1, 10, tzinfo=UTC)),
+        _old_charge(client["id"], card["id"], datetime(2020, 2, 3, tzinfo=UTC)),
+        _old_charge(client["id"], card["id"], datetime(2020, 2, 20, tzinfo=UTC)),
+    ]
+    db["charges"].insert_many(old)
+    recent = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=5.0)
+
+    resp = test_client.post("/admin/archive", params={"after_days": 365}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.json()["archived"] == {"202001": 1, "202002": 2}
+
+    # Hot collection keeps only the recent charge
+    assert [d["_id"] for d in db["charges"].find({"client_id": ObjectId(client["id"])})] == [ObjectId(recent["id"])]
+    manifest = test_client.get("/admin/archive", headers=admin_headers).json()
+    assert set(manifest["months"]) == {"202001", "202002"}
+
+    listed = test_client.get(f"/charges/{client['id']}").json()
+    assert [c["id"] for c in listed] == [recent["id"]] + [str(d["_id"]) for d in reversed(old)]
+
+    window = test_client.get(
+        f"/charges/{client['id']}",
+        params={"since": "2020-02-01T00:00:00Z", "until": "2020-02-10T00:00:00Z"},
+    ).json()
+    assert [c["id"] for c in window] == [str(old[1]["_id"])]
+
+    # Recent ranges never touch the archive
+    since_now = test_client.get(f"/charges/{client['id']}", params={"since": "2021-01-01T00:00:00Z"}).json()
+    assert [c["id"] for c in since_now] == [recent["id"]]
+
+    # Second run has nothing left to do
+    again = test_client.post("/admin/archive", params={"after_days": 365}, headers=admin_headers)
+    assert again.json()["archived"] == {}
+
+
+def test_archived_charges_keep_request_ids_and_refuse_refunds(test_client, admin_headers, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    old = _old_charge(client["id"], card["id"], datetime(2020, 3, 5, tzinfo=UTC))
+    old["request_id"] = "old-1"
+    db["charges"].insert_one(old)
+
+    resp = test_client.post("/admin/archive", params={"after_days": 365}, headers=admin_headers)
+    assert resp.json()["archived"] == {"202003": 1}
+    assert db["charges"].count_documents({"_id": old["_id"]}) == 0
+
+    # The retry finds the archived charge instead of creating a second one
+    retry = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 42.0, "request_id": "old-1"},
+    )
+    assert retry.json()["id"] == str(old["_id"])
+    assert db["charges"].count_documents({"request_id": "old-1"}) == 0
+
+    refund = test_client.post(f"/charges/{old['_id']}/refund")
+    assert refund.status_code == 409
+    assert refund.json()["detail"] == "Charge archived"
+    assert test_client.post(f"/charges/{ObjectId()}/refund").status_code == 404
+
+
+def test_months_with_unrelayed_events_wait_for_the_relay(test_client, admin_headers, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    old = _old_charge(client["id"], card["id"], datetime(2020, 3, 5, tzinfo=UTC))
+    old["outbox"] = [{"id": ObjectId(), "kind": "refund"}]
+    db["charges"].insert_one(old)
+
+    resp = test_client.post("/admin/archive", params={"after_days": 365}, headers=admin_headers)
+    assert resp.json()["archived"] == {"202003": 0}
+    assert db["charges"].count_documents({"_id": old["_id"]}) == 1
+
+    # Relayed: the outbox is unset and the next run archives the month
+    db["charges"].update_one({"_id": old["_id"]}, {"$unset": {"outbox": ""}})
+    resp = test_client.post("/admin/archive", params={"after_days": 365}, headers=admin_headers)
+    assert resp.json()["archived"] == {"202003": 1}
+    assert db["charges"].count_documents({"_id": old["_id"]}) == 0
+
+
+def test_archive_requires_directory(test_client, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    monkeypatch.setattr(settings, "archive_dir", "")
+    resp = test_client.post("/admin/archive", headers={"X-Admin-Token": "test-admin-token"})
+    assert resp.status_code == 409
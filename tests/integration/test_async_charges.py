@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app.infrastructure.db.pending_charges import pending_charges
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+ASYNC = {"Prefer": "respond-async"}
+
+
+def _wait_persistence(test_client, charge_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        resp = test_client.get(f"/charges/by-id/{charge_id}")
+        assert resp.status_code == 200
+        body = resp.json()
+        if body["persistence"] != "queued" or time.monotonic() > deadline:
+            return body
+        time.sleep(0.05)
+
+
+def test_async_charge_is_accepted_then_persisted(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+
+    resp = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 6000.0},
+        headers=ASYNC,
+    )
+    assert resp.status_code == 202
+    accepted = resp.json()
+    assert accepted["persistence"] == "queued"
+    assert accepted["status"] == "declined"
+    assert accepted["reason_code"] == "LIMIT_EXCEEDED"
+    assert resp.headers["location"] == f"/charges/by-id/{accepted['id']}"
+
+    status = _wait_persistence(test_client, accepted["id"])
+    assert status["persistence"] == "persisted"
+    assert status["charge"]["id"] == accepted["id"]
+
+    history = test_client.get(f"/charges/{client['id']}").json()
+    assert [c["id"] for c in history] == [accepted["id"]]
+
+
+def test_async_charge_returns_persisted_request_id(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    first = create_charge(
+        test_client, client_id=client["id"], card_id=card["id"], amount=10.0, request_id="async-dup"
+    )
+
+    resp = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 10.0, "request_id": "async-dup"},
+        headers=ASYNC,
+    )
+    # Same answer as the synchronous retry: the persisted charge, not a new 202
+    assert resp.status_code == 201
+    assert resp.json() == first
+
+
+def test_async_charge_full_queue_returns_503(test_client, monkeypatch) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+
+    def full(*_args, **_kwargs):
+        raise asyncio.QueueFull
+
+    monkeypatch.setattr(pending_charges, "submit", full)
+    resp = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 10.0},
+        headers=ASYNC,
+    )
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+
+def test_charge_status_unknown_id(test_client) -> None:
+    resp = test_client.get("/charges/by-id/65f1c0ffee0000000000abcd")
+    assert resp.status_code == 404
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _next_url(response) -> str | None:
+    link = response.headers.get("Link")
+    if not link:
+        return None
+    assert link.endswith('; rel="next"')
+    return link[1 : link.index(">")]
+
+
+def test_card_charges_keyset_pages(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    other = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charges = [
+        create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0 + i)
+        for i in range(5)
+    ]
+    create_charge(test_client, client_id=client["id"], card_id=other["id"], amount=10.0)
+
+    seen = []
+    response = test_client.get(f"/cards/{card['id']}/charges", params={"limit": 2})
+    pages = 0
+    while True:
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        seen.extend(row["id"] for row in response.json())
+        pages += 1
+        url = _next_url(response)
+        if url is None:
+            break
+        response = test_client.get(url)
+
+    assert pages == 3
+    assert seen == [c["id"] for c in reversed(charges)]
+
+
+def test_card_charges_filters_and_fields(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    approved = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=6000.0)
+
+    response = test_client.get(
+        f"/cards/{card['id']}/charges", params={"status": "approved", "fields": "id,status"}
+    )
+    assert response.json() == [{"id": approved["id"], "status": "approved"}]
+    assert "Link" not in response.headers
+
+    future = (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat()
+    assert test_client.get(f"/cards/{card['id']}/charges", params={"since": future}).json() == []
+    full = test_client.get(f"/cards/{card['id']}/charges").json()
+    assert set(full[0]) == set(approved)
+
+
+def test_card_charges_errors(test_client) -> None:
+    assert test_client.get(f"/cards/{ObjectId()}/charges").status_code == 404
+    assert test_client.get("/cards/nope/charges").status_code == 422
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    assert test_client.get(f"/cards/{card['id']}/charges", params={"cursor": "bogus"}).status_code == 422
+    assert test_client.get(f"/cards/{card['id']}/charges", params={"limit": 0}).status_code == 422
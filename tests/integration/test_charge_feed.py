@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List
+
+import pytest
+from bson import ObjectId
+
+from app.config import settings
+from app.http.pagination import encode_cursor
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _events(body: str) -> List[Dict[str, str]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append(fields)
+    return events
+
+
+def _event_id(charge: Dict) -> str:
+    return encode_cursor(datetime.fromisoformat(charge["attempted_at"]), ObjectId(charge["id"]))
+
+
+def test_resume_replays_missed_events_in_batches(test_client, monkeypatch) -> None:
+    # One event per connection: each response ends after its catch-up batch
+    monkeypatch.setattr(settings, "charge_feed_replay_max", 1)
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    first, second, third = (
+        create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0) for _ in range(3)
+    )
+    assert test_client.post(f"/charges/{second['id']}/refund").status_code == 200
+
+    url = f"/clients/{client['id']}/charges/stream"
+    response = test_client.get(url, headers={"Last-Event-ID": _event_id(first)})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("retry: ")
+    [event] = _events(response.text)
+    assert event["event"] == "charge"
+    assert '"id":"%s"' % second["id"] in event["data"]
+
+    [event] = _events(test_client.get(url, headers={"Last-Event-ID": event["id"]}).text)
+    assert event["event"] == "charge"
+    assert '"id":"%s"' % third["id"] in event["data"]
+
+
+def test_stream_errors(test_client) -> None:
+    assert test_client.get(f"/clients/{ObjectId()}/charges/stream").status_code == 404
+    assert test_client.get("/clients/nope/charges/stream").status_code == 422
+    client = create_client(test_client)
+    response = test_client.get(f"/clients/{client['id']}/charges/stream", headers={"Last-Event-ID": "bogus"})
+    assert response.status_code == 422
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.infrastructure.charge_histogram import closed_buckets
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    closed_buckets.clear()
+    yield
+    closed_buckets.clear()
+
+
+def test_hourly_histogram_of_a_client(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    for amount in (10.0, 20.0, 6000.0):
+        create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=amount)
+
+    resp = test_client.get(f"/clients/{client['id']}/charges/histogram", params={"bucket": "hour"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["buckets"]) == 24
+    current = body["buckets"][-1]
+    assert current["count"] == 3
+    assert current["approved"] == 2
+    assert current["approval_rate"] == pytest.approx(2 / 3)
+    assert current["approved_amount"] == pytest.approx(30.0)
+    assert current["reason_codes"] == {"LIMIT_EXCEEDED": 1}
+    assert all(b["count"] == 0 for b in body["buckets"][:-1])
+
+    day = test_client.get(
+        f"/clients/{client['id']}/charges/histogram",
+        params={"bucket": "day", "since": (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()},
+    ).json()
+    assert len(day["buckets"]) == 3
+    assert day["buckets"][-1]["count"] == 3
+
+
+def test_closed_buckets_are_not_aggregated_again(test_client, monkeypatch) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    # Treat the current hour as already final
+    monkeypatch.setattr(settings, "histogram_settle_s", -7200.0)
+
+    url = f"/clients/{client['id']}/charges/histogram"
+    assert test_client.get(url).json()["buckets"][-1]["count"] == 1
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    assert test_client.get(url).json()["buckets"][-1]["count"] == 1
+
+
+def test_histogram_validation(test_client) -> None:
+    client = create_client(test_client)
+    url = f"/clients/{client['id']}/charges/histogram"
+    assert test_client.get(url, params={"bucket": "week"}).status_code == 422
+    assert test_client.get(url, params={"since": "2024-05-02T00:00:00Z", "until": "2024-05-01T00:00:00Z"}).status_code == 422
+    assert test_client.get(url, params={"since": "2000-01-01T00:00:00Z"}).status_code == 422  # too many buckets
+    assert test_client.get("/clients/000000000000000000000000/charges/histogram").status_code == 404
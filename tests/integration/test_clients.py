@@ -27,7 +27,7 @@ def test_client_crud_flow(test_client) -> None:
     assert updated["email"] == "alice@example.com"
 
     delete_resp = test_client.delete(f"/clients/{client_id}")
-    assert delete_resp.status_code == 204
+    assert delete_resp.status_code == 202
 
     not_found_resp = test_client.get(f"/clients/{client_id}")
     assert not_found_resp.status_code == 404
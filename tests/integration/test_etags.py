@@ -0,0 +1,77 @@
+import pytest
+
+from app.infrastructure.cache import card_cache, client_cache
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _revalidate(test_client, url: str, etag: str, **params):
+    return test_client.get(url, params=params, headers={"If-None-Match": etag})
+
+
+def test_client_etag_roundtrip(test_client) -> None:
+    client = create_client(test_client)
+    url = f"/clients/{client['id']}"
+
+    first = test_client.get(url)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    # Validated by the covered index scan, then by the cached entity
+    client_cache.clear()
+    not_modified = _revalidate(test_client, url, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+
+    updated = test_client.put(url, json={"name": "Renamed"})
+    assert updated.headers["ETag"] != etag
+    changed = _revalidate(test_client, url, etag)
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Renamed"
+    assert changed.headers["ETag"] == updated.headers["ETag"]
+    assert _revalidate(test_client, url, changed.headers["ETag"]).status_code == 304
+
+
+def test_card_etag_roundtrip(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    url = f"/cards/{card['id']}"
+
+    etag = test_client.get(url).headers["ETag"]
+    card_cache.clear()
+    assert _revalidate(test_client, url, etag).status_code == 304
+
+    test_client.put(url, json={"bin": "411111", "last4": "4242"})
+    assert _revalidate(test_client, url, etag).status_code == 200
+
+
+def test_missing_resource_is_404_even_with_if_none_match(test_client) -> None:
+    response = _revalidate(test_client, "/clients/64b000000000000000000000", "*")
+    assert response.status_code == 404
+
+
+def test_charge_list_etag_moves_with_new_charges_and_refunds(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    url = f"/charges/{client['id']}"
+
+    first = test_client.get(url)
+    etag = first.headers["ETag"]
+    assert _revalidate(test_client, url, etag).status_code == 304
+    # Filters are part of the tag
+    assert _revalidate(test_client, url, etag, status="approved").status_code == 200
+
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=20.0)
+    after_charge = _revalidate(test_client, url, etag)
+    assert after_charge.status_code == 200
+    assert len(after_charge.json()) == 2
+
+    etag = after_charge.headers["ETag"]
+    test_client.post(f"/charges/{charge['id']}/refund")
+    after_refund = _revalidate(test_client, url, etag)
+    assert after_refund.status_code == 200
+    assert _revalidate(test_client, url, after_refund.headers["ETag"]).status_code == 304
@@ -0,0 +1,54 @@
+import pytest
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_client_and_card_sparse_fieldsets(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+
+    client_resp = test_client.get(f"/clients/{client['id']}", params={"fields": "name,id"})
+    assert client_resp.status_code == 200
+    assert client_resp.json() == {"id": client["id"], "name": client["name"]}
+
+    card_resp = test_client.get(f"/cards/{card['id']}", params={"fields": "last4,client_id"})
+    assert card_resp.json() == {"client_id": client["id"], "last4": card["last4"]}
+
+    # Each representation has its own validator
+    full = test_client.get(f"/clients/{client['id']}")
+    assert full.headers["ETag"] != client_resp.headers["ETag"]
+    revalidated = test_client.get(
+        f"/clients/{client['id']}",
+        params={"fields": "id,name"},
+        headers={"If-None-Match": client_resp.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_list_charges_sparse_fieldset(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charges = [
+        create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=amount)
+        for amount in (10.0, 20.0)
+    ]
+
+    response = test_client.get(
+        f"/charges/{client['id']}", params={"fields": "id,amount,status,attempted_at", "status": "approved"}
+    )
+    assert response.status_code == 200
+    rows = response.json()
+    assert [r["id"] for r in rows] == [c["id"] for c in reversed(charges)]
+    assert set(rows[0]) == {"id", "amount", "status", "attempted_at"}
+
+    by_id = test_client.get(f"/charges/by-id/{charges[0]['id']}", params={"fields": "amount"})
+    assert by_id.json()["charge"] == {"amount": 10.0}
+    assert by_id.json()["persistence"] == "persisted"
+
+
+def test_unknown_field_is_rejected(test_client) -> None:
+    client = create_client(test_client)
+    response = test_client.get(f"/charges/{client['id']}", params={"fields": "id,pan"})
+    assert response.status_code == 422
@@ -0,0 +1,203 @@
+"""
+Every query shape issued by the routers must be index-backed.
+
+The slow query log is switched to record every command; the test then drives
+all router read/write paths and checks the executionStats explain captured for
+each shape. A shape that is not listed in KNOWN_SHAPES fails the test too, so
+new queries have to be registered here together with a supporting index.
+"""
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import pytest
+
+from app.config import settings
+from app.infrastructure.db.slow_queries import EXPLAINABLE, slow_query_log
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+# Keys examined per returned document; 1.0 means the index matched exactly
+MAX_KEYS_PER_RETURNED = 2.0
+
+# (collection, command, filter fields) of every query the routers issue
+KNOWN_SHAPES = {
+    ("clients", "find", ("_id",)),
+    ("cards", "find", ("_id",)),
+    ("charges", "find", ("_id",)),
+    ("charges", "find", ("request_id",)),
+    ("charges", "find", ("client_id",)),
+    ("charges", "find", ("client_id", "status")),
+    ("charges", "find", ("attempted_at", "client_id")),
+    ("charges", "find", ("attempted_at", "client_id", "status")),
+    ("charges", "find", ("client_id", "refunded_at")),
+    ("charges", "find", ("attempted_at", "client_id", "refunded_at")),
+    ("charges", "find", ("card_id",)),
+    ("charges", "find", ("card_id", "status")),
+    ("charges", "find", ("attempted_at", "card_id")),
+    ("charges", "find", ("_id", "attempted_at", "card_id")),
+    ("charges", "find", ("_id", "attempted_at", "card_id", "status")),
+    ("charges", "aggregate", ("attempted_at", "client_id")),
+    ("clients", "find", ("_id", "updated_at")),
+    ("clients", "findAndModify", ("_id",)),
+    ("clients", "findAndModify", ("_id", "updated_at")),
+    ("cards", "findAndModify", ("_id",)),
+    ("cards", "findAndModify", ("_id", "updated_at")),
+    ("charges", "update", ("_id",)),
+    ("charges", "update", ("_id", "refunded")),
+    ("clients", "delete", ("_id",)),
+    ("clients", "delete", ("_id", "updated_at")),
+    ("cards", "delete", ("_id",)),
+    ("cards", "delete", ("_id", "updated_at")),
+    # Client cascade-delete job (enqueued by DELETE /clients/{id})
+    ("jobs", "find", ("_id",)),
+    ("jobs", "findAndModify", ("lease_until", "status")),
+    ("jobs", "update", ("_id", "owner")),
+    ("jobs", "update", ("_id", "status")),
+    ("jobs", "delete", ("_id", "status")),
+    ("clients", "aggregate", ("_id",)),
+    ("cards", "find", ("client_id",)),
+    ("charges", "find", ("client_id", "outbox")),
+    ("charges", "delete", ("_id", "client_id", "outbox")),
+    ("cards", "delete", ("_id", "client_id")),
+}
+
+
+def _filter_fields(node) -> List[str]:
+    """Field names referenced by a normalized filter, operators flattened."""
+    fields: List[str] = []
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key.startswith("$"):
+                fields.extend(_filter_fields(value))
+            else:
+                fields.append(key)
+    elif isinstance(node, list):
+        for item in node:
+            fields.extend(_filter_fields(item))
+    return fields
+
+
+def _shape_key(shape: Dict) -> tuple:
+    if shape["command"] == "find":
+        flt = shape.get("filter", {})
+    elif shape["command"] == "findAndModify":
+        flt = shape.get("query", {})
+    elif shape["command"] == "aggregate":
+        flt = next((stage["$match"] for stage in shape.get("pipeline", []) if "$match" in stage), {})
+    else:
+        stmt = shape.get("updates") or shape.get("deletes") or {}
+        flt = stmt.get("q", {})
+    return shape["collection"], shape["command"], tuple(sorted(set(_filter_fields(flt))))
+
+
+def _exercise_routers(test_client) -> None:
+    client = create_client(test_client)
+    other = create_client(test_client, email="other@example.com")
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    create_card(test_client, client_id=other["id"], pan=create_pan())
+
+    # Skewed history: a few approved charges buried among declined ones, so a
+    # status filter answered from (client_id, attempted_at) examines far more
+    # keys than it returns.
+    approved = [
+        create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+        for _ in range(3)
+    ]
+    for i in range(30):
+        create_charge(
+            test_client,
+            client_id=client["id"],
+            card_id=card["id"],
+            amount=6000.0,
+            request_id=f"coverage-{i}",
+        )
+    create_charge(
+        test_client, client_id=client["id"], card_id=card["id"], amount=6000.0, request_id="coverage-0"
+    )
+
+    since = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    until = (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat()
+    for params in (
+        {},
+        {"status": "approved"},
+        {"since": since},
+        {"since": since, "until": until, "status": "approved"},
+    ):
+        assert test_client.get(f"/charges/{client['id']}", params=params).status_code == 200
+
+    test_client.get(f"/clients/{client['id']}")
+    test_client.get(f"/cards/{card['id']}")
+    test_client.get(f"/clients/{client['id']}", headers={"If-None-Match": '"stale"'})
+    test_client.get(f"/clients/{client['id']}", params={"fields": "id,name"})
+    test_client.get(f"/cards/{card['id']}", params={"fields": "id,last4"})
+    test_client.get(f"/charges/{client['id']}", params={"since": since, "fields": "id,amount,status"})
+    test_client.get(f"/charges/by-id/{approved[0]['id']}", params={"fields": "id,status"})
+    test_client.get(f"/cards/{card['id']}", headers={"If-None-Match": '"stale"'})
+    test_client.get(f"/cards/{card['id']}/charges", params={"since": since})
+    for params in ({"limit": 5}, {"status": "approved", "limit": 2}):
+        page = test_client.get(f"/cards/{card['id']}/charges", params=params)
+        test_client.get(page.links["next"]["url"])
+    test_client.get(f"/clients/{client['id']}/charges/histogram", params={"bucket": "hour"})
+    renamed = test_client.put(f"/clients/{client['id']}", json={"name": "Renamed"})
+    test_client.put(f"/clients/{client['id']}", json={"phone": "+1"}, headers={"If-Match": renamed.headers["ETag"]})
+    test_client.put(f"/clients/{client['id']}", json={}, headers={"If-Match": '"1-stale"'})
+    updated = test_client.put(f"/cards/{card['id']}", json={"bin": "411111", "last4": "4242"})
+    test_client.put(f"/cards/{card['id']}", json={"bin": "411111", "last4": "4343"}, headers={"If-Match": updated.headers["ETag"]})
+    test_client.delete(f"/clients/{other['id']}", headers={"If-Match": '"1-stale"'})
+    test_client.post(f"/charges/{approved[0]['id']}/refund")
+    test_client.get(f"/charges/{client['id']}", params={"since": since})
+    test_client.delete(f"/cards/{card['id']}")
+    job = test_client.delete(f"/clients/{other['id']}").json()
+    test_client.get(f"/jobs/{job['id']}")
+
+
+@pytest.fixture
+def record_all_commands(monkeypatch) -> None:
+    if settings.slow_query_ms <= 0:
+        pytest.skip("slow query log disabled (SLOW_QUERY_MS=0)")
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0.0)
+    slow_query_log.reset()
+    yield
+    slow_query_log.reset()
+
+
+def test_router_queries_are_index_backed(test_client, record_all_commands) -> None:
+    _exercise_routers(test_client)
+
+    deadline = time.monotonic() + 15
+    while True:
+        shapes = [s for s in slow_query_log.top(limit=500) if s["shape"]["command"] in EXPLAINABLE]
+        pending = [s for s in shapes if s["explain"] is None and s["explain_error"] is None]
+        if not pending or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    assert not pending, f"explains did not complete: {[p['shape'] for p in pending]}"
+
+    problems = []
+    for s in shapes:
+        key = _shape_key(s["shape"])
+        described = json.dumps(s["shape"], sort_keys=True)
+        if key not in KNOWN_SHAPES:
+            problems.append(f"unregistered query shape {key}: {described}")
+            continue
+        if s["explain_error"]:
+            problems.append(f"explain failed for {described}: {s['explain_error']}")
+            continue
+        explain = s["explain"]
+        if explain["collscan"]:
+            problems.append(f"COLLSCAN for {described}: {explain['plan']}")
+        keys, returned = explain["keys_examined"] or 0, explain["returned"] or 0
+        if s["shape"]["command"] == "aggregate":
+            # Grouping returns fewer rows than it reads: compare with the documents fetched
+            returned = explain["docs_examined"] or 0
+        if keys > MAX_KEYS_PER_RETURNED * max(returned, 1):
+            problems.append(
+                f"{keys} keys examined for {returned} returned in {described}: {explain['plan']}"
+            )
+    assert not problems, "\n".join(problems)
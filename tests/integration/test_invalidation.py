@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+
+import anyio
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.infrastructure.cache import TTLCache
+from app.infrastructure.invalidation import COLLECTION, InvalidationBus
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _worker(origin: str) -> InvalidationBus:
+    return InvalidationBus({"client": TTLCache(10, 60), "card": TTLCache(10, 60)}, origin=origin)
+
+
+async def _broadcast(uri: str) -> None:
+    mongo = AsyncIOMotorClient(uri)
+    db = mongo.get_default_database()
+    await db.drop_collection(COLLECTION)
+    first, second = _worker("first"), _worker("second")
+    try:
+        await first.start(db, 65_536)
+        await second.start(db, 65_536)
+        for worker in (first, second):
+            worker.caches["client"].set("c1", "cached")
+            worker.caches["card"].set("k1", "cached")
+
+        await first.publish("client", "c1")
+        assert first.caches["client"].get("c1") is None
+        for _ in range(100):
+            if second.caches["client"].get("c1") is None:
+                break
+            await asyncio.sleep(0.05)
+        assert second.caches["client"].get("c1") is None
+        assert second.caches["card"].get("k1") == "cached"
+    finally:
+        await first.stop()
+        await second.stop()
+        mongo.close()
+
+
+def test_put_on_one_worker_invalidates_the_others() -> None:
+    anyio.run(_broadcast, settings.mongodb_uri)
+
@@ -0,0 +1,179 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from app.config import settings
+from app.infrastructure.db.models import ClientDoc, JobDoc
+from app.infrastructure.event_log import LogReader, SegmentLog
+from app.jobs.outbox_relay import charge_collections, relay_batch
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _wait_for_job(test_client, job_id: str, timeout: float = 15.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = test_client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "cascade_delete_batch", 2)
+    monkeypatch.setattr(settings, "cascade_delete_pause_ms", 0.0)
+
+
+def test_client_delete_cascades_in_background(test_client, small_chunks) -> None:
+    client = create_client(test_client)
+    keep = create_client(test_client, email="keep@example.com")
+    cards = [create_card(test_client, client_id=client["id"], pan=create_pan()) for _ in range(2)]
+    kept_card = create_card(test_client, client_id=keep["id"], pan=create_pan())
+    for card in cards:
+        for _ in range(3):
+            create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    create_charge(test_client, client_id=keep["id"], card_id=kept_card["id"], amount=10.0)
+
+    response = test_client.delete(f"/clients/{client['id']}")
+    assert response.status_code == 202
+    assert response.headers["Location"] == f"/jobs/{response.json()['id']}"
+    assert test_client.get(f"/clients/{client['id']}").status_code == 404
+
+    job = _wait_for_job(test_client, response.json()["id"])
+    assert job["status"] == "done"
+    assert job["kind"] == "delete_client"
+    assert job["progress"] == {"charges": 6, "cards": 2}
+
+    for card in cards:
+        assert test_client.get(f"/cards/{card['id']}").status_code == 404
+    assert test_client.get(f"/charges/{client['id']}").json() == []
+    # Other clients are untouched
+    assert test_client.get(f"/cards/{kept_card['id']}").status_code == 200
+    assert len(test_client.get(f"/charges/{keep['id']}").json()) == 1
+
+
+def test_cascade_waits_for_unrelayed_events(test_client, small_chunks, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "outbox_enabled", True)
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+
+    job_id = test_client.delete(f"/clients/{client['id']}").json()["id"]
+    deadline = time.monotonic() + 15
+    while (job := test_client.get(f"/jobs/{job_id}").json())["error"] is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # The charge is kept until the relay has written its event
+    assert job["status"] == "queued" and "PendingOutbox" in job["error"]
+    assert test_client.get(f"/charges/by-id/{charge['id']}").status_code == 200
+
+    log = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    with MongoClient(settings.mongodb_uri) as mongo:
+        assert relay_batch(charge_collections(mongo.get_default_database()), log, batch=100) == 1
+    log.close()
+
+    job = _wait_for_job(test_client, job_id)
+    assert job["status"] == "done"
+    assert job["progress"] == {"charges": 1, "cards": 1}
+    records, _ = LogReader(str(tmp_path)).read(0)
+    assert len(records) == 1
+
+
+async def _insert_abandoned_job(client_id: str) -> ObjectId:
+    mongo = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        db = mongo.get_default_database()
+        # The request deleted the client, then its worker crashed mid-cascade
+        await db[ClientDoc.get_settings().name].delete_one({"_id": ObjectId(client_id)})
+        now = datetime.now(timezone.utc)
+        result = await db[JobDoc.get_settings().name].insert_one({
+            "kind": "delete_client",
+            "params": {"client_id": client_id},
+            "status": "running",
+            "progress": {"charges": 1},
+            "attempts": 1,
+            "owner": "crashed-worker",
+            "lease_until": now - timedelta(seconds=1),
+            "created_at": now,
+            "updated_at": now,
+        })
+        return result.inserted_id
+    finally:
+        mongo.close()
+
+
+def test_job_with_expired_lease_is_resumed(test_client, small_chunks) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+
+    job_id = anyio.run(_insert_abandoned_job, client["id"])
+    # A job for another client wakes the runner instead of waiting for the next poll
+    other = create_client(test_client, email="other@example.com")
+    _wait_for_job(test_client, test_client.delete(f"/clients/{other['id']}").json()["id"])
+
+    job = _wait_for_job(test_client, str(job_id))
+    assert job["status"] == "done"
+    assert job["attempts"] == 2
+    assert job["progress"] == {"charges": 2, "cards": 1}
+    assert test_client.get(f"/cards/{card['id']}").status_code == 404
+
+
+def test_failed_delete_leaves_no_job_and_held_jobs_skip_live_clients(test_client, small_chunks) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    url = f"/clients/{client['id']}"
+    etag = test_client.get(url).headers["ETag"]
+    test_client.put(url, json={"name": "Renamed"})
+
+    assert test_client.delete(url, headers={"If-Match": etag}).status_code == 412
+    assert anyio.run(_job_count) == 0
+
+    # A job whose request died before deleting the client runs as a no-op
+    job_id = anyio.run(_insert_queued_job, client["id"])
+    other = create_client(test_client, email="other@example.com")
+    _wait_for_job(test_client, test_client.delete(f"/clients/{other['id']}").json()["id"])
+
+    job = _wait_for_job(test_client, str(job_id))
+    assert job["status"] == "done"
+    assert job["progress"] == {}
+    assert test_client.get(f"/cards/{card['id']}").status_code == 200
+
+
+async def _job_count() -> int:
+    mongo = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        return await mongo.get_default_database()[JobDoc.get_settings().name].count_documents({})
+    finally:
+        mongo.close()
+
+
+async def _insert_queued_job(client_id: str) -> ObjectId:
+    mongo = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        now = datetime.now(timezone.utc)
+        result = await mongo.get_default_database()[JobDoc.get_settings().name].insert_one({
+            "kind": "delete_client",
+            "params": {"client_id": client_id},
+            "status": "queued",
+            "progress": {},
+            "attempts": 0,
+            "owner": None,
+            "lease_until": now,
+            "created_at": now,
+            "updated_at": now,
+        })
+        return result.inserted_id
+    finally:
+        mongo.close()
+
+
+def test_unknown_job_is_404(test_client) -> None:
+    assert test_client.get(f"/jobs/{ObjectId()}").status_code == 404
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import pytest
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_metrics_exposition(test_client) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=6000.0)
+    assert charge["reason_code"] == "LIMIT_EXCEEDED"
+    test_client.get(f"/cards/{card['id']}")
+
+    resp = test_client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/cards/{card_id}",status="200"}' in body
+    assert 'http_requests_in_flight{method="GET",route="/metrics"} 1' in body
+    assert 'charges_total{status="declined",reason_code="LIMIT_EXCEEDED"}' in body
+    assert 'mongodb_command_duration_seconds_count{collection="charges",command="insert",outcome="succeeded"}' in body
+
+
+def test_health_reports_closed_data_circuit(test_client) -> None:
+    test_client.get("/clients/000000000000000000000000")
+
+    resp = test_client.get("/health")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok", "database": "closed"}
+    assert "db_circuit_state 0" in test_client.get("/metrics").text
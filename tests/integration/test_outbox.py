@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+from app.config import settings
+from app.infrastructure.event_log import LogReader, SegmentLog
+from app.jobs.outbox_relay import charge_collections, relay_batch
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture
+def outbox(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "outbox_enabled", True)
+
+
+def test_charge_and_refund_events_reach_the_log(test_client, outbox, tmp_path) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    assert test_client.post(f"/charges/{charge['id']}/refund").status_code == 200
+    # The refund is a conditional update: a second one finds nothing to change
+    assert test_client.post(f"/charges/{charge['id']}/refund").status_code == 409
+
+    log = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    with MongoClient(settings.mongodb_uri) as mongo:
+        db = mongo.get_default_database()
+        assert relay_batch(charge_collections(db), log, batch=100) == 2
+        # Relayed events leave the outbox (and the partial index)
+        assert relay_batch(charge_collections(db), log, batch=100) == 0
+        raw = next(c.find_one({"_id": ObjectId(charge["id"])}) for c in charge_collections(db))
+        assert "outbox" not in raw
+
+    records, _ = LogReader(str(tmp_path)).read(0)
+    events = [json.loads(bytes(r)) for r in records]
+    assert [e["kind"] for e in events] == ["charge", "refund"]
+    assert {e["charge"]["id"] for e in events} == {charge["id"]}
+    assert events[1]["charge"]["refunded"] is True
+
+
+def test_outbox_is_off_by_default(test_client, tmp_path) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+
+    log = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    with MongoClient(settings.mongodb_uri) as mongo:
+        assert relay_batch(charge_collections(mongo.get_default_database()), log, batch=100) == 0
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterator
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.database import Database
+
+from app.config import settings
+from app.infrastructure.db.partitions import REQUEST_IDS_COLLECTION, charge_partitions, partition_name
+from scripts.partition_charges import copy_charges, verify
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+UTC = timezone.utc
+
+
+@pytest.fixture
+def partitioned(monkeypatch) -> Iterator[None]:
+    monkeypatch.setattr(settings, "charge_partitioning", "monthly")
+    charge_partitions.invalidate()
+    yield
+    charge_partitions.invalidate()
+
+
+@pytest.fixture
+def db() -> Iterator[Database]:
+    client = MongoClient(settings.mongodb_uri)
+    try:
+        yield client.get_default_database()
+    finally:
+        client.close()
+
+
+def _raw_charge(client_id: str, card_id: str, attempted_at: datetime, **extra) -> dict:
+    doc = {
+        "_id": ObjectId.from_datetime(attempted_at),
+        "client_id": ObjectId(client_id),
+        "card_id": ObjectId(card_id),
+        "amount": 10.0,
+        "attempted_at": attempted_at,
+        "status": "approved",
+        "reason_code": None,
+        "refunded": False,
+        "refunded_at": None,
+        "request_id": None,
+    }
+    doc.update(extra)
+    return doc
+
+
+def test_charges_are_written_to_monthly_partition(test_client, partitioned, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=25.0, request_id="p-1")
+    month = datetime.fromisoformat(charge["attempted_at"]).strftime("%Y%m")
+
+    assert db[partition_name(month)].count_documents({"_id": ObjectId(charge["id"])}) == 1
+    assert db["charges"].count_documents({}) == 0
+    assert db[REQUEST_IDS_COLLECTION].find_one({"_id": "p-1"})["charge_id"] == ObjectId(charge["id"])
+
+    again = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 25.0, "request_id": "p-1"},
+    )
+    assert again.json()["id"] == charge["id"]
+
+    refunded = test_client.post(f"/charges/{charge['id']}/refund")
+    assert refunded.status_code == 200
+    assert db[partition_name(month)].find_one({"_id": ObjectId(charge["id"])})["refunded"] is True
+
+    status = test_client.get(f"/charges/by-id/{charge['id']}").json()
+    assert status["persistence"] == "persisted"
+
+
+def test_list_merges_only_overlapping_partitions(test_client, partitioned, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    times = [
+        datetime(2024, 1, 5, tzinfo=UTC),
+        datetime(2024, 1, 30, tzinfo=UTC),
+        datetime(2024, 2, 14, tzinfo=UTC),
+        datetime(2024, 3, 2, tzinfo=UTC),
+        datetime(2024, 3, 20, tzinfo=UTC),
+    ]
+    for ts in times:
+        db[partition_name(ts.strftime("%Y%m"))].insert_one(_raw_charge(client["id"], card["id"], ts))
+    charge_partitions.invalidate()
+
+    everything = test_client.get(f"/charges/{client['id']}").json()
+    assert [c["attempted_at"][:10] for c in everything] == [
+        "2024-03-20", "2024-03-02", "2024-02-14", "2024-01-30", "2024-01-05",
+    ]
+
+    window = test_client.get(
+        f"/charges/{client['id']}",
+        params={"since": "2024-01-10T00:00:00Z", "until": "2024-03-02T00:00:00Z"},
+    ).json()
+    assert [c["attempted_at"][:10] for c in window] == ["2024-02-14", "2024-01-30"]
+
+
+def test_migration_copies_and_verifies(test_client, partitioned, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    source = [
+        _raw_charge(client["id"], card["id"], datetime(2023, 11, 3, tzinfo=UTC), request_id="m-1"),
+        _raw_charge(client["id"], card["id"], datetime(2023, 12, 9, tzinfo=UTC)),
+        _raw_charge(client["id"], card["id"], datetime(2023, 12, 10, tzinfo=UTC)),
+    ]
+    db["charges"].insert_many(source)
+
+    assert copy_charges(db, batch_size=2)["inserted"] == 3
+    assert copy_charges(db, batch_size=2)["inserted"] == 0  # re-runs are no-ops
+    assert verify(db)
+    charge_partitions.invalidate()
+
+    listed = test_client.get(f"/charges/{client['id']}").json()
+    assert [c["id"] for c in listed] == [str(d["_id"]) for d in reversed(source)]
+
+    replay = test_client.post(
+        "/charges",
+        json={"client_id": client["id"], "card_id": card["id"], "amount": 10.0, "request_id": "m-1"},
+    )
+    assert replay.json()["id"] == str(source[0]["_id"])
+
+
+def test_migration_catches_up_refunds_before_drop(test_client, partitioned, db) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    source = [
+        _raw_charge(client["id"], card["id"], datetime(2023, 10, 3, tzinfo=UTC)),
+        _raw_charge(client["id"], card["id"], datetime(2023, 10, 4, tzinfo=UTC)),
+    ]
+    db["charges"].insert_many(source)
+    started = datetime.now(UTC)
+    copy_charges(db, batch_size=10)
+
+    refunded_at = datetime.now(UTC)
+    db["charges"].update_one({"_id": source[0]["_id"]}, {"$set": {"refunded": True, "refunded_at": refunded_at}})
+    assert copy_charges(db, batch_size=10, after=source[-1]["_id"])["read"] == 0
+    assert not verify(db)  # same counts, refund missing
+
+    assert copy_charges(db, batch_size=10, refunded_since=started)["updated"] == 1
+    assert db[partition_name("202310")].find_one({"_id": source[0]["_id"]})["refunded"] is True
+    assert verify(db)
+
+    # A copy refunded in its partition is never rolled back by a stale source
+    db["charges"].update_one({"_id": source[0]["_id"]}, {"$set": {"refunded": False, "refunded_at": None}})
+    assert copy_charges(db, batch_size=10)["updated"] == 0
+    assert db[partition_name("202310")].find_one({"_id": source[0]["_id"]})["refunded"] is True
+
+
+def test_stale_request_id_claim_is_taken_over(test_client, partitioned, db, monkeypatch) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    body = {"client_id": client["id"], "card_id": card["id"], "amount": 10.0, "request_id": "orphan"}
+    # Claimed by a request that died before writing its charge
+    orphan = ObjectId()
+    db[REQUEST_IDS_COLLECTION].insert_one(
+        {"_id": "orphan", "charge_id": orphan, "partition": "202401", "claimed_at": datetime.now(UTC)}
+    )
+
+    assert test_client.post("/charges", json=body).status_code == 409  # still within the grace period
+
+    monkeypatch.setattr(settings, "request_id_claim_grace_s", 0.001)
+    created = test_client.post("/charges", json=body)
+    assert created.status_code == 201
+    entry = db[REQUEST_IDS_COLLECTION].find_one({"_id": "orphan"})
+    assert entry["charge_id"] == ObjectId(created.json()["id"]) != orphan
+    assert test_client.post("/charges", json=body).json()["id"] == created.json()["id"]
@@ -0,0 +1,62 @@
+import pytest
+
+from .utils import create_card, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_client_update_with_if_match(test_client) -> None:
+    client = create_client(test_client)
+    url = f"/clients/{client['id']}"
+    etag = test_client.get(url).headers["ETag"]
+
+    first = test_client.put(url, json={"name": "First"}, headers={"If-Match": etag})
+    assert first.status_code == 200
+    assert first.json()["name"] == "First"
+    assert first.json()["phone"] == client["phone"]  # untouched fields survive the $set
+
+    # A concurrent editor still holding the old tag loses instead of overwriting
+    stale = test_client.put(url, json={"name": "Second"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert test_client.get(url).json()["name"] == "First"
+
+    fresh = test_client.put(url, json={"name": "Second"}, headers={"If-Match": first.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert test_client.put(url, json={"name": "Any"}, headers={"If-Match": "*"}).status_code == 200
+
+
+def test_client_delete_with_if_match(test_client) -> None:
+    client = create_client(test_client)
+    url = f"/clients/{client['id']}"
+    etag = test_client.get(url).headers["ETag"]
+    test_client.put(url, json={"name": "Changed"})
+
+    assert test_client.delete(url, headers={"If-Match": etag}).status_code == 412
+    assert test_client.delete(url).status_code == 202
+    assert test_client.delete(url).status_code == 404
+    assert test_client.delete(url, headers={"If-Match": etag}).status_code == 404
+
+
+def test_card_update_rebuilds_mask_atomically(test_client) -> None:
+    client = create_client(test_client)
+    pan = create_pan()
+    card = create_card(test_client, client_id=client["id"], pan=pan)
+    url = f"/cards/{card['id']}"
+    etag = test_client.get(url).headers["ETag"]
+
+    updated = test_client.put(url, json={"bin": "411111", "last4": "4242"}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    body = updated.json()
+    assert body["pan_masked"] == "*" * (len(pan) - 4) + "4242"
+    assert body["last4"] == "4242"
+
+    stale = test_client.put(url, json={"bin": "411111", "last4": "1111"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert test_client.put("/cards/64b000000000000000000000", json={"bin": "411111", "last4": "1111"}).status_code == 404
+
+
+def test_back_to_back_updates_get_distinct_versions(test_client) -> None:
+    client = create_client(test_client)
+    url = f"/clients/{client['id']}"
+    tags = {test_client.put(url, json={"name": f"Name {i}"}).headers["ETag"] for i in range(5)}
+    assert len(tags) == 5
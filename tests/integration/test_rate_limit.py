@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from app.config import settings
+
+from .utils import create_card, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def tight_limits(monkeypatch, request) -> None:
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_backend", request.param)
+    monkeypatch.setattr(settings, "rate_limit_client_rps", 0.01)
+    monkeypatch.setattr(settings, "rate_limit_client_burst", 3.0)
+    monkeypatch.setattr(settings, "rate_limit_card_rps", 0.01)
+    monkeypatch.setattr(settings, "rate_limit_card_burst", 2.0)
+
+
+def _charge(test_client, client_id: str, card_id: str):
+    return test_client.post("/charges", json={"client_id": client_id, "card_id": card_id, "amount": 10.0})
+
+
+def test_card_and_client_limits_return_429(test_client, tight_limits) -> None:
+    client = create_client(test_client)
+    card_a = create_card(test_client, client_id=client["id"], pan=create_pan())
+    card_b = create_card(test_client, client_id=client["id"], pan=create_pan())
+
+    assert [_charge(test_client, client["id"], card_a["id"]).status_code for _ in range(2)] == [201, 201]
+    limited = _charge(test_client, client["id"], card_a["id"])
+    assert limited.status_code == 429
+    assert limited.json()["detail"] == "Rate limit exceeded for card"
+    assert int(limited.headers["retry-after"]) >= 1
+
+    # Another card of the same client has its own bucket, until the client one runs out
+    # (the card rejection above cost the client nothing)
+    assert _charge(test_client, client["id"], card_b["id"]).status_code == 201
+    limited = _charge(test_client, client["id"], card_b["id"])
+    assert limited.status_code == 429
+    assert limited.json()["detail"] == "Rate limit exceeded for client"
+
+
+def test_limit_applies_before_any_db_work(test_client, tight_limits) -> None:
+    ghost_client, ghost_card = "65f1c0ffee0000000000aaaa", "65f1c0ffee0000000000bbbb"
+    assert _charge(test_client, ghost_client, ghost_card).status_code == 404
+    assert _charge(test_client, ghost_client, ghost_card).status_code == 404
+    # Third attempt is rejected by the card bucket without looking the client up
+    assert _charge(test_client, ghost_client, ghost_card).status_code == 429
+
+
+def test_rate_limit_can_be_disabled(test_client, tight_limits, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    assert {_charge(test_client, client["id"], card["id"]).status_code for _ in range(4)} == {201}
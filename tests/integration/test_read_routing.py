@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import pytest
+
+from app.config import settings
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture
+def secondary_reads(monkeypatch) -> None:
+    # On a standalone server or a single-host replica set reads still land on the primary
+    monkeypatch.setattr(settings, "read_preference", "secondaryPreferred")
+    monkeypatch.setattr(settings, "read_max_staleness_s", 90)
+
+
+def test_offloaded_routes_serve_reads(test_client, secondary_reads) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    charge = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+
+    assert test_client.get(f"/clients/{client['id']}").json()["id"] == client["id"]
+    assert test_client.get(f"/cards/{card['id']}", params={"fields": "id"}).json() == {"id": card["id"]}
+    assert [c["id"] for c in test_client.get(f"/charges/{client['id']}").json()] == [charge["id"]]
+    assert [c["id"] for c in test_client.get(f"/cards/{card['id']}/charges").json()] == [charge["id"]]
+
+
+def test_write_paths_keep_primary_reads(test_client, secondary_reads) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    first = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0, request_id="rr-1")
+    # The idempotency check and the post-write status read see the write at once
+    assert create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0, request_id="rr-1") == first
+    status = test_client.get(f"/charges/by-id/{first['id']}").json()
+    assert status["persistence"] == "persisted"
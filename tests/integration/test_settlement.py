@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+from app.jobs.settlement import render_csv, run_settlement
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_settlement_nets_refunds_per_client_and_card(test_client) -> None:
+    client = create_client(test_client)
+    other = create_client(test_client, email="other@example.com")
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    other_card = create_card(test_client, client_id=other["id"], pan=create_pan())
+    refunded = create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.1)
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=20.2)
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=6000.0)  # declined
+    create_charge(test_client, client_id=other["id"], card_id=other_card["id"], amount=5.0)
+    assert test_client.post(f"/charges/{refunded['id']}/refund").status_code == 200
+
+    today = datetime.now(timezone.utc).date()
+    single = run_settlement(settings.mongodb_uri, today, workers=1, ranges=1)
+    ranged = run_settlement(settings.mongodb_uri, today, workers=2, ranges=4)
+    assert render_csv(single) == render_csv(ranged)
+
+    rows = {tuple(line.split(",")[:2]): line for line in render_csv(single).decode().splitlines()[1:]}
+    assert rows[(client["id"], card["id"])].endswith(",2,30.30,1,10.10,20.20")
+    assert rows[(other["id"], other_card["id"])].endswith(",1,5.00,0,0.00,5.00")
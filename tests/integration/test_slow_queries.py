@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from app.config import settings
+from app.infrastructure.db.slow_queries import slow_query_log
+
+from .utils import create_card, create_charge, create_client, create_pan
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture
+def log_everything(monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0.0)
+    slow_query_log.reset()
+    yield {"X-Admin-Token": "test-admin-token"}
+    slow_query_log.reset()
+
+
+def test_slow_query_log_captures_list_charges_shape(test_client, log_everything) -> None:
+    client = create_client(test_client)
+    card = create_card(test_client, client_id=client["id"], pan=create_pan())
+    create_charge(test_client, client_id=client["id"], card_id=card["id"], amount=10.0)
+    test_client.get(f"/charges/{client['id']}", params={"status": "approved"})
+
+    charges_find = None
+    for _ in range(50):
+        resp = test_client.get("/admin/slow-queries", headers=log_everything)
+        assert resp.status_code == 200
+        charges_find = next(
+            (
+                s
+                for s in resp.json()["shapes"]
+                if s["shape"]["command"] == "find"
+                and s["shape"]["collection"] == "charges"
+                and '"status"' in json.dumps(s["shape"].get("filter", {}))
+            ),
+            None,
+        )
+        if charges_find and charges_find["explain"]:
+            break
+        time.sleep(0.1)
+
+    assert charges_find is not None
+    assert '"status": "?"' in json.dumps(charges_find["shape"]["filter"])
+    assert charges_find["explain"]["plan"]
+
+    reset = test_client.delete("/admin/slow-queries", headers=log_everything)
+    assert reset.status_code == 204
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.http.middleware.admission import AdmissionLane, AdmissionMiddleware, route_class
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _lane(limit: int = 1, max_queue: int = 10, clock=None, max_wait: float = 5.0) -> AdmissionLane:
+    return AdmissionLane(
+        "test", limit, max_queue=max_queue, target=0.05, interval=0.5, max_wait=max_wait,
+        clock=clock or FakeClock(),
+    )
+
+
+def test_route_classes() -> None:
+    assert route_class("GET", "/health") is None
+    assert route_class("GET", "/metrics") is None
+    assert route_class("POST", "/admin/profile") == "admin"
+    assert route_class("GET", "/charges/abc") == "reads"
+    assert route_class("POST", "/charges") == "charges"
+    assert route_class("POST", "/charges/abc/refund") == "charges"
+    assert route_class("PUT", "/clients/abc") == "writes"
+    assert route_class("GET", "/clients/abc/charges/stream") == "streams"
+
+
+def test_slots_are_handed_over_in_fifo_order() -> None:
+    async def scenario() -> List[str]:
+        lane = _lane(limit=1)
+        order: List[str] = []
+        assert await lane.acquire() is None
+
+        async def waiter(name: str) -> None:
+            assert await lane.acquire() is None
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(n)) for n in "abc"]
+        await asyncio.sleep(0)
+        assert lane.queued == 3
+        for _ in range(3):
+            lane.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        lane.release()
+        assert lane.active == 0
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+
+
+def test_full_queue_and_max_wait_shed() -> None:
+    async def scenario() -> List[str]:
+        lane = _lane(limit=1, max_queue=1, max_wait=0.01)
+        await lane.acquire()
+        waiting = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        rejected = await lane.acquire()
+        timed_out = await waiting
+        return [rejected, timed_out, lane.queued]
+
+    assert asyncio.run(scenario()) == ["queue_full", "timeout", 0]
+
+
+def test_codel_sheds_standing_queue() -> None:
+    async def scenario() -> List:
+        clock = FakeClock()
+        lane = _lane(limit=1, clock=clock)
+        await lane.acquire()
+        waiters = [asyncio.create_task(lane.acquire()) for _ in range(4)]
+        await asyncio.sleep(0)
+
+        clock.now = 0.1  # above target: starts the interval, still served
+        lane.release()
+        clock.now = 0.7  # above target for a whole interval: shed until below target
+        lane.release()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == [None, "sojourn", "sojourn", "sojourn"]
+
+
+def test_middleware_sheds_but_keeps_health_lane() -> None:
+    release = asyncio.Event()
+
+    async def slow(_request):
+        await release.wait()
+        return PlainTextResponse("slow")
+
+    async def health(_request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/items", slow), Route("/health", health)])
+    lanes = {"reads": AdmissionLane("reads", 1, max_queue=0, target=0.05, interval=0.5, max_wait=1.0)}
+    wrapped = AdmissionMiddleware(app, lanes=lanes)
+
+    async def scenario() -> List:
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            first = asyncio.create_task(http.get("/items"))
+            await asyncio.sleep(0.01)
+            shed = await http.get("/items")
+            probe = await http.get("/health")
+            release.set()
+            return [await first, shed, probe]
+
+    first, shed, probe = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    assert probe.status_code == 200
+    assert lanes["reads"].active == 0
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from bson import ObjectId
+
+from app.infrastructure.archive import (
+    ChargeArchive,
+    ShardWriter,
+    decode_block,
+    encode_block,
+    month_bounds,
+    shard_of,
+)
+from app.infrastructure.db.charge_store import _merge_archived
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _rows(client_id: ObjectId, start: datetime, n: int) -> List[dict]:
+    cards = [ObjectId(), ObjectId()]
+    rows = []
+    for i in range(n):
+        at = start - timedelta(hours=i)
+        refunded = i % 7 == 0
+        rows.append({
+            "_id": ObjectId(),
+            "client_id": client_id,
+            "card_id": cards[i % 2],
+            "amount": 10.0 + i / 100,
+            "attempted_at": at,
+            "status": "declined" if i % 5 == 0 else "approved",
+            "reason_code": "LIMIT_EXCEEDED" if i % 5 == 0 else None,
+            "refunded": refunded,
+            "refunded_at": at + timedelta(minutes=5) if refunded else None,
+            "request_id": f"r-{i}" if i % 3 == 0 else None,
+        })
+    return rows
+
+
+def test_block_roundtrip() -> None:
+    client_id = ObjectId()
+    rows = _rows(client_id, datetime(2023, 5, 31, 12, 0, 0, 123000), 50)
+    decoded = decode_block(encode_block(client_id, rows))
+    assert decoded == rows
+
+
+def test_month_bounds_and_shards() -> None:
+    assert month_bounds("202312") == (
+        datetime(2023, 12, 1, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    client_id = ObjectId()
+    assert shard_of(client_id, 16) == shard_of(str(client_id), 16)
+    assert 0 <= shard_of(client_id, 16) < 16
+
+
+def test_reader_streams_one_client_with_filters(tmp_path) -> None:
+    archive = ChargeArchive(tmp_path)
+    client_a, client_b = ObjectId(), ObjectId()
+    rows_a = _rows(client_a, datetime(2023, 5, 20), 30)
+    writer = ShardWriter(archive.shard_path("202305", 0))
+    writer.write_client(client_a, rows_a)
+    writer.write_client(client_b, _rows(client_b, datetime(2023, 5, 20), 5))
+    writer.close()
+    archive.record_month("202305", shards=1, rows=writer.rows)
+
+    async def collect(**kwargs) -> List[dict]:
+        return [r async for r in archive.iter_client(str(client_a), **kwargs)]
+
+    assert asyncio.run(collect()) == rows_a
+    window = asyncio.run(collect(since=datetime(2023, 5, 19, 12), until=datetime(2023, 5, 19, 20)))
+    assert [r["attempted_at"] for r in window] == [datetime(2023, 5, 19, h) for h in range(19, 11, -1)]
+    declined = asyncio.run(collect(status="declined"))
+    assert declined and all(r["status"] == "declined" for r in declined)
+    assert asyncio.run(collect(since=datetime(2023, 6, 1))) == []
+
+
+def test_covers_uses_newest_archived_month(tmp_path) -> None:
+    archive = ChargeArchive(tmp_path)
+    assert archive.covers(None) is False
+    archive.record_month("202301", shards=4, rows=10)
+    archive.record_month("202302", shards=4, rows=10)
+    assert archive.archived_before() == datetime(2023, 3, 1, tzinfo=timezone.utc)
+    assert archive.covers(None)
+    assert archive.covers(datetime(2023, 2, 28))
+    assert not archive.covers(datetime(2023, 3, 1, tzinfo=timezone.utc))
+
+
+def test_contains_finds_archived_ids(tmp_path) -> None:
+    archive = ChargeArchive(tmp_path)
+    ids = [ObjectId.from_datetime(datetime(2023, 5, d, tzinfo=timezone.utc)) for d in range(1, 29)]
+    migrated = ObjectId.from_datetime(datetime(2024, 1, 1, tzinfo=timezone.utc))  # id month != archived month
+    archive.write_ids("202305", ids + [migrated])
+    archive.record_month("202305", shards=1, rows=len(ids) + 1)
+
+    assert all(archive.contains(i) for i in ids)
+    assert archive.contains(str(migrated))
+    assert not archive.contains(ObjectId.from_datetime(datetime(2023, 5, 15, 12, tzinfo=timezone.utc)))
+    assert not archive.contains(ObjectId())
+
+
+def test_hot_copy_wins_over_archived_twin() -> None:
+    at = datetime(2023, 5, 20, tzinfo=timezone.utc)
+    c1 = ObjectId()
+    hot = [
+        {"_id": ObjectId(), "attempted_at": at + timedelta(hours=4), "refunded": False},
+        {"_id": c1, "attempted_at": at, "refunded": True},
+    ]
+
+    async def archived():
+        yield {"_id": c1, "attempted_at": at, "refunded": False}
+        yield {"_id": ObjectId(), "attempted_at": at - timedelta(hours=1), "refunded": False}
+
+    merged = asyncio.run(_merge_archived(hot, archived(), key=lambda r: r["attempted_at"], ident=lambda r: r["_id"]))
+    assert [r["_id"] for r in merged][:2] == [hot[0]["_id"], c1]
+    assert len(merged) == 3
+    assert merged[1]["refunded"] is True
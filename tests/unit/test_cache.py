@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+
+from app.infrastructure.cache import TTLCache
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_invalidate_and_disabled_cache() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+
+    disabled: TTLCache[str, int] = TTLCache(maxsize=2, ttl=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_fill_started_before_invalidation_is_not_stored() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    loading = cache.generation("a")
+    cache.invalidate("a")  # e.g. a PUT lands while "a" is being loaded
+    cache.set("a", 1, loading)
+    assert cache.get("a") is None
+    cache.set("a", 2, cache.generation("a"))
+    assert cache.get("a") == 2
+
+    loading = cache.generation("a")
+    cache.clear()
+    cache.set("a", 3, loading)
+    assert cache.get("a") is None
+
+    # Forgetting old counts (beyond maxsize keys) voids pending fills rather than reusing a count
+    loading = cache.generation("a")
+    for key in ("b", "c", "d"):
+        cache.invalidate(key)
+    cache.set("a", 4, loading)
+    assert cache.get("a") is None
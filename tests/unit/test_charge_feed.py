@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.config import settings
+from app.domain.entities.charge import ChargeStatus
+from app.infrastructure.charge_feed import ChargeEvent, ChargeFeed, SubscriberDropped, _event_from_change, event_key
+from app.infrastructure.db.models import ChargeDoc
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _charge(client_id: ObjectId, **fields) -> ChargeDoc:
+    return ChargeDoc.model_construct(
+        id=ObjectId(), client_id=client_id, card_id=ObjectId(), amount=10.0, status="approved", **fields
+    )
+
+
+def test_events_reach_only_the_clients_subscribers() -> None:
+    async def scenario() -> None:
+        feed = ChargeFeed(queue_size=4)
+        mine, theirs = ObjectId(), ObjectId()
+        sub = feed.subscribe(str(mine))
+        other = feed.subscribe(str(theirs))
+        doc = _charge(mine)
+        feed.publish(ChargeEvent("charge", doc))
+
+        event = await sub.get(timeout=0.1)
+        assert event is not None and event.doc is doc
+        assert await other.get(timeout=0.01) is None
+
+        feed.unsubscribe(sub)
+        feed.unsubscribe(sub)  # idempotent
+        feed.publish(ChargeEvent("charge", _charge(mine)))
+        assert sub.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_dropped_not_buffered() -> None:
+    async def scenario() -> None:
+        feed = ChargeFeed(queue_size=2)
+        client_id = ObjectId()
+        slow = feed.subscribe(str(client_id))
+        for _ in range(3):
+            feed.publish(ChargeEvent("charge", _charge(client_id)))
+
+        assert slow.dropped
+        with pytest.raises(SubscriberDropped):
+            await slow.get(timeout=0.1)
+        # Later events no longer reach it
+        feed.publish(ChargeEvent("charge", _charge(client_id)))
+        assert slow.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_notify_defers_to_the_change_stream(monkeypatch) -> None:
+    async def scenario() -> None:
+        feed = ChargeFeed()
+        client_id = ObjectId()
+        sub = feed.subscribe(str(client_id))
+        monkeypatch.setattr(settings, "charge_feed_source", "change_stream")
+        feed.notify("charge", _charge(client_id))
+        assert sub.queue.empty()
+        monkeypatch.setattr(settings, "charge_feed_source", "local")
+        feed.notify("charge", _charge(client_id))
+        assert sub.queue.qsize() == 1
+
+    asyncio.run(scenario())
+
+
+def test_event_key_uses_refund_time_and_millisecond_precision() -> None:
+    attempted = datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    refunded = datetime(2024, 5, 2, 8, 30, 0, 999999, tzinfo=timezone.utc)
+    doc = _charge(ObjectId(), attempted_at=attempted, refunded_at=refunded, refunded=True)
+    assert ChargeEvent("charge", doc).key == (datetime(2024, 5, 1, 12, 0, 0, 123000), doc.id)
+    assert ChargeEvent("refund", doc).key == (datetime(2024, 5, 2, 8, 30, 0, 999000), doc.id)
+    assert event_key(datetime(2024, 5, 1, 12, 0, 0, 123000), doc.id) == ChargeEvent("charge", doc).key
+
+
+def test_change_events_map_to_feed_events() -> None:
+    raw = {
+        "_id": ObjectId(),
+        "client_id": ObjectId(),
+        "card_id": ObjectId(),
+        "amount": 10.0,
+        "status": "approved",
+        "attempted_at": datetime(2024, 5, 1),
+        "refunded": True,
+        "refunded_at": datetime(2024, 5, 2),
+    }
+    inserted = _event_from_change({"operationType": "insert", "fullDocument": raw})
+    assert inserted.kind == "charge"
+    assert inserted.doc.id == raw["_id"]
+    assert inserted.doc.status is ChargeStatus.approved
+    assert inserted.key == (datetime(2024, 5, 1), raw["_id"])
+    refund = {"operationType": "update", "fullDocument": raw, "updateDescription": {"updatedFields": {"refunded_at": 1}}}
+    assert _event_from_change(refund).kind == "refund"
+    other = {"operationType": "update", "fullDocument": raw, "updateDescription": {"updatedFields": {"amount": 1}}}
+    assert _event_from_change(other) is None
+    assert _event_from_change({"operationType": "update", "fullDocument": None}) is None
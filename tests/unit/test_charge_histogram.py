@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+
+from app.infrastructure import charge_histogram
+from app.infrastructure.charge_histogram import bucket_starts, ceil_bucket, client_histogram, floor_bucket, fold
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+T0 = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def _row(start: datetime, status: str, reason, count: int, amount: float) -> dict:
+    return {"_id": {"start": start.replace(tzinfo=None), "status": status, "reason_code": reason}, "count": count, "amount": amount}
+
+
+def test_bucket_alignment_matches_date_trunc() -> None:
+    at = datetime(2024, 5, 1, 13, 45, 10, 5)  # naive: UTC, as read from Mongo
+    assert floor_bucket(at, "hour") == datetime(2024, 5, 1, 13, tzinfo=timezone.utc)
+    assert floor_bucket(at, "day") == T0
+    assert ceil_bucket(at, "hour") == datetime(2024, 5, 1, 14, tzinfo=timezone.utc)
+    assert ceil_bucket(T0, "day") == T0
+    assert bucket_starts(T0, T0 + timedelta(hours=3), "hour") == [T0 + timedelta(hours=h) for h in range(3)]
+
+
+def test_fold_counts_rates_and_reason_codes() -> None:
+    buckets = fold(
+        [
+            _row(T0, "approved", None, 3, 30.0),
+            _row(T0, "declined", "LIMIT_EXCEEDED", 1, 6000.0),
+            _row(T0, "declined", "SUSPECT_PAN", 1, 5.0),
+        ]
+    )
+    assert buckets[T0] == {
+        "start": T0,
+        "count": 5,
+        "approved": 3,
+        "declined": 2,
+        "approval_rate": 0.6,
+        "approved_amount": 30.0,
+        "reason_codes": {"LIMIT_EXCEEDED": 1, "SUSPECT_PAN": 1},
+    }
+
+
+def test_closed_buckets_are_served_from_cache(monkeypatch) -> None:
+    calls: List[tuple] = []
+
+    async def groups(client_id, unit, since, until):
+        calls.append((since, until))
+        return [_row(s, "approved", None, 1, 10.0) for s in bucket_starts(since, until, unit)]
+
+    monkeypatch.setattr(charge_histogram, "client_charge_groups", groups)
+    monkeypatch.setattr(charge_histogram.settings, "histogram_settle_s", 60.0)
+    charge_histogram.closed_buckets.clear()
+    starts = bucket_starts(T0, T0 + timedelta(hours=3), "hour")
+    now = T0 + timedelta(hours=2, minutes=30)  # the last bucket is still open
+
+    first = asyncio.run(client_histogram("c1", "hour", starts, now))
+    second = asyncio.run(client_histogram("c1", "hour", starts, now))
+    assert first == second and [b["count"] for b in first] == [1, 1, 1]
+    # Second query only aggregates the open bucket
+    assert calls == [(T0, T0 + timedelta(hours=3)), (T0 + timedelta(hours=2), T0 + timedelta(hours=3))]
+    charge_histogram.closed_buckets.clear()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import zlib
+from typing import List, Tuple
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.http.middleware.compression import ENCODERS, CompressionMiddleware, GzipEncoder, negotiate
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+ROWS = [{"id": f"{i:024x}", "amount": 125.5, "status": "approved", "reason_code": None} for i in range(500)]
+
+
+def test_negotiate_prefers_highest_q_then_server_order() -> None:
+    available = {"zstd": GzipEncoder, "br": GzipEncoder, "gzip": GzipEncoder}
+    assert negotiate("gzip, br, zstd", available) == "zstd"
+    assert negotiate("gzip;q=1, br;q=0.5", available) == "gzip"
+    assert negotiate("br;q=0, *", available) == "zstd"
+    assert negotiate("*;q=0, gzip", available) == "gzip"
+    assert negotiate("identity", available) is None
+    assert negotiate("", available) is None
+    assert negotiate("gzip;q=abc", available) is None
+
+
+def test_gzip_encoder_flushes_decodable_chunks() -> None:
+    encoder = GzipEncoder()
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    first = encoder.compress(b'{"n": 1}\n') + encoder.flush()
+    assert decoder.decompress(first) == b'{"n": 1}\n'
+    rest = encoder.compress(b'{"n": 2}\n') + encoder.finish()
+    assert decoder.decompress(rest) == b'{"n": 2}\n'
+
+
+def _app() -> Starlette:
+    async def big(_request):
+        return JSONResponse(ROWS, headers={"ETag": '"v1"'})
+
+    async def small(_request):
+        return JSONResponse({"ok": True})
+
+    async def ndjson(_request):
+        async def lines():
+            for row in ROWS[:3]:
+                yield json.dumps(row) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def events(_request):
+        return PlainTextResponse("data: x\n\n" * 500, media_type="text/event-stream")
+
+    return Starlette(
+        routes=[Route("/big", big), Route("/small", small), Route("/ndjson", ndjson), Route("/events", events)]
+    )
+
+
+def _get(app, path: str, accept: str) -> Tuple[httpx.Response, List[bytes]]:
+    async def scenario() -> Tuple[httpx.Response, List[bytes]]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            async with http.stream("GET", path, headers={"Accept-Encoding": accept}) as resp:
+                return resp, [chunk async for chunk in resp.aiter_raw()]
+
+    return asyncio.run(scenario())
+
+
+def test_large_json_is_gzipped_with_length_and_vary() -> None:
+    resp, chunks = _get(CompressionMiddleware(_app(), min_size=1024, thread_min_size=1), "/big", "gzip")
+    raw = b"".join(chunks)
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.headers["etag"] == '"v1-gzip"'
+    assert int(resp.headers["content-length"]) == len(raw)
+    assert json.loads(gzip.decompress(raw)) == ROWS
+
+
+def test_small_bodies_and_event_streams_pass_through() -> None:
+    app = CompressionMiddleware(_app(), min_size=1024)
+    small, _ = _get(app, "/small", "gzip")
+    assert "content-encoding" not in small.headers
+    events, chunks = _get(app, "/events", "gzip")
+    assert "content-encoding" not in events.headers
+    assert b"".join(chunks).startswith(b"data: x")
+    plain, _ = _get(app, "/big", "identity")
+    assert "content-encoding" not in plain.headers
+
+
+def test_streams_are_compressed_per_chunk() -> None:
+    messages: List[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/ndjson",
+        "raw_path": b"/ndjson",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "server": ("test", 80),
+        "client": ("test", 1234),
+    }
+    asyncio.run(CompressionMiddleware(_app(), min_size=1024)(scope, receive, send))
+
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each line is decodable as soon as its chunk arrives
+    lines = [decoder.decompress(m["body"]) for m in bodies if m.get("more_body")]
+    assert [json.loads(line) for line in lines] == ROWS[:3]
+    decoder.decompress(bodies[-1]["body"])
+    assert decoder.eof
+
+
+@pytest.mark.skipif("zstd" not in ENCODERS and "br" not in ENCODERS, reason="brotli/zstandard not installed")
+def test_optional_codings_are_preferred() -> None:
+    resp, _ = _get(CompressionMiddleware(_app()), "/big", "gzip, br, zstd")
+    assert resp.headers["content-encoding"] == next(iter(ENCODERS))
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError, ServerSelectionTimeoutError
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route, Router
+
+from app.http.middleware.data_guard import DataLayerGuardMiddleware
+from app.infrastructure.db.breaker import CircuitBreaker, current_db_calls, is_data_layer_failure
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock: FakeClock, **overrides) -> CircuitBreaker:
+    params = {"failure_ratio": 0.5, "min_calls": 4, "window": 10.0, "open_for": 5.0, **overrides}
+    return CircuitBreaker(clock=clock, **params)
+
+
+def test_breaker_opens_on_failure_ratio_with_enough_calls() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for ok in (False, False, True):
+        breaker.record(ok)
+    assert breaker.state == "closed"  # below min_calls
+    breaker.record(True)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 5.0
+
+
+def test_old_outcomes_leave_the_window() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 11
+    for _ in range(3):
+        breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_closes_or_reopens() -> None:
+    clock = FakeClock()
+    breaker = _breaker(clock, min_calls=1)
+    breaker.record(False)
+    assert not breaker.probe_due()  # still within open_for
+    clock.now += 5
+    assert breaker.probe_due() and breaker.state == "half_open"
+    assert not breaker.allow()  # only the health probe goes through
+    breaker.probe_result(False)
+    assert breaker.state == "open" and breaker.retry_after() == 5.0
+    clock.now += 5
+    assert breaker.probe_due()
+    breaker.probe_result(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_only_outage_errors_count_as_failures() -> None:
+    assert is_data_layer_failure(ServerSelectionTimeoutError("no primary"))
+    assert not is_data_layer_failure(DuplicateKeyError("dup"))
+    assert not is_data_layer_failure(ValueError())
+
+
+def _app() -> Router:
+    # A bare router: in the API the guard sits inside the server-error middleware
+    async def slow(_request):
+        await asyncio.sleep(1)
+        return PlainTextResponse("slow")
+
+    async def down(_request):
+        current_db_calls.get()[0] += 1
+        raise AutoReconnect("connection refused")
+
+    async def ok(_request):
+        current_db_calls.get()[0] += 1
+        return PlainTextResponse("ok")
+
+    async def health(_request):
+        return PlainTextResponse("ok")
+
+    return Router(
+        routes=[Route("/slow", slow), Route("/down", down), Route("/ok", ok), Route("/health", health)]
+    )
+
+
+def _get(app, *paths: str) -> List[httpx.Response]:
+    async def scenario() -> List[httpx.Response]:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return [await http.get(path) for path in paths]
+
+    return asyncio.run(scenario())
+
+
+def test_deadline_answers_504() -> None:
+    guarded = DataLayerGuardMiddleware(_app(), breaker=_breaker(FakeClock()), deadline_ms=50)
+    [response] = _get(guarded, "/slow")
+    assert response.status_code == 504
+
+
+def test_open_circuit_fails_fast_but_spares_health() -> None:
+    breaker = _breaker(FakeClock(), min_calls=2)
+    guarded = DataLayerGuardMiddleware(_app(), breaker=breaker, deadline_ms=1000)
+    ok, down, rejected, health = _get(guarded, "/ok", "/down", "/ok", "/health")
+    assert ok.status_code == 200
+    assert down.status_code == 503
+    assert breaker.state == "open"
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "5"
+    assert health.status_code == 200
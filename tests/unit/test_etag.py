@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.http.etag import coded_etag, etag_matches, if_match_versions, make_etag, not_modified, resource_etag
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_etag_is_strong_and_quoted() -> None:
+    etag = make_etag("abc", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    assert etag.startswith('"') and etag.endswith('"')
+    assert not etag.startswith("W/")
+
+
+def test_etag_ignores_sub_millisecond_precision_and_naive_utc() -> None:
+    aware = datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    stored = datetime(2024, 5, 1, 12, 0, 0, 123000)  # what Mongo hands back
+    assert make_etag("abc", aware) == make_etag("abc", stored)
+    assert make_etag("abc", aware) != make_etag("abc", datetime(2024, 5, 1, 12, 0, 0, 124000))
+
+
+def test_etag_distinguishes_parts() -> None:
+    assert make_etag("a", None, "b") != make_etag("a", "b", None)
+    assert make_etag("a") != make_etag("b")
+
+
+def test_if_none_match_lists_wildcard_and_weak_tags() -> None:
+    etag = make_etag("abc")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+def test_coded_etags_are_distinct_and_keep_the_version() -> None:
+    etag = resource_etag("c1", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    gzipped = coded_etag(etag, "gzip")
+    assert gzipped != etag and gzipped.endswith('-gzip"')
+    assert etag_matches(gzipped, etag)
+    assert etag_matches(f'"other", W/{coded_etag(etag, "br")}', etag)
+    assert not etag_matches(coded_etag('"other"', "gzip"), etag)
+    assert if_match_versions(gzipped) == if_match_versions(etag)
+    assert coded_etag(f"W/{etag}", "gzip") == f"W/{etag}"
+
+
+def test_not_modified_has_no_body() -> None:
+    response = not_modified('"x"')
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"x"'
+    assert response.body == b""
+
+
+def test_resource_etag_round_trips_its_version() -> None:
+    updated_at = datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    etag = resource_etag("abc", updated_at)
+    assert etag != resource_etag("abc", updated_at, "id", "name")
+    assert if_match_versions(etag) == [datetime(2024, 5, 1, 12, 0, 0, 123000)]
+
+
+def test_if_match_ignores_weak_and_foreign_tags() -> None:
+    etag = resource_etag("abc", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    assert if_match_versions(f"W/{etag}") == []
+    assert if_match_versions('"not-ours", "deadbeef"') == []
+    assert len(if_match_versions(f'"x", {etag}')) == 1
+    assert if_match_versions(f"{etag}, *") is None
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.infrastructure.event_log import HEADER, LogReader, SegmentLog, segment_name
+from app.jobs.outbox_relay import event_record
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _payloads(n: int) -> list:
+    return [f'{{"n":{i}}}'.encode() for i in range(n)]
+
+
+def test_append_and_read_by_offset(tmp_path) -> None:
+    log = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    offsets = log.append(_payloads(3))
+    assert offsets == [0, HEADER.size + 7, 2 * (HEADER.size + 7)]
+
+    reader = LogReader(str(tmp_path))
+    records, next_offset = reader.read(0)
+    assert all(isinstance(r, memoryview) for r in records)  # views into the mapping
+    assert [bytes(r) for r in records] == _payloads(3)
+    assert next_offset == log.end
+
+    records, _ = reader.read(offsets[1], max_records=1)
+    assert bytes(records[0]) == b'{"n":1}'
+    # Nothing new yet, then the next batch
+    assert reader.read(next_offset) == ([], next_offset)
+    log.append([b'{"n":3}'])
+    records, _ = reader.read(next_offset)
+    assert [bytes(r) for r in records] == [b'{"n":3}']
+
+
+def test_segments_rotate_and_reads_cross_them(tmp_path) -> None:
+    log = SegmentLog(str(tmp_path), segment_bytes=40)  # two 15-byte records per segment
+    offsets = log.append(_payloads(5))
+    bases = sorted(os.listdir(tmp_path))
+    assert bases == [segment_name(0), segment_name(offsets[2]), segment_name(offsets[4])]
+
+    records, next_offset = LogReader(str(tmp_path)).read(offsets[1])
+    assert [bytes(r) for r in records] == _payloads(5)[1:]
+    assert next_offset == log.end
+
+
+def test_reopen_truncates_a_torn_tail(tmp_path) -> None:
+    log = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    log.append(_payloads(2))
+    end = log.end
+    log.close()
+    with open(tmp_path / segment_name(0), "ab") as f:
+        f.write(HEADER.pack(100, 0) + b"partial")  # crash mid-batch
+
+    assert LogReader(str(tmp_path)).read(0)[1] == end
+    reopened = SegmentLog(str(tmp_path), segment_bytes=1 << 20)
+    assert reopened.end == end
+    assert reopened.append([b"next"]) == [end]
+
+
+def test_event_record_carries_the_charge() -> None:
+    charge_id, event_id = ObjectId(), ObjectId()
+    raw = {
+        "_id": charge_id,
+        "client_id": ObjectId(),
+        "card_id": ObjectId(),
+        "amount": 10.0,
+        "attempted_at": datetime(2024, 5, 1, 12, 0),
+        "status": "approved",
+        "reason_code": None,
+        "refunded": True,
+        "refunded_at": datetime(2024, 5, 2, 9, 30),
+        "request_id": None,
+    }
+    record = json.loads(event_record(raw, {"id": event_id, "kind": "refund"}))
+    assert record["event_id"] == str(event_id)
+    assert record["at"] == "2024-05-02T09:30:00"
+    assert record["charge"]["id"] == str(charge_id)
+    assert record["charge"]["refunded"] is True
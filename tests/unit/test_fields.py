@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.http.fields import dump_partial_list, parse_fields, partial_model, project_row, projection
+from app.http.schemas.charge import ChargeOut
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_parse_fields_keeps_model_order_and_drops_blanks() -> None:
+    assert parse_fields("status, id,,amount", ChargeOut) == ("id", "amount", "status")
+    assert parse_fields(None, ChargeOut) is None
+    assert parse_fields(" , ", ChargeOut) is None
+
+
+def test_parse_fields_rejects_unknown_names() -> None:
+    with pytest.raises(HTTPException) as exc:
+        parse_fields("id,pan", ChargeOut)
+    assert exc.value.status_code == 422
+    assert "pan" in exc.value.detail
+
+
+def test_projection_maps_id_and_adds_required_fields() -> None:
+    assert projection(("id", "amount"), "attempted_at") == {"_id": 1, "amount": 1, "attempted_at": 1}
+
+
+def test_project_row_renames_id_and_stringifies_object_ids() -> None:
+    oid, client = ObjectId(), ObjectId()
+    raw = {"_id": oid, "client_id": client, "amount": 5.0, "attempted_at": datetime(2024, 1, 1)}
+    assert project_row(raw, ("id", "client_id", "amount")) == {
+        "id": str(oid),
+        "client_id": str(client),
+        "amount": 5.0,
+    }
+
+
+def test_partial_model_is_cached_and_serializes_only_selected_fields() -> None:
+    fields = ("id", "amount", "attempted_at")
+    assert partial_model(ChargeOut, fields) is partial_model(ChargeOut, fields)
+    body = dump_partial_list(ChargeOut, fields, [{"id": "a", "amount": 1.5, "attempted_at": datetime(2024, 1, 1)}])
+    assert body == b'[{"id":"a","amount":1.5,"attempted_at":"2024-01-01T00:00:00"}]'
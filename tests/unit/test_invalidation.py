@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+from app.config import settings
+from app.infrastructure.cache import TTLCache
+from app.infrastructure.invalidation import InvalidationBus
+from app.serve import share_state, shared_state_warnings, worker_count
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _bus() -> InvalidationBus:
+    bus = InvalidationBus({"client": TTLCache(10, 60), "card": TTLCache(10, 60)}, origin="me")
+    bus.caches["client"].set("c1", "cached")
+    bus.caches["card"].set("k1", "cached")
+    return bus
+
+
+def test_publish_invalidates_locally_without_a_backend() -> None:
+    bus = _bus()
+    asyncio.run(bus.publish("card", "k1"))
+    assert bus.caches["card"].get("k1") is None
+    assert bus.caches["client"].get("c1") == "cached"
+
+
+def test_apply_skips_own_messages_and_unknown_kinds() -> None:
+    bus = _bus()
+    bus.apply({"kind": "client", "entity_id": "c1", "origin": "me"})
+    bus.apply({"kind": None, "origin": "other"})  # the collection's seed message
+    assert bus.caches["client"].get("c1") == "cached"
+    bus.apply({"kind": "client", "entity_id": "c1", "origin": "other"})
+    assert bus.caches["client"].get("c1") is None
+
+
+def test_multi_worker_warnings(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "cache_invalidation", "local")
+    monkeypatch.setattr(settings, "rate_limit_backend", "mongo")
+    monkeypatch.setattr(settings, "charge_feed_source", "change_stream")
+    assert shared_state_warnings(1) == []
+    [warning] = shared_state_warnings(4)
+    assert warning.startswith("CACHE_INVALIDATION=local")
+    monkeypatch.setattr(settings, "cache_invalidation", "mongo")
+    assert shared_state_warnings(4) == []
+    assert worker_count(3) == 3 and worker_count(0) >= 1
+
+
+def test_several_workers_default_to_shared_backends(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "cache_invalidation", "local")
+    monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+    # Restored after the test: share_state exports what it changes
+    monkeypatch.setenv("CACHE_INVALIDATION", "local")
+    monkeypatch.setattr(settings, "__pydantic_fields_set__", {"rate_limit_backend"})
+    assert share_state(1) == []
+    assert share_state(4) == ["CACHE_INVALIDATION=mongo"]
+    assert settings.cache_invalidation == "mongo" and os.environ["CACHE_INVALIDATION"] == "mongo"
+    # Set explicitly: kept (and warned about)
+    assert settings.rate_limit_backend == "memory"
+    assert shared_state_warnings(4)[0].startswith("RATE_LIMIT_BACKEND=memory")
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from scripts.loadgen import LatencyHistogram, load_capture, route_template
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_histogram_percentiles_within_relative_error() -> None:
+    hist = LatencyHistogram(sub_bucket_bits=8)
+    for value in range(1, 100_001):
+        hist.record(value)
+
+    assert hist.total == 100_000
+    assert hist.min == 1
+    assert hist.max == 100_000
+    for p, expected in ((50, 50_000), (99, 99_000), (99.9, 99_900)):
+        assert abs(hist.percentile(p) - expected) / expected < 1 / 2**7
+
+
+def test_histogram_merge() -> None:
+    a, b = LatencyHistogram(), LatencyHistogram()
+    a.record(10)
+    b.record(5_000_000)
+    a.merge(b)
+    assert a.total == 2
+    assert a.min == 10
+    assert a.percentile(100) == 5_000_000
+
+
+def test_route_template_collapses_object_ids() -> None:
+    path = "/charges/65f1c0ffee0000000000abcd/refund?x=1"
+    assert route_template("post", path) == "POST /charges/{id}/refund"
+
+
+def test_load_capture_skips_non_request_lines(tmp_path) -> None:
+    capture = tmp_path / "capture.jsonl"
+    capture.write_text(
+        "\n".join(
+            [
+                json.dumps({"method": "get", "path": "/health"}),
+                json.dumps({"request_id": "x", "title": "not a request"}),
+                json.dumps({"method": "POST", "url": "http://h:8000/clients", "json": {"name": "a"}}),
+            ]
+        )
+    )
+    specs = load_capture(str(capture))
+    assert [(s.method, s.path) for s in specs] == [("GET", "/health"), ("POST", "/clients")]
+    assert specs[1].json == {"name": "a"}
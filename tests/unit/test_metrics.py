@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pytest
+
+from app.infrastructure.db.monitoring import command_collection
+from app.infrastructure.observability.metrics import Counter, Histogram, Registry
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    hist = registry.register(Histogram("op_seconds", "Op latency.", ("op",), buckets=(0.1, 1.0)))
+    hist.labels("read").observe(0.05)
+    hist.labels("read").observe(0.5)
+    hist.labels("read").observe(5.0)
+
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+    assert 'op_seconds_sum{op="read"} 5.55' in text
+
+
+def test_counter_escapes_label_values() -> None:
+    registry = Registry()
+    counter = registry.register(Counter("events_total", "Events.", ("kind",)))
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+    assert 'events_total{kind="a\\"b"} 3' in registry.render()
+
+
+def test_registry_rejects_duplicates() -> None:
+    registry = Registry()
+    registry.register(Counter("dup_total", "Dup."))
+    with pytest.raises(ValueError):
+        registry.register(Counter("dup_total", "Dup."))
+
+
+def test_command_collection() -> None:
+    assert command_collection("find", {"find": "charges", "filter": {}}) == "charges"
+    assert command_collection("getMore", {"getMore": 123, "collection": "cards"}) == "cards"
+    assert command_collection("ping", {"ping": 1}) == ""
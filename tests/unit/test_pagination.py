@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.http.pagination import decode_cursor, encode_cursor
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def test_cursor_round_trips_at_millisecond_precision() -> None:
+    oid = ObjectId()
+    aware = datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(aware, oid)) == (datetime(2024, 5, 1, 12, 0, 0, 123000), oid)
+    # Naive values are UTC, as Mongo returns them
+    assert encode_cursor(datetime(2024, 5, 1, 12, 0, 0, 123000), oid) == encode_cursor(aware, oid)
+
+
+def test_cursor_is_url_safe() -> None:
+    cursor = encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), ObjectId())
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "MTIzLnh5eg"])
+def test_malformed_cursor_is_422(cursor) -> None:
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 422
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List
+
+import pytest
+from bson import ObjectId
+
+from app.infrastructure.db.partitions import merge_sorted, month_key, overlapping, partition_month
+from scripts.partition_charges import directory_entries, group_by_month
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+UTC = timezone.utc
+
+
+def test_month_key_uses_utc() -> None:
+    assert month_key(datetime(2024, 1, 31, 23, 30, tzinfo=UTC)) == "202401"
+    # 2024-02-01 01:00 at UTC+3 is still January in UTC
+    assert month_key(datetime(2024, 2, 1, 1, 0, tzinfo=timezone(timedelta(hours=3)))) == "202401"
+    assert month_key(datetime(2024, 2, 1)) == "202402"  # naive means UTC
+    assert partition_month("charges_202402") == "202402"
+    assert partition_month("charges") is None
+    assert partition_month("charge_request_ids") is None
+
+
+def test_overlapping_months() -> None:
+    months = ["202311", "202312", "202401", "202402", "202403"]
+    assert overlapping(months, None, None) == ["202403", "202402", "202401", "202312", "202311"]
+    assert overlapping(months, datetime(2023, 12, 15, tzinfo=UTC), datetime(2024, 2, 10, tzinfo=UTC)) == [
+        "202402",
+        "202401",
+        "202312",
+    ]
+    # `until` is exclusive: midnight on March 1st does not touch March
+    assert overlapping(months, datetime(2024, 2, 1, tzinfo=UTC), datetime(2024, 3, 1, tzinfo=UTC)) == ["202402"]
+    assert overlapping(months, datetime(2025, 1, 1, tzinfo=UTC), None) == []
+
+
+async def _stream(items: List[int]) -> AsyncIterator[int]:
+    for item in items:
+        await asyncio.sleep(0)
+        yield item
+
+
+def test_merge_sorted_descending() -> None:
+    async def scenario() -> List[int]:
+        streams = [_stream([9, 5, 1]), _stream([]), _stream([8, 7, 2]), _stream([6])]
+        return [x async for x in merge_sorted(streams, key=lambda x: x, descending=True)]
+
+    assert asyncio.run(scenario()) == [9, 8, 7, 6, 5, 2, 1]
+
+
+def test_merge_sorted_ascending_is_stable() -> None:
+    async def scenario() -> List[tuple]:
+        streams = [_stream([(1, "a"), (3, "a")]), _stream([(1, "b"), (2, "b")])]
+        return [x async for x in merge_sorted(streams, key=lambda x: x[0])]
+
+    assert asyncio.run(scenario()) == [(1, "a"), (1, "b"), (2, "b"), (3, "a")]
+
+
+def test_merge_sorted_descending_is_stable() -> None:
+    async def scenario() -> List[tuple]:
+        streams = [_stream([(9, "a"), (5, "a")]), _stream([(5, "b"), (2, "b")]), _stream([(5, "c")])]
+        return [x async for x in merge_sorted(streams, key=lambda x: x[0], descending=True)]
+
+    assert asyncio.run(scenario()) == [(9, "a"), (5, "a"), (5, "b"), (5, "c"), (2, "b")]
+
+
+def test_migration_groups_by_month_and_indexes_request_ids() -> None:
+    docs = [
+        {"_id": ObjectId(), "attempted_at": datetime(2024, 1, 3), "request_id": "r1"},
+        {"_id": ObjectId(), "attempted_at": datetime(2024, 2, 3), "request_id": None},
+        {"_id": ObjectId(), "attempted_at": datetime(2024, 1, 9)},
+    ]
+    groups = group_by_month(docs)
+    assert {m: len(d) for m, d in groups.items()} == {"202401": 2, "202402": 1}
+    assert directory_entries(groups) == [{"_id": "r1", "charge_id": docs[0]["_id"], "partition": "202401"}]
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.http.middleware.timing import PhaseTimingMiddleware, instrument_endpoints
+from app.infrastructure.observability.profiling import SamplingProfiler
+from app.infrastructure.observability.timing import RequestTimings, current_timings
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _app(sample_rate: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(PhaseTimingMiddleware, sample_rate=sample_rate)
+
+    @app.get("/work")
+    async def work() -> dict:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.db += 0.002  # what the command listener would add
+        return {"ok": True}
+
+    instrument_endpoints(app.router.routes)
+    return app
+
+
+def test_server_timing_header_reports_phases() -> None:
+    client = TestClient(_app(sample_rate=1))
+    header = client.get("/work").headers["server-timing"]
+    phases = {part.split(";")[0].strip() for part in header.split(",")}
+    assert {"validation", "db", "app", "serialization", "total"} <= phases
+    assert "db;dur=2.000" in header
+
+
+def test_only_one_in_n_requests_is_sampled() -> None:
+    client = TestClient(_app(sample_rate=3))
+    sampled = ["server-timing" in client.get("/work").headers for _ in range(6)]
+    assert sampled == [True, False, False, True, False, False]
+
+
+def test_request_timings_without_endpoint() -> None:
+    timings = RequestTimings(started=0.0, response_started=0.004)
+    assert timings.phases() == [("total", 4.0)]
+
+
+def test_sampling_profiler_collapses_stacks() -> None:
+    stop = threading.Event()
+
+    def busy_target() -> None:
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_target)
+    worker.start()
+    profiler = SamplingProfiler(worker.ident, interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_target" in line for line in lines)
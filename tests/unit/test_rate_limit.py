@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.infrastructure.rate_limit import ChargeRateLimiter, TokenBuckets
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_burst_then_refill() -> None:
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=2.0, burst=3, clock=clock)
+    assert [buckets.take("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a") == pytest.approx(0.5)
+    assert buckets.take("b") == 0.0  # keys are independent
+
+    clock.now = 0.5
+    assert buckets.take("a") == 0.0
+    assert buckets.take("a") == pytest.approx(0.5)
+
+
+def test_rejection_consumes_nothing() -> None:
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=1.0, burst=1, clock=clock)
+    assert buckets.take("a") == 0.0
+    for _ in range(5):
+        assert buckets.take("a") == pytest.approx(1.0)
+    clock.now = 1.0
+    assert buckets.take("a") == 0.0
+
+
+def test_idle_buckets_are_evicted() -> None:
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=10.0, burst=10, idle_s=5, max_keys=3, clock=clock)
+    for key in "abc":
+        buckets.take(key)
+    clock.now = 6.0
+    buckets.take("d")
+    assert len(buckets) == 1
+
+    for key in "efg":
+        buckets.take(key)
+    assert len(buckets) == 3  # max_keys drops the least recently used
+
+
+def test_limiter_checks_every_scope_before_consuming(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+    monkeypatch.setattr(settings, "rate_limit_client_rps", 1.0)
+    monkeypatch.setattr(settings, "rate_limit_client_burst", 3.0)
+    monkeypatch.setattr(settings, "rate_limit_card_rps", 1.0)
+    monkeypatch.setattr(settings, "rate_limit_card_burst", 1.0)
+    limiter = ChargeRateLimiter()
+
+    async def scenario() -> list:
+        return [
+            await limiter.check({"client": "c1", "card": "k1"}),
+            await limiter.check({"client": "c1", "card": "k1"}),
+            await limiter.check({"client": "c1", "card": "k2"}),
+            await limiter.check({"client": "c1", "card": "k3"}),
+            await limiter.check({"client": "c1", "card": "k4"}),
+        ]
+
+    admitted, card_limited, second_card, third_card, client_limited = asyncio.run(scenario())
+    assert admitted is None
+    assert card_limited[0] == "card"
+    # The card rejection did not spend a client token: k2 and k3 still fit in the burst of 3
+    assert second_card is None and third_card is None
+    assert client_limited[0] == "client"
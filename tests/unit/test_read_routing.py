@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import contextvars
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import ReadPreference, SecondaryPreferred
+
+from app.config import settings
+from app.infrastructure.db.read_routing import client_read_options, offload_reads, reader
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+@pytest.fixture
+def charges():
+    client = AsyncIOMotorClient("mongodb://localhost:27017/t1db", connect=False)
+    yield client.get_default_database()["charges"]
+    client.close()
+
+
+def _offloaded(charges):
+    def run():
+        offload_reads()
+        return reader(charges)
+
+    # A fresh context, like a request's own task
+    return contextvars.copy_context().run(run)
+
+
+def test_reads_stay_on_the_primary_unless_the_route_opts_in(charges, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "read_preference", "secondaryPreferred")
+    monkeypatch.setattr(settings, "read_max_staleness_s", 120)
+    assert reader(charges).read_preference == ReadPreference.PRIMARY
+    assert _offloaded(charges).read_preference == SecondaryPreferred(max_staleness=120)
+    # Opting in does not leak out of the request's context
+    assert reader(charges).read_preference == ReadPreference.PRIMARY
+
+
+def test_primary_setting_disables_offloading(charges, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "read_preference", "primary")
+    assert _offloaded(charges) is charges
+    assert client_read_options() == {}
+    monkeypatch.setattr(settings, "read_preference", "nearest")
+    assert client_read_options() == {"readPreference": "nearest", "maxStalenessSeconds": settings.read_max_staleness_s}
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pytest
+
+from app.config import settings
+from app.domain.rules.rules import BLOCKED_LAST4
+from scripts.seed_dataset import Plan, _parse_args, build_cards, build_charges, zipf_counts
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _plan(*extra: str) -> Plan:
+    return Plan(_parse_args(["--clients", "10", "--charges", "500", "--end", "2026-01-01", *extra]))
+
+
+def test_zipf_counts_are_exact_and_skewed() -> None:
+    counts = zipf_counts(10_000, 100, 1.1)
+    assert sum(counts) == 10_000
+    assert counts == sorted(counts, reverse=True)
+    assert counts[0] > 10 * counts[50]
+
+
+def test_generation_is_reproducible_by_seed() -> None:
+    a, b = _plan("--seed", "7"), _plan("--seed", "7")
+    assert build_charges(a, 0, 0, 50) == build_charges(b, 0, 0, 50)
+    assert build_cards(a, 0, 10) == build_cards(b, 0, 10)
+    assert build_charges(_plan("--seed", "8"), 0, 0, 50) != build_charges(a, 0, 0, 50)
+
+
+def test_charges_follow_business_rules() -> None:
+    plan = _plan("--decline-rate", "0.5")
+    cards = {c["_id"]: c for c in build_cards(plan, 0, 1)}
+    for charge in build_charges(plan, 0, 0, 200):
+        card = cards[charge["card_id"]]
+        if card["last4"] in BLOCKED_LAST4:
+            assert charge["reason_code"] == "SUSPECT_PAN"
+        elif charge["status"] == "declined":
+            assert charge["reason_code"] == "LIMIT_EXCEEDED"
+            assert charge["amount"] > 5000
+        else:
+            assert charge["amount"] <= 5000
+        assert plan.start <= charge["attempted_at"] < plan.end
+    assert all(len(c["pan_masked"]) >= 12 for c in cards.values())
+
+
+def test_partitioning_follows_settings(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "charge_partitioning", "monthly")
+    assert _plan().partitioned
+    assert not _plan("--partitioning", "none").partitioned
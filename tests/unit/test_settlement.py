@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import date, datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.jobs.settlement import _range_filter, _parse_args, day_bounds, merge, render_csv, write_report
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+CLIENT, CARD = "a" * 24, "b" * 24
+
+
+def test_day_bounds_are_utc_midnights() -> None:
+    start, end = day_bounds(date(2026, 3, 31))
+    assert start == datetime(2026, 3, 31, tzinfo=timezone.utc)
+    assert end == datetime(2026, 4, 1, tzinfo=timezone.utc)
+    assert _parse_args(["--date", "2026-03-31"]).date == date(2026, 3, 31)
+
+
+def test_range_filters_are_half_open() -> None:
+    assert _range_filter((None, None)) == {}
+    assert _range_filter((None, CLIENT)) == {"client_id": {"$lt": ObjectId(CLIENT)}}
+    assert _range_filter((CLIENT, None)) == {"client_id": {"$gte": ObjectId(CLIENT)}}
+
+
+def test_merge_is_exact_and_order_independent() -> None:
+    partials = [
+        [("approved", CLIENT, CARD, 2, "0.1"), ("refunded", CLIENT, CARD, 1, "0.1")],
+        [("approved", CLIENT, CARD, 1, "0.2")],
+        [("approved", CARD, CLIENT, 1, "10")],
+    ]
+    totals = merge(partials)
+    assert render_csv(totals) == render_csv(merge(reversed(partials)))
+    lines = render_csv(totals).decode().splitlines()
+    assert lines[0] == "client_id,card_id,approved_count,approved_amount,refunded_count,refunded_amount,net_amount"
+    assert lines[1] == f"{CLIENT},{CARD},3,0.30,1,0.10,0.20"
+    assert lines[2] == f"{CARD},{CLIENT},1,10.00,0,0.00,10.00"
+
+
+def test_report_is_written_with_checksum(tmp_path) -> None:
+    data = render_csv(merge([[("approved", CLIENT, CARD, 1, "12.5")]]))
+    path = tmp_path / "settlement.csv"
+    digest = write_report(path, data)
+    assert path.read_bytes() == data
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "settlement.csv.sha256").read_text() == f"{digest}  settlement.csv\n"
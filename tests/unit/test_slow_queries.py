@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from app.infrastructure.db.slow_queries import (
+    SlowQueryLog,
+    command_shape,
+    explain_command,
+    summarize_explain,
+)
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+def _find(client_id: ObjectId, status: str) -> dict:
+    return {
+        "find": "charges",
+        "filter": {
+            "client_id": client_id,
+            "status": status,
+            "attempted_at": {"$gte": datetime.now(timezone.utc)},
+        },
+        "sort": {"attempted_at": -1},
+        "lsid": {"id": "session"},
+        "$db": "t1db",
+    }
+
+
+def test_shapes_ignore_parameter_values() -> None:
+    a = command_shape("find", _find(ObjectId(), "approved"))
+    b = command_shape("find", _find(ObjectId(), "declined"))
+    assert a == b
+    assert '"sort": {"attempted_at": -1}' in a
+    assert "approved" not in a
+    assert command_shape("find", {"find": "charges", "filter": {"status": {"$in": [1, 2, 3]}}}) == (
+        command_shape("find", {"find": "charges", "filter": {"status": {"$in": [4]}}})
+    )
+
+
+def test_explain_command_strips_session_fields() -> None:
+    explain = explain_command("find", _find(ObjectId(), "approved"))
+    assert explain["verbosity"] == "executionStats"
+    assert list(explain["explain"])[0] == "find"
+    assert "lsid" not in explain["explain"]
+    assert "$db" not in explain["explain"]
+
+
+def test_summarize_explain_detects_collscan() -> None:
+    summary = summarize_explain(
+        {
+            "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+            "executionStats": {"totalKeysExamined": 0, "totalDocsExamined": 1000, "nReturned": 5},
+        }
+    )
+    assert summary["plan"] == "COLLSCAN <- SORT"
+    assert summary["collscan"] is True
+    assert summary["docs_examined"] == 1000
+
+
+def test_each_shape_is_explained_once_off_the_caller() -> None:
+    class FakeDatabase:
+        def __init__(self) -> None:
+            self.commands = []
+
+        async def command(self, cmd: dict) -> dict:
+            self.commands.append(cmd)
+            return {"queryPlanner": {"winningPlan": {"stage": "IXSCAN", "indexName": "ix"}}}
+
+    database = FakeDatabase()
+
+    async def scenario() -> list:
+        log = SlowQueryLog(threshold_ms=1)
+        log.start({"t1db": database})
+        for status in ("approved", "declined", "approved"):
+            log.record("t1db", "find", _find(ObjectId(), status), 5.0)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        await log.stop()
+        return log.top()
+
+    top = asyncio.run(scenario())
+    assert len(database.commands) == 1
+    assert top[0]["count"] == 3
+    assert top[0]["total_ms"] == 15.0
+    assert top[0]["explain"]["plan"] == "IXSCAN(ix)"
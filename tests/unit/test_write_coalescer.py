@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.infrastructure.db.write_coalescer import WriteCoalescer
+
+pytestmark = [pytest.mark.usefixtures("clean_db")]
+
+
+class FakeCollection:
+    """Unique on `key`, mimicking unordered insert_many error reporting."""
+
+    def __init__(self, name: str = "fake") -> None:
+        self.name = name
+        self.calls: List[List[Dict[str, Any]]] = []
+        self.keys: set = set()
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True) -> None:
+        assert ordered is False
+        await asyncio.sleep(0.01)  # round trip: lets the next batch accumulate
+        self.calls.append(docs)
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["key"] in self.keys:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.keys.add(doc["key"])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": 0})
+
+
+def _doc(key: str) -> Dict[str, Any]:
+    return {"_id": ObjectId(), "key": key}
+
+
+def test_concurrent_inserts_are_batched() -> None:
+    async def scenario() -> FakeCollection:
+        coll = FakeCollection()
+        writer = WriteCoalescer(coll, max_batch=100, max_inflight=1)
+        writer.start()
+        docs = [_doc(f"k{i}") for i in range(50)]
+        ids = await asyncio.gather(*(writer.insert(d) for d in docs))
+        assert ids == [d["_id"] for d in docs]
+        await writer.close()
+        return coll
+
+    coll = asyncio.run(scenario())
+    assert sum(len(c) for c in coll.calls) == 50
+    assert len(coll.calls) <= 3
+
+
+def test_duplicate_is_routed_to_its_caller() -> None:
+    async def scenario() -> list:
+        writer = WriteCoalescer(FakeCollection(), max_delay=0.005)
+        writer.start()
+        results = await asyncio.gather(
+            writer.insert(_doc("a")),
+            writer.insert(_doc("b")),
+            writer.insert(_doc("a")),
+            return_exceptions=True,
+        )
+        await writer.close()
+        return results
+
+    first, second, dup = asyncio.run(scenario())
+    assert isinstance(first, ObjectId)
+    assert isinstance(second, ObjectId)
+    assert isinstance(dup, DuplicateKeyError)
+
+
+def test_max_batch_is_respected() -> None:
+    async def scenario() -> FakeCollection:
+        coll = FakeCollection()
+        writer = WriteCoalescer(coll, max_batch=4, max_delay=0.005)
+        writer.start()
+        await asyncio.gather(*(writer.insert(_doc(f"k{i}")) for i in range(10)))
+        await writer.close()
+        return coll
+
+    coll = asyncio.run(scenario())
+    assert max(len(c) for c in coll.calls) <= 4
+    assert sum(len(c) for c in coll.calls) == 10
+
+
+def test_close_flushes_queued_inserts() -> None:
+    async def scenario() -> tuple:
+        coll = FakeCollection()
+        writer = WriteCoalescer(coll, max_batch=2, max_inflight=1)
+        writer.start()
+        pending = [asyncio.ensure_future(writer.insert(_doc(f"k{i}"))) for i in range(7)]
+        await asyncio.sleep(0)
+        await writer.close()
+        assert all(p.done() for p in pending)
+        with pytest.raises(RuntimeError):
+            await writer.insert(_doc("late"))
+        return coll, [p.result() for p in pending]
+
+    coll, ids = asyncio.run(scenario())
+    assert len(ids) == 7
+    assert sum(len(c) for c in coll.calls) == 7
+
+
+def test_resolve_splits_batch_per_collection() -> None:
+    async def scenario() -> tuple:
+        even, odd = FakeCollection("even"), FakeCollection("odd")
+
+        async def resolve(doc: Dict[str, Any]) -> FakeCollection:
+            return even if int(doc["key"][1:]) % 2 == 0 else odd
+
+        writer = WriteCoalescer(FakeCollection("unused"), max_batch=100, resolve=resolve)
+        writer.start()
+        await asyncio.gather(*(writer.insert(_doc(f"k{i}")) for i in range(10)))
+        await writer.close()
+        return even, odd
+
+    even, odd = asyncio.run(scenario())
+    assert sorted(d["key"] for c in even.calls for d in c) == sorted(f"k{i}" for i in range(0, 10, 2))
+    assert sorted(d["key"] for c in odd.calls for d in c) == sorted(f"k{i}" for i in range(1, 10, 2))
+
+
+def test_resolve_error_for_cancelled_caller_spares_the_batch() -> None:
+    async def scenario() -> tuple:
+        coll = FakeCollection()
+
+        async def resolve(doc: Dict[str, Any]) -> FakeCollection:
+            if doc["key"] == "bad":
+                raise RuntimeError("no partition")
+            return coll
+
+        writer = WriteCoalescer(FakeCollection("unused"), max_delay=0.005, resolve=resolve)
+        writer.start()
+        gone = writer.submit(_doc("bad"))
+        gone.cancel()  # its caller timed out or disconnected
+        ids = await asyncio.wait_for(asyncio.gather(*(writer.insert(_doc(f"k{i}")) for i in range(3))), 5)
+        await writer.close()
+        return coll, ids
+
+    coll, ids = asyncio.run(scenario())
+    assert len(ids) == 3
+    assert sorted(d["key"] for c in coll.calls for d in c) == ["k0", "k1", "k2"]